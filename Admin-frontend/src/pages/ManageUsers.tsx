@@ -51,8 +51,16 @@ interface User {
   status: string;
 }
 
+interface UserPage {
+  items: User[];
+  total: number;
+  page: number;
+  page_size: number;
+}
+
 // Assuming your Flask backend runs on port 5000
 const API_BASE_URL = 'http://localhost:5000/api'; 
+const PAGE_SIZE = 50;
 
 const ManageUsers = () => {
   // Use DepartmentsContext to get departments (now with id and name)
@@ -60,6 +68,9 @@ const ManageUsers = () => {
 
   const [users, setUsers] = useState<User[]>([]);
   const [searchQuery, setSearchQuery] = useState('');
+  const [debouncedSearch, setDebouncedSearch] = useState('');
+  const [page, setPage] = useState(1);
+  const [totalUsers, setTotalUsers] = useState(0);
   const [userToEdit, setUserToEdit] = useState<User | null>(null);
   const [userToDelete, setUserToDelete] = useState<User | null>(null);
   const [showAddUserModal, setShowAddUserModal] = useState(false);
@@ -83,13 +94,23 @@ const ManageUsers = () => {
     return dept ? dept.id : undefined;
   };
 
-  // --- Fetch Users from Backend ---
-  const fetchUsers = useCallback(async () => {
+  // --- Fetch one page of Users from Backend (search, sort and paging happen server-side) ---
+  // afterWrite reads from the primary database so the change just made is visible
+  const fetchUsers = useCallback(async (afterWrite = false) => {
     setLoading(true);
     setError(null);
     try {
-      const response = await axios.get<User[]>(`${API_BASE_URL}/users`);
-      setUsers(response.data);
+      const response = await axios.get<UserPage>(`${API_BASE_URL}/users`, {
+        params: {
+          page,
+          page_size: PAGE_SIZE,
+          sort: 'username',
+          search: debouncedSearch || undefined,
+          read_from: afterWrite ? 'primary' : undefined,
+        },
+      });
+      setUsers(response.data.items);
+      setTotalUsers(response.data.total);
     } catch (err: any) {
       console.error("Failed to fetch users:", err);
       setError("Failed to load users. Please try again.");
@@ -101,7 +122,16 @@ const ManageUsers = () => {
     } finally {
       setLoading(false);
     }
-  }, [toast]);
+  }, [toast, page, debouncedSearch]);
+
+  // Wait for typing to pause before searching, and start again from the first page
+  useEffect(() => {
+    const timer = setTimeout(() => {
+      setDebouncedSearch(searchQuery.trim());
+      setPage(1);
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [searchQuery]);
 
   useEffect(() => {
     // Fetch users only after departments are loaded to ensure proper mapping if needed
@@ -110,12 +140,7 @@ const ManageUsers = () => {
     }
   }, [fetchUsers, departmentsLoading, departmentsError]);
 
-
-  const filteredUsers = users.filter(user =>
-    user.name.toLowerCase().includes(searchQuery.toLowerCase()) ||
-    user.department.toLowerCase().includes(searchQuery.toLowerCase()) ||
-    user.username.toLowerCase().includes(searchQuery.toLowerCase())
-  );
+  const totalPages = Math.max(1, Math.ceil(totalUsers / PAGE_SIZE));
 
   // --- Add New Department (if selected in user form) ---
   const handleAddNewDepartment = async (deptName: string) => {
@@ -188,7 +213,7 @@ const ManageUsers = () => {
       });
 
       if (response.status === 201) { // Assuming 201 Created
-        await fetchUsers(); // Re-fetch users to update the list
+        await fetchUsers(true); // Re-fetch users to update the list
         setShowAddUserModal(false);
         resetForm();
 
@@ -226,7 +251,7 @@ const ManageUsers = () => {
       });
 
       if (response.status === 200) { // Assuming 200 OK
-        await fetchUsers(); // Re-fetch users to update the list
+        await fetchUsers(true); // Re-fetch users to update the list
         setUserToEdit(null);
 
         toast({
@@ -258,7 +283,7 @@ const ManageUsers = () => {
       const response = await axios.delete(`${API_BASE_URL}/users/${userToDelete.id}`);
 
       if (response.status === 200) { // Assuming 200 OK
-        await fetchUsers(); // Re-fetch users to update the list
+        await fetchUsers(true); // Re-fetch users to update the list
         setUserToDelete(null);
 
         toast({
@@ -354,10 +379,10 @@ const ManageUsers = () => {
               </TableRow>
             </TableHeader>
             <TableBody>
-              {filteredUsers.length > 0 ? (
-                filteredUsers.map((user, index) => (
+              {users.length > 0 ? (
+                users.map((user, index) => (
                   <TableRow key={user.id}>
-                    <TableCell className="font-medium">{index + 1}</TableCell>
+                    <TableCell className="font-medium">{(page - 1) * PAGE_SIZE + index + 1}</TableCell>
                     <TableCell>{user.username}</TableCell>
                     <TableCell>{user.name}</TableCell>
                     <TableCell>{user.email}</TableCell>
@@ -401,6 +426,29 @@ const ManageUsers = () => {
               )}
             </TableBody>
           </Table>
+          <div className="flex items-center justify-between px-4 py-3 border-t">
+            <p className="text-sm text-muted-foreground">
+              {totalUsers} users · Page {page} of {totalPages}
+            </p>
+            <div className="space-x-2">
+              <Button
+                variant="outline"
+                size="sm"
+                onClick={() => setPage(p => Math.max(1, p - 1))}
+                disabled={loading || page <= 1}
+              >
+                Previous
+              </Button>
+              <Button
+                variant="outline"
+                size="sm"
+                onClick={() => setPage(p => Math.min(totalPages, p + 1))}
+                disabled={loading || page >= totalPages}
+              >
+                Next
+              </Button>
+            </div>
+          </div>
         </div>
       )}
 
@@ -1,15 +1,9 @@
+# One-off user creation. The schema comes from `alembic upgrade head`;
+# for creating or updating many users use `python manage.py users <file>`.
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine
-from models import User  # fixed here
-from passlib.context import CryptContext
-from database import Base
-
-Base.metadata.create_all(bind=engine)
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def get_password_hash(password: str):
-    return pwd_context.hash(password)
+from database import SessionLocal
+from models import User, Department  # fixed here
+from security import hash_password as get_password_hash
 
 def create_user(db: Session, username: str, password: str, email: str, name: str, role: str, department: str):
     hashed_password = get_password_hash(password)
@@ -19,7 +13,8 @@ def create_user(db: Session, username: str, password: str, email: str, name: str
         email=email,
         name=name,
         role=role,
-        department=department
+        department=department,
+        department_id=db.query(Department.id).filter(Department.name == department).scalar()
     )
     db.add(user)
     db.commit()
@@ -0,0 +1,262 @@
+# admission.py
+"""
+Admission control: per-route concurrency limits and load shedding.
+
+During a survey-window spike the expensive routes (bcrypt at login, submission writes,
+Excel exports, dashboard aggregates) pile up behind the connection pool until clients
+time out and retry, which adds more load. Instead, each route class admits at most
+`concurrency` requests of this process at once, and up to `queue` more wait for a slot
+for at most `max_wait` seconds. A request that finds the queue full, or whose wait runs
+out, is answered at once with 503 and a Retry-After header (a few seconds, with jitter so
+the retries don't arrive together) rather than holding a worker thread.
+
+Routes join a class with @limit("<class>"), placed below @jwt_required, @conditional and
+@cached, so unauthenticated requests, 304s and response cache hits never wait for a slot:
+
+    login      POST /login
+    submit     POST /api/surveys/<id>/submit_response
+    export     GET  /api/export-data
+    dashboard  GET  /api/dashboard/overall-stats, /api/dashboard/department-metrics
+
+Cheap reads (every other route) are never queued. Low-priority classes (exports) also
+give way to them: while ADMISSION_BUSY_IN_FLIGHT or more other requests are being
+handled by this process, a low-priority request is shed instead of taking a thread and
+a connection the reads need. "Other requests" are those past admission that are not
+low-priority themselves: requests queued for a slot are not counted, and neither are
+the probes and scrapes in EXEMPT_ENDPOINTS (/healthz, /readyz, /metrics).
+
+Limits apply per process; with serve.py each gunicorn worker has its own, so the
+totals are the limits times WEB_CONCURRENCY. Rejections, waits and the state of every
+class are in GET /metrics (lls_admission_*) and GET /api/admin/admission.
+
+Settings (environment):
+    ADMISSION_ENABLED=1
+    ADMISSION_LIMITS              overrides, "class=concurrency:queue:max_wait;...",
+                                  e.g. "login=2:4:3;export=1:0:0" (see DEFAULT_LIMITS)
+    ADMISSION_LOW_PRIORITY=export classes shed while the process is busy
+    ADMISSION_BUSY_IN_FLIGHT=3    other (not low-priority) requests in flight in this process that count as busy
+    ADMISSION_RETRY_AFTER=2       base Retry-After seconds; the header is 1-2x this
+"""
+import os
+import time
+import random
+import logging
+import threading
+from functools import wraps
+
+from flask import g, jsonify, request
+
+from http_cache import parse_policies
+from metrics import Counter, CallbackGauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+ADMISSION_BUSY_IN_FLIGHT = int(os.getenv("ADMISSION_BUSY_IN_FLIGHT", "3"))
+ADMISSION_RETRY_AFTER = float(os.getenv("ADMISSION_RETRY_AFTER", "2"))
+ADMISSION_LOW_PRIORITY = {name.strip() for name in os.getenv("ADMISSION_LOW_PRIORITY", "export").split(",") if name.strip()}
+
+# class -> "concurrency:queue:max_wait seconds", sized for a gthread worker with 4 threads (gunicorn.conf.py)
+DEFAULT_LIMITS = {
+    "login": "2:4:3",      # verify_password runs bcrypt on the request thread (security.py), a core each for ~0.3 s
+    "submit": "3:6:5",
+    "export": "1:0:0",     # one export at a time, never queued
+    "dashboard": "2:4:3",
+}
+
+# Health probes and metric scrapes: not counted as requests in flight
+EXEMPT_ENDPOINTS = {"healthz", "readyz", "metrics", "static"}
+
+BUSY_MESSAGE = "Server is busy, please retry shortly."
+
+WAIT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+ADMISSION_REJECTED = Counter(
+    "lls_admission_rejected_total", "Requests shed with 503 by reason (queue_full, timeout, low_priority).",
+    ("route_class", "reason"),
+)
+ADMISSION_WAIT = Histogram(
+    "lls_admission_wait_seconds", "Time admitted requests waited for a slot.", ("route_class",), buckets=WAIT_BUCKETS,
+)
+
+
+# --- Limiter ---
+
+class Limiter:
+    """At most `concurrency` holders; up to `queue` waiters, each for at most `max_wait` seconds."""
+
+    def __init__(self, name: str, concurrency: int, queue: int, max_wait: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition(threading.Lock())
+
+    def acquire(self):
+        """Returns None once a slot is held, or the reason it was refused ('queue_full', 'timeout')."""
+        with self._cond:
+            # Waiters woken by release() but not yet running still count, so a newcomer takes
+            # only a slot none of them will; it never jumps the queue nor waits beside a free slot
+            if self.concurrency - self.active > self.waiting:
+                self.active += 1
+                return None
+            if self.waiting >= self.queue or self.max_wait <= 0:
+                return "queue_full"
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + self.max_wait
+                while self.active >= self.concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        # A release() may have woken this waiter just as its wait ran out:
+                        # hand the wake-up on (at worst another waiter re-checks and sleeps again)
+                        self._cond.notify()
+                        return "timeout"
+                    self._cond.wait(remaining)
+                self.active += 1
+                return None
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def snapshot(self) -> dict:
+        return {"concurrency": self.concurrency, "queue": self.queue, "max_wait": self.max_wait,
+                "active": self.active, "waiting": self.waiting}
+
+
+def parse_limits(value: str) -> dict:
+    """"class=concurrency:queue:max_wait;..." -> {class: (concurrency, queue, max_wait)}; bad entries are logged and skipped."""
+    limits = {}
+    for name, spec in parse_policies(value).items():
+        try:
+            concurrency, queue, max_wait = spec.split(":")
+            limits[name] = (max(1, int(concurrency)), max(0, int(queue)), max(0.0, float(max_wait)))
+        except ValueError:
+            logger.warning("Ignoring admission limit %r: expected class=concurrency:queue:max_wait", f"{name}={spec}")
+    return limits
+
+
+# --- Controller ---
+
+class AdmissionController:
+    def __init__(self, limits: dict, low_priority=(), busy_in_flight: int = ADMISSION_BUSY_IN_FLIGHT):
+        self.limiters = {name: Limiter(name, *limit) for name, limit in limits.items()}
+        self.low_priority = set(low_priority)
+        self.busy_in_flight = busy_in_flight
+        self.in_flight = 0 # Requests being handled, other than low-priority, exempt and queued ones
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def admit(self, route_class: str, counted: bool):
+        """
+        Waits for a slot of `route_class`; `counted` says whether the request is in in_flight.
+        Returns (limiter, None) once admitted, or (None, reason).
+        """
+        if route_class in self.low_priority and self.in_flight >= self.busy_in_flight:
+            return None, "low_priority"
+        limiter = self.limiters[route_class]
+        started = time.perf_counter()
+        if counted:
+            self.leave() # A queued request is not work in flight
+        try:
+            reason = limiter.acquire()
+        finally:
+            if counted:
+                self.enter()
+        if reason is not None:
+            return None, reason
+        ADMISSION_WAIT.observe(time.perf_counter() - started, route_class)
+        return limiter, None
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "busy_in_flight": self.busy_in_flight,
+            "low_priority": sorted(self.low_priority),
+            "classes": {name: limiter.snapshot() for name, limiter in sorted(self.limiters.items())},
+        }
+
+
+def build_controller() -> AdmissionController:
+    limits = parse_limits(";".join(f"{name}={spec}" for name, spec in DEFAULT_LIMITS.items()))
+    limits.update(parse_limits(os.getenv("ADMISSION_LIMITS", "")))
+    return AdmissionController(limits, ADMISSION_LOW_PRIORITY)
+
+
+admission = build_controller()
+
+CallbackGauge("lls_admission_in_flight", "Requests holding a slot of the route class.", ("route_class",),
+              lambda: [((name,), limiter.active) for name, limiter in sorted(admission.limiters.items())])
+CallbackGauge("lls_admission_waiting", "Requests queued for a slot of the route class.", ("route_class",),
+              lambda: [((name,), limiter.waiting) for name, limiter in sorted(admission.limiters.items())])
+CallbackGauge("lls_admission_limit", "Concurrency limit of the route class.", ("route_class",),
+              lambda: [((name,), limiter.concurrency) for name, limiter in sorted(admission.limiters.items())])
+
+
+# --- Flask Integration ---
+
+def retry_after() -> str:
+    """Whole seconds between 1x and 2x ADMISSION_RETRY_AFTER, so shed clients don't retry in step."""
+    return str(max(1, round(ADMISSION_RETRY_AFTER * random.uniform(1.0, 2.0))))
+
+
+def shed(route_class: str, reason: str):
+    ADMISSION_REJECTED.inc(route_class, reason)
+    logger.warning("Shed %s %s (%s: %s)", request.method, request.path, route_class, reason)
+    response = jsonify({"detail": BUSY_MESSAGE})
+    response.status_code = 503
+    response.headers["Retry-After"] = retry_after()
+    return response
+
+
+def limit(route_class: str):
+    """Runs the view only once a slot of `route_class` is free; otherwise answers 503 + Retry-After."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ADMISSION_ENABLED or "admission_counted" not in g: # Off, or an app without init_app()
+                return func(*args, **kwargs)
+            limiter, reason = admission.admit(route_class, g.admission_counted)
+            if reason is not None:
+                return shed(route_class, reason)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                limiter.release()
+        # Read by init_app's hook; functools.wraps copies it onto the decorators above
+        wrapper.admission_class = route_class
+        return wrapper
+    return decorator
+
+
+def init_app(app):
+    """Counts the requests in flight, which low-priority classes give way to (see limit())."""
+    if not ADMISSION_ENABLED:
+        return
+
+    @app.before_request
+    def count_request():
+        # Low-priority requests are classified here and never counted, so they never see each other as load
+        view = app.view_functions.get(request.endpoint)
+        route_class = getattr(view, "admission_class", None)
+        g.admission_counted = request.endpoint not in EXEMPT_ENDPOINTS and route_class not in admission.low_priority
+        if g.admission_counted:
+            admission.enter()
+
+    @app.teardown_request
+    def uncount_request(exc=None):
+        if g.pop("admission_counted", None):
+            admission.leave()
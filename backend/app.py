@@ -2,7 +2,7 @@
 from dotenv import load_dotenv
 load_dotenv() # Load environment variables from .env file
 
-from flask import Flask, request, jsonify, make_response
+from flask import Flask, request, jsonify, make_response, g
 from flask_cors import CORS
 from sqlalchemy.orm import Session
 from flask_jwt_extended import create_access_token, JWTManager, jwt_required, get_jwt_identity, unset_jwt_cookies, set_access_cookies
@@ -11,49 +11,57 @@ import os
 import secrets
 import logging
 
-# Configure logging to show info messages
-logging.basicConfig(level=logging.INFO)
+# Structured JSON logging through a background queue (see logging_config.py)
+from logging_config import configure_logging
+import logging_config
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Import custom modules
-from security import verify_password, get_frontend_role, hash_password # hash_password added for initial user creation if needed
-from database import SessionLocal, engine, Base # Import Base and engine to potentially create tables here or in a script
+from security import verify_password, get_frontend_role, hash_password, JWT_SECRET_KEY, JWT_ACCESS_COOKIE_NAME # hash_password added for initial user creation if needed
+from database import SessionLocal, engine, Base, force_primary, release_read_target, track_request_sessions, close_request_sessions # Import Base and engine to potentially create tables here or in a script
+from json_provider import FastJSONProvider
+import compression
+import query_stats
+import metrics
+import slow_queries
+import profiling
+import warmup
+import health
+import admission
+from query_stats import query_budget
 from models import User, Department # Import models needed directly in app.py
 
 # Import blueprints for modular routing
 from routes.user_routes import user_bp
 from routes.permission_routes import permission_bp
 from routes.survey_routes import survey_bp
-
-app = Flask(__name__)
-
-# --- Flask Configuration ---
-app.secret_key = os.getenv("FLASK_SECRET_KEY", "another_super_secret_key_for_flask_CHANGE_THIS")
-
-# --- Flask-JWT-Extended Configuration ---
-app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "your_super_secret_jwt_key_CHANGE_THIS_IN_PRODUCTION")
-app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=1) # Token expires after 1 hour
-app.config["JWT_TOKEN_LOCATION"] = ["cookies"] # Store JWT in cookies
-app.config["JWT_COOKIE_SECURE"] = False # Set to True in production for HTTPS
-app.config["JWT_COOKIE_CSRF_PROTECT"] = False # Set to True in production with proper CSRF handling
-app.config["JWT_ACCESS_TOKEN_NAME"] = 'access_token_cookie' # Name of the access token cookie
-# For local development, set to 'localhost' or your frontend's domain/IP
-app.config["JWT_COOKIE_DOMAIN"] = 'localhost'
-app.config["JWT_COOKIE_PATH"] = '/' # Cookie valid for all paths
-
-jwt = JWTManager(app)
-# --- END JWT Configuration ---
-
-# Debugging JWT config (useful to see if env vars are loaded)
-print(f"DEBUG: app.config['JWT_SECRET_KEY'] is set to: {'***KEY_IS_SET***' if app.config['JWT_SECRET_KEY'] else '!!!KEY_IS_NOT_SET!!!'}")
-print(f"DEBUG: JWT_COOKIE_CSRF_PROTECT is: {app.config['JWT_COOKIE_CSRF_PROTECT']}")
-print(f"DEBUG: JWT_ACCESS_TOKEN_NAME is: {app.config['JWT_ACCESS_TOKEN_NAME']}")
-print(f"DEBUG: JWT_COOKIE_DOMAIN is: {app.config['JWT_COOKIE_DOMAIN']}")
-print(f"DEBUG: JWT_COOKIE_PATH is: {app.config['JWT_COOKIE_PATH']}")
-
-# --- CORS Configuration ---
-# Allow requests from your frontend development servers and allow credentials (cookies)
-CORS(app, resources={r"/*": {"origins": ["http://localhost:8080", "http://localhost:8081", "http://localhost:5173"]}}, supports_credentials=True)
+from routes.participation_routes import participation_bp
+from routes.admin_routes import admin_bp
+
+# --- Read Replica Override ---
+# Read-only routes are served from the replica when one is configured.
+# A client that must see its own latest writes can pin a request to the primary
+# with the 'X-Read-From: primary' header or the '?read_from=primary' query flag.
+def pin_request_to_primary():
+    if request.headers.get("X-Read-From") == "primary" or request.args.get("read_from") == "primary":
+        g.read_target_token = force_primary()
+
+def release_primary_pin(exc=None):
+    token = g.pop("read_target_token", None)
+    if token is not None:
+        release_read_target(token)
+
+# --- Request Sessions ---
+# Sessions opened while handling a request are closed when it ends, even on paths
+# that return without calling db.close(), so pooled connections are never leaked.
+def start_request_sessions():
+    g.request_sessions_token = track_request_sessions()
+
+def close_sessions(exc=None):
+    token = g.pop("request_sessions_token", None)
+    if token is not None:
+        close_request_sessions(token)
 
 # Helper function to get a database session for a request
 def get_db():
@@ -63,15 +71,16 @@ def get_db():
     finally:
         db.close()
 
-# --- Core Authentication Routes (not part of a blueprint, directly on app) ---
+# --- Core Authentication Routes (not part of a blueprint; registered on the app by create_app) ---
 
-@app.route("/login", methods=["POST"])
+@admission.limit("login")
+@query_budget(2)
 def login():
     db: Session = next(get_db())
     username = request.json.get("username", None)
     password = request.json.get("password", None)
 
-    logger.info(f"Login attempt for username: {username}") 
+    logger.debug("Login attempt for username: %s", username)
 
     user = db.query(User).filter(User.username == username).first()
 
@@ -97,23 +106,22 @@ def login():
         
         # Set the JWT access token as an HttpOnly cookie
         set_access_cookies(response, access_token)
-        logger.info(f"Login successful for {username}. Access cookie set.")
+        logger.info("Login successful for %s. Access cookie set.", username)
         return response
     else:
-        logger.warning(f"Login failed for username: {username}. Invalid credentials.")
+        logger.warning("Login failed for username: %s. Invalid credentials.", username)
         return jsonify({"detail": "Invalid username or password"}), 401
 
-@app.route("/logout", methods=["POST"])
 @jwt_required() # Requires a valid JWT to logout (protects against casual logout)
 def logout():
     response = make_response(jsonify({"message": "Successfully logged out"}), 200)
     # Remove the JWT cookie
     unset_jwt_cookies(response)
-    logger.info(f"User {get_jwt_identity()} logged out. Access cookie unset.")
+    logger.info("User %s logged out. Access cookie unset.", get_jwt_identity())
     return response
 
-@app.route("/verify_auth", methods=["GET"])
 @jwt_required(optional=True) # Allows endpoint to be accessed without a token, returns None for identity
+@query_budget(2)
 def verify_auth():
     db: Session = next(get_db())
     current_username = get_jwt_identity() # This will be None if no valid token is present or token is expired
@@ -131,28 +139,27 @@ def verify_auth():
                 "role": get_frontend_role(user.role),
                 "is_active": user.is_active
             }
-            logger.info(f"Verify Auth: User {current_username} authenticated and user data retrieved.")
+            logger.debug("Verify Auth: User %s authenticated and user data retrieved.", current_username)
             return jsonify({
                 "isAuthenticated": True,
                 "message": "Authenticated",
                 "user": user_data
             }), 200
         else:
-            logger.warning(f"Verify Auth: Token provided for user {current_username}, but user not found in DB.")
+            logger.warning("Verify Auth: Token provided for user %s, but user not found in DB.", current_username)
             # If user from token is not in DB, effectively not authenticated
             return jsonify({
                 "isAuthenticated": False,
                 "message": "User associated with token not found"
             }), 401
     else:
-        logger.info("Verify Auth: No valid token or token expired/invalid. Not authenticated.")
+        logger.debug("Verify Auth: No valid token or token expired/invalid. Not authenticated.")
         return jsonify({
             "isAuthenticated": False,
             "message": "Not authenticated or session expired"
         }), 401
 
 # --- Password Reset Request (for testing/development purposes, not production-ready without email service) ---
-@app.route("/request_password_reset", methods=["POST"])
 def request_password_reset():
     data = request.get_json()
     email = data.get("email")
@@ -166,31 +173,170 @@ def request_password_reset():
 
     if not user:
         # Avoid giving away if email exists. Send generic success message.
-        print(f"Password reset requested for non-existent email: {email}. (Simulated)")
+        logger.info("Password reset requested for non-existent email: %s. (Simulated)", email)
         return jsonify({"message": "If an account with that email exists, a password reset link has been sent."}), 200
 
     # In a real application, you would generate a secure token, store it with an expiry,
     # and send an email to the user with a link to reset their password.
     reset_token = secrets.token_urlsafe(32) 
-    print(f"\n--- SIMULATED Password Reset Link for {user.username} ({user.email}) ---")
-    print(f"Reset Link: http://localhost:8081/reset_password?token={reset_token}") # Frontend reset page URL
-    print("-------------------------------------------------------------------\n")
+    logger.info(
+        "SIMULATED password reset link for %s (%s): http://localhost:8081/reset_password?token=%s", # Frontend reset page URL
+        user.username, user.email, reset_token,
+    )
 
     return jsonify({"message": "If an account with that email exists, a password reset link has been sent."}), 200
 
 
-# --- Register Blueprints ---
-# Each blueprint handles a specific set of related routes (e.g., users, permissions, surveys)
-app.register_blueprint(user_bp)
-app.register_blueprint(permission_bp)
-app.register_blueprint(survey_bp)
-
 # --- Basic Home Route ---
-@app.route('/')
 def home():
     """Basic home route to confirm API is running."""
     return "Survey Backend API is running!"
 
+# --- Application Factory ---
+
+def register_core_routes(app):
+    app.add_url_rule("/login", view_func=login, methods=["POST"])
+    app.add_url_rule("/logout", view_func=logout, methods=["POST"])
+    app.add_url_rule("/verify_auth", view_func=verify_auth, methods=["GET"])
+    app.add_url_rule("/request_password_reset", view_func=request_password_reset, methods=["POST"])
+    app.add_url_rule("/", view_func=home)
+
+
+_background_services_started = False
+
+def start_background_services():
+    """Starts the optional in-process mail dispatcher and reminder scheduler (once per process)."""
+    global _background_services_started
+    if _background_services_started:
+        return
+    _background_services_started = True
+
+    # --- Background Mail Dispatcher ---
+    # Delivers queued outbox emails from this process. Alternatively run `python mailer.py` separately.
+    if os.getenv("MAIL_DISPATCHER_ENABLED", "0") == "1":
+        from mailer import start_background_dispatcher
+        start_background_dispatcher()
+
+    # --- Survey Reminder Scheduler ---
+    # Queues reminder emails for users who still owe surveys every REMINDER_INTERVAL_HOURS.
+    # Alternatively run `python participation.py remind` from cron.
+    if os.getenv("REMINDER_SCHEDULER_ENABLED", "0") == "1":
+        from participation import ReminderScheduler
+        ReminderScheduler().start()
+
+
+def create_app(warm_up: bool = None, background_services: bool = True) -> Flask:
+    """
+    Builds the Flask app. With warm_up (default: WARMUP_ENABLED), mappers, the connection
+    pool and the caches are primed before it is returned, so it serves its first request
+    warm (see warmup.py). background_services=False leaves the mail dispatcher and the
+    reminder scheduler to another process (serve.py runs several workers).
+    """
+    app = Flask(__name__)
+    # orjson-backed JSON with ISO 8601 datetimes (see json_provider.py)
+    app.json = FastJSONProvider(app)
+
+    # --- Flask Configuration ---
+    app.secret_key = os.getenv("FLASK_SECRET_KEY", "another_super_secret_key_for_flask_CHANGE_THIS")
+    # Larger request bodies (e.g. POST /api/users/import files) are refused with 413 before they are read
+    app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+
+    @app.errorhandler(413)
+    def request_too_large(error):
+        limit_mb = app.config["MAX_CONTENT_LENGTH"] / (1024 * 1024)
+        return jsonify({"message": f"Upload too large (limit {limit_mb:.3g} MB)."}), 413
+
+    # --- Flask-JWT-Extended Configuration ---
+    app.config["JWT_SECRET_KEY"] = JWT_SECRET_KEY # Shared with the ASGI read app (see security.py)
+    app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=1) # Token expires after 1 hour
+    app.config["JWT_TOKEN_LOCATION"] = ["cookies"] # Store JWT in cookies
+    app.config["JWT_COOKIE_SECURE"] = False # Set to True in production for HTTPS
+    app.config["JWT_COOKIE_CSRF_PROTECT"] = False # Set to True in production with proper CSRF handling
+    app.config["JWT_ACCESS_TOKEN_NAME"] = JWT_ACCESS_COOKIE_NAME # Name of the access token cookie
+    # For local development, set to 'localhost' or your frontend's domain/IP
+    app.config["JWT_COOKIE_DOMAIN"] = 'localhost'
+    app.config["JWT_COOKIE_PATH"] = '/' # Cookie valid for all paths
+
+    JWTManager(app)
+    # --- END JWT Configuration ---
+
+    # Debugging JWT config (useful to see if env vars are loaded; LOG_LEVEL=DEBUG)
+    logger.debug(
+        "JWT config: secret key %s, CSRF protect %s, cookie name %s, cookie domain %s, cookie path %s",
+        "set" if app.config["JWT_SECRET_KEY"] else "NOT SET", app.config["JWT_COOKIE_CSRF_PROTECT"],
+        app.config["JWT_ACCESS_TOKEN_NAME"], app.config["JWT_COOKIE_DOMAIN"], app.config["JWT_COOKIE_PATH"],
+    )
+
+    # --- Request IDs & Access Log ---
+    # Registered first so every later hook and handler logs with the request's ID.
+    logging_config.init_app(app)
+
+    # --- Admission Control ---
+    # Counts requests in flight; routes marked @admission.limit have concurrency limits with bounded
+    # queues, and overflow is shed with 503 + Retry-After (see admission.py).
+    admission.init_app(app)
+
+    # --- CORS Configuration ---
+    # Allow requests from your frontend development servers and allow credentials (cookies)
+    CORS(app, resources={r"/*": {"origins": ["http://localhost:8080", "http://localhost:8081", "http://localhost:5173"]}}, supports_credentials=True)
+
+    app.before_request(pin_request_to_primary)
+    app.teardown_request(release_primary_pin)
+    app.before_request(start_request_sessions)
+    app.teardown_request(close_sessions)
+
+    # --- Query Budgets ---
+    # Counts the SQL statements of every request and flags routes over their query budget
+    # or repeating one statement in a loop (N+1). See query_stats.py for the settings.
+    query_stats.init_app(app)
+
+    # --- Slow Query Log ---
+    # Statements over SLOW_QUERY_MS are kept with their plans for GET /api/admin/slow-queries (see slow_queries.py).
+    slow_queries.init_engines()
+
+    # --- Response Compression ---
+    # gzip/brotli for JSON and text bodies of at least COMPRESS_MIN_BYTES (see compression.py).
+    compression.init_app(app)
+
+    # --- Request Profiling ---
+    # Requests sent with an admin-issued profile token are sampled and saved as flamegraph input (see profiling.py).
+    profiling.init_app(app)
+
+    # --- Metrics ---
+    # Request, SQL, pool and job metrics in the Prometheus text format at GET /metrics (see metrics.py).
+    metrics.init_app(app)
+
+    # --- Health Checks ---
+    # GET /healthz (liveness) and GET /readyz (database reachable) for load balancers (see health.py).
+    health.init_app(app)
+
+    # --- Routes ---
+    # Each blueprint handles a specific set of related routes (e.g., users, permissions, surveys)
+    register_core_routes(app)
+    app.register_blueprint(user_bp)
+    app.register_blueprint(permission_bp)
+    app.register_blueprint(survey_bp)
+    app.register_blueprint(participation_bp)
+    app.register_blueprint(admin_bp)
+
+    if background_services:
+        start_background_services()
+
+    # --- Warm-up ---
+    # Mappers, pooled connections, the permission index and the response cache (see warmup.py).
+    if warm_up if warm_up is not None else warmup.WARMUP_ENABLED:
+        warmup.warm_up(app)
+    return app
+
+
+def __getattr__(name):
+    # `from app import app` and `flask --app app run` keep working: the module-level app
+    # is only built (once) when it is first asked for, not when the module is imported.
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # --- Application Entry Point ---
 if __name__ == '__main__':
     # You might want to run create_tables() here on initial setup if your DB isn't pre-created
@@ -198,9 +344,12 @@ if __name__ == '__main__':
     # with app.app_context(): # Run within app context if using Flask-specific features
     #     create_tables()
 
-    logger.info(f"Flask app running on http://127.0.0.1:5000")
+    # Development server only: one process, with the debugger when FLASK_DEBUG=1.
+    # Production runs the app under several worker processes with `python serve.py` (see serve.py).
+    app = create_app()
+    logger.info("Flask app running on http://127.0.0.1:5000 (development server; use serve.py in production)")
     # Run the Flask development server
     # host='0.0.0.0' makes the server accessible from other machines on the network
     # (e.g., if you're testing from another device or within a Docker container).
     # For typical local development, '127.0.0.1' or no host argument (defaulting to localhost) is fine.
-    app.run(debug=True, port=5000, host='0.0.0.0')
+    app.run(debug=os.getenv("FLASK_DEBUG", "1") == "1", port=5000, host='0.0.0.0')
@@ -0,0 +1,140 @@
+# asgi.py
+"""
+ASGI serving mode for the read-heavy endpoints.
+
+The Flask app (app.py, served by serve.py) holds a worker thread for every request,
+including the whole time that request waits on SQL Server. This app serves the slow,
+read-only routes on asyncio instead (routes/async_routes.py):
+
+    GET /api/surveys                      GET /api/dashboard/overall-stats
+    GET /api/surveys/<id>                 GET /api/dashboard/department-metrics
+    GET /api/remarks/incoming             GET /api/surveyable-departments
+    GET /api/remarks/outgoing             GET /api/events   (Server-Sent Events)
+
+A process multiplexes hundreds of concurrent reads over one async connection pool
+(async_database.py). The app uses the same models, JSON format, JWT cookie and ETags as
+the Flask app. Run both side by side and let the reverse proxy send these paths here,
+and everything else (login, writes, exports, admin) to the Flask app:
+
+    cd backend
+    uvicorn asgi:app --host 0.0.0.0 --port 5001 --workers 2
+
+/healthz and /readyz behave like health.py's. bench/parity.py checks every route
+against the Flask app.
+
+Not done here (Flask app only): the in-process response cache, query budgets, the
+slow-query log, profiling and /metrics.
+
+Settings (environment): those of database.py, plus
+    DB_ASYNC_POOL_SIZE        async connections per process (profile default: 50 prod, 10 dev)
+    SSE_POLL_SECONDS=2        how often a process checks the data versions for /api/events
+    SSE_HEARTBEAT_SECONDS=15  comment line sent on idle event streams
+    WARMUP_ENABLED=1          open WARMUP_POOL_CONNECTIONS connections and build the permission index at start-up
+"""
+from dotenv import load_dotenv
+load_dotenv() # Before the modules below read their settings
+
+import os
+import time
+import logging
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from sqlalchemy import text
+
+import logging_config
+from logging_config import configure_logging
+configure_logging()
+
+import compression
+import warmup
+import async_database
+from permission_index import permission_index
+from routes.async_routes import router, AuthError, FastJSONResponse
+
+logger = logging.getLogger(__name__)
+
+# The Flask app's CORS origins (app.py)
+CORS_ORIGINS = ["http://localhost:8080", "http://localhost:8081", "http://localhost:5173"]
+
+
+# --- Start-up and Shutdown ---
+
+async def warm_up():
+    """Mappers, async pool connections and the permission index (see warmup.py)."""
+    started = time.perf_counter()
+    warmup.configure_mappers()
+    engine = async_database.async_engine
+    connections = min(warmup.WARMUP_POOL_CONNECTIONS, engine.pool.size()) if hasattr(engine.pool, "size") else 1
+    opened = []
+    try:
+        for _ in range(connections): # Held open together, so the pool keeps `connections` of them
+            conn = await engine.connect()
+            opened.append(conn)
+            await conn.execute(text("SELECT 1"))
+        await to_thread.run_sync(permission_index.snapshot)
+    except Exception as e:
+        logger.warning("Warm-up failed: %s", e)
+    finally:
+        for conn in opened:
+            await conn.close()
+    logger.info("Warm-up finished in %.0f ms", (time.perf_counter() - started) * 1000)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if warmup.WARMUP_ENABLED:
+        await warm_up()
+    yield
+    await async_database.dispose_engines()
+
+
+# --- Health Checks ---
+
+async def healthz():
+    return FastJSONResponse({"status": "ok", "pid": os.getpid()})
+
+
+async def readyz():
+    started = time.perf_counter()
+    try:
+        async with async_database.async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        database = {"ok": True}
+    except Exception as e:
+        database = {"ok": False, "error": str(e).splitlines()[0] if str(e) else type(e).__name__}
+    database["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    if not database["ok"]:
+        logger.warning("Readiness check failed: %s", database["error"])
+    return FastJSONResponse({"status": "ready" if database["ok"] else "unavailable", "pid": os.getpid(), "database": database},
+                            status_code=200 if database["ok"] else 503)
+
+
+# --- Application Factory ---
+
+async def handle_auth_error(request, exc: AuthError):
+    return FastJSONResponse({"msg": exc.message}, status_code=exc.status_code)
+
+
+def create_asgi_app() -> FastAPI:
+    app = FastAPI(title="LLS Survey (read API)", lifespan=lifespan, default_response_class=FastJSONResponse,
+                  docs_url=None, redoc_url=None, openapi_url=None)
+    app.add_exception_handler(AuthError, handle_auth_error)
+    app.include_router(router)
+    app.add_api_route("/healthz", healthz, methods=["GET"])
+    app.add_api_route("/readyz", readyz, methods=["GET"])
+
+    # Added last = outermost: every response (errors included) carries the request ID
+    if compression.COMPRESS_ENABLED:
+        app.add_middleware(GZipMiddleware, minimum_size=compression.COMPRESS_MIN_BYTES,
+                           compresslevel=compression.COMPRESS_GZIP_LEVEL)
+    app.add_middleware(CORSMiddleware, allow_origins=CORS_ORIGINS, allow_credentials=True,
+                       allow_methods=["*"], allow_headers=["*"])
+    app.add_middleware(logging_config.RequestLogMiddleware)
+    return app
+
+
+app = create_asgi_app()
@@ -0,0 +1,49 @@
+# async_database.py
+"""
+Async engines and sessions for the ASGI read app (asgi.py).
+
+The engines are built by database.make_engine(is_async=True) from the same DATABASE_URL,
+REPLICA_DATABASE_URL and DB_PROFILE as the sync ones, on the matching asyncio driver
+(mssql+aioodbc, sqlite+aiosqlite). They use the same models.py mappings and schema
+translation. A request waiting on SQL holds only a pooled connection, not a thread, so
+one process serves many slow reads at once. DB_ASYNC_POOL_SIZE (async_pool_size in the
+profile) caps how many run their queries concurrently.
+
+read_session() opens a read-only AsyncSession on the replica when it is configured and
+healthy (database.replica_health), otherwise on the primary. Handlers must load
+relationships eagerly (joinedload/selectinload): lazy loads raise under asyncio.
+"""
+import logging
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import database
+
+logger = logging.getLogger(__name__)
+
+async_engine = database.make_engine(database.DATABASE_URL, is_async=True)
+async_replica_engine = (
+    database.make_engine(database.REPLICA_DATABASE_URL, is_async=True) if database.REPLICA_DATABASE_URL else None
+)
+
+
+async def read_engine():
+    """The replica engine while the replica is usable, otherwise the primary."""
+    if async_replica_engine is not None:
+        # The health check may probe the replica over the sync engine; keep that off the event loop
+        if await to_thread.run_sync(database.replica_health.is_usable):
+            return async_replica_engine
+    return async_engine
+
+
+@asynccontextmanager
+async def read_session():
+    async with AsyncSession(bind=await read_engine(), expire_on_commit=False) as session:
+        yield session
+
+
+async def dispose_engines():
+    for engine in filter(None, (async_engine, async_replica_engine)):
+        await engine.dispose()
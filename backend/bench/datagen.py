@@ -0,0 +1,420 @@
+# bench/datagen.py
+"""
+Deterministic synthetic dataset for load tests and benchmarks.
+
+Fills every table in models.py: departments, users, the permission matrix,
+surveys with questions and options, submissions, answers (low ratings carry a
+remark) and remark responses. The same scale and seed always produce the same
+rows, so benchmark runs are comparable.
+
+    cd backend
+    python -m bench.datagen --scale large --out /tmp/lls_large.db
+    python -m bench.datagen --scale small --departments 5 --out /tmp/tiny.db
+
+Benchmarks use it as their shared fixture:
+
+    from bench.datagen import ensure_dataset
+    url = ensure_dataset("medium")      # built once, reused while the parameters match
+
+The schema is created with the Alembic migrations, and rows are loaded with bulk
+Core inserts (executemany) in chunks, with explicit primary keys, so "large"
+(10M answers) loads in minutes on SQLite. Every user's password is
+BENCH_PASSWORD; user 1 ("admin") is an admin.
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import insert, select, func
+
+from database import make_engine
+from models import Department, User, Permission, Survey, Question, Option, SurveySubmission, Answer, RemarkResponse
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DATA_DIR = os.getenv("BENCH_DATA_DIR", os.path.join(tempfile.gettempdir(), "lls_bench"))
+BENCH_PASSWORD = "password"
+# A fixed bcrypt hash of BENCH_PASSWORD (hashing at generation time would use a random salt)
+BENCH_PASSWORD_HASH = "$2b$12$p8xmOmwE90zKMaoPSRqxluzXO3neuvC86Gz9YQN9Xt.xvIYTPxXXS"
+GENERATOR_VERSION = 2 # Bump when the generated data or the schema changes, so cached datasets are rebuilt
+
+SCALES = {
+    "small": {
+        "departments": 10, "users_per_department": 20, "surveys_per_department": 1,
+        "questions_per_survey": 10, "submissions_per_survey": 50,
+    },
+    "medium": {
+        "departments": 40, "users_per_department": 100, "surveys_per_department": 2,
+        "questions_per_survey": 15, "submissions_per_survey": 1000,
+    },
+    "large": { # 500 surveys x 1,000 submissions x 20 questions = 10M answers
+        "departments": 100, "users_per_department": 300, "surveys_per_department": 5,
+        "questions_per_survey": 20, "submissions_per_survey": 1000,
+    },
+}
+
+DEFAULTS = {
+    "multiple_choice_share": 0.1,   # share of questions that are multiple choice (the rest are rated 1-4)
+    "options_per_question": 4,
+    "low_rating_share": 0.12,       # average share of ratings that are 1 or 2 (varies per department)
+    "response_share": 0.6,          # share of low-rated remarks the rated department has responded to
+    "history_days": 365,            # submissions are spread over this many days before the anchor
+    "anchor": "2026-10-01",         # fixed reference date, so the data doesn't depend on today's date
+}
+
+CHUNK_SIZE = 20000 # rows per executemany
+
+DEPARTMENT_NAMES = [
+    "HR", "IT", "Sales", "Marketing", "Finance", "Operations", "Customer Service",
+    "Research & Development", "Legal", "Procurement", "Logistics", "Quality Assurance",
+    "Production", "Maintenance", "Stores", "Planning", "Design", "Tooling", "Security", "Admin",
+]
+FIRST_NAMES = ["Arun", "Priya", "Karthik", "Divya", "Vignesh", "Meena", "Suresh", "Lakshmi", "Rahul", "Anitha",
+               "Ganesh", "Deepa", "Manoj", "Kavya", "Sanjay", "Revathi", "Prakash", "Nithya", "Ramesh", "Swathi"]
+LAST_NAMES = ["Kumar", "Raman", "Subramanian", "Iyer", "Natarajan", "Krishnan", "Murugan", "Srinivasan",
+              "Balaji", "Pillai", "Rajan", "Venkatesh", "Shankar", "Mohan", "Gopal"]
+
+QUESTIONS = {
+    "Quality": ["How would you rate the quality of work delivered by {dept}?",
+                "How accurate and complete are the deliverables from {dept}?"],
+    "Delivery": ["How well does {dept} meet agreed timelines?",
+                 "How reliable is {dept} in delivering on commitments?"],
+    "Communication": ["How clearly does {dept} communicate status and changes?",
+                      "How easy is it to reach the right person in {dept}?"],
+    "Responsiveness": ["How quickly does {dept} respond to your requests?",
+                       "How effectively does {dept} handle escalations?"],
+    "Improvement": ["How well does {dept} act on feedback?",
+                    "How proactive is {dept} in improving its processes?"],
+}
+OPTION_TEXTS = ["Always", "Usually", "Sometimes", "Rarely", "Never", "Not applicable"]
+LOW_RATING_REMARKS = {
+    "Quality": ["Deliverables often need rework before we can use them.",
+                "Several errors in the last few reports went unnoticed.",
+                "Output quality varies a lot depending on who handles the request."],
+    "Delivery": ["Deadlines slipped twice this quarter without prior notice.",
+                 "We had to follow up repeatedly to get the material on time.",
+                 "Lead times are much longer than what was agreed."],
+    "Communication": ["We only hear about changes after they have happened.",
+                      "Emails go unanswered for days.",
+                      "It is unclear who the point of contact is for our requests."],
+    "Responsiveness": ["Tickets stay open for weeks without an update.",
+                       "Urgent requests are treated the same as routine ones.",
+                       "Escalations take too long to be acknowledged."],
+    "Improvement": ["The same issues were raised in the last survey and nothing changed.",
+                    "Suggestions are acknowledged but never followed up.",
+                    "No visible action on the feedback we shared."],
+}
+ACTION_PLANS = ["Weekly review meeting set up with the requesting department.",
+                "Checklist introduced before handing over deliverables.",
+                "Single point of contact assigned and shared with all departments.",
+                "Ticket SLA dashboard introduced and reviewed every Monday.",
+                "Root cause analysis done; process updated and team briefed."]
+EXPLANATIONS = ["Staff shortage during the period led to delays.",
+                "Requirements were not clear at the start of the request.",
+                "A system outage affected turnaround during that month.",
+                "New team members were still being trained.",
+                "Priorities changed mid-way due to an audit."]
+
+
+def resolve_params(scale: str = "small", seed: int = 1, **overrides) -> dict:
+    if scale not in SCALES:
+        raise ValueError(f"Unknown scale '{scale}'. Expected one of: {', '.join(SCALES)}")
+    params = {**DEFAULTS, **SCALES[scale], "scale": scale, "seed": seed}
+    params.update({key: value for key, value in overrides.items() if value is not None})
+    return params
+
+
+def _insert_chunks(conn, model, rows):
+    table = model.__table__
+    for i in range(0, len(rows), CHUNK_SIZE):
+        conn.execute(insert(table), rows[i:i + CHUNK_SIZE])
+
+
+class DatasetGenerator:
+    def __init__(self, params: dict):
+        self.p = params
+        self.rng = random.Random(params["seed"])
+        self.anchor = datetime.fromisoformat(params["anchor"])
+        self.counts = {}
+
+    # --- Reference data ---
+
+    def _departments(self):
+        names = []
+        for i in range(self.p["departments"]):
+            base = DEPARTMENT_NAMES[i % len(DEPARTMENT_NAMES)]
+            names.append(base if i < len(DEPARTMENT_NAMES) else f"{base} {i // len(DEPARTMENT_NAMES) + 1}")
+        created_at = self.anchor - timedelta(days=self.p["history_days"] + 30)
+        return [{"id": i + 1, "name": name, "created_at": created_at} for i, name in enumerate(names)]
+
+    def _users(self, departments):
+        hashed = BENCH_PASSWORD_HASH # Shared by every generated user
+        per_department = self.p["users_per_department"]
+        rows = []
+        for dept in departments:
+            for n in range(per_department):
+                user_id = len(rows) + 1
+                first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+                rows.append({
+                    "id": user_id,
+                    "username": "admin" if user_id == 1 else f"user{user_id:06d}",
+                    "name": f"{first} {last}",
+                    "email": f"{first.lower()}.{last.lower()}.{user_id}@lls.com",
+                    "department": dept["name"],
+                    "department_id": dept["id"],
+                    "hashed_password": hashed,
+                    "role": "admin" if user_id == 1 else ("Manager" if n == 0 else "Rep"),
+                    "created_at": dept["created_at"] + timedelta(days=self.rng.randint(0, 30)),
+                    "is_active": user_id == 1 or self.rng.random() > 0.02,
+                })
+        return rows
+
+    def _permissions(self, departments):
+        # Every department may survey every other department, in a window that is open around the anchor
+        start = self.anchor - timedelta(days=self.p["history_days"])
+        end = self.anchor + timedelta(days=5 * 365)
+        rows = []
+        for from_dept in departments:
+            for to_dept in departments:
+                if from_dept["id"] != to_dept["id"]:
+                    rows.append({"id": len(rows) + 1, "from_dept_id": from_dept["id"], "to_dept_id": to_dept["id"],
+                                 "start_date": start, "end_date": end, "can_survey_self": False, "created_at": start})
+        return rows
+
+    def _surveys(self, departments):
+        surveys, questions, options = [], [], []
+        categories = list(QUESTIONS)
+        for dept in departments:
+            for n in range(self.p["surveys_per_department"]):
+                survey_id = len(surveys) + 1
+                surveys.append({
+                    "id": survey_id,
+                    "title": f"{dept['name']} Internal Customer Survey" + (f" {n + 1}" if n else ""),
+                    "description": f"Internal customer satisfaction survey for {dept['name']}.",
+                    "created_at": dept["created_at"],
+                    "rated_department_id": dept["id"],
+                    "managing_department_id": 1,
+                })
+                for order in range(1, self.p["questions_per_survey"] + 1):
+                    category = categories[(order - 1) % len(categories)]
+                    is_choice = self.rng.random() < self.p["multiple_choice_share"]
+                    question_id = len(questions) + 1
+                    questions.append({
+                        "id": question_id,
+                        "survey_id": survey_id,
+                        "text": self.rng.choice(QUESTIONS[category]).format(dept=dept["name"]),
+                        "type": "multiple_choice" if is_choice else "rating",
+                        "order": order,
+                        "category": category,
+                    })
+                    if is_choice:
+                        for option_order, text in enumerate(OPTION_TEXTS[:self.p["options_per_question"]], start=1):
+                            options.append({"id": len(options) + 1, "question_id": question_id, "text": text,
+                                            "value": str(option_order), "order": option_order})
+        return surveys, questions, options
+
+    # --- Submissions ---
+
+    def _rating_weights(self, departments):
+        """Cumulative weights of ratings 1-4 per rated department; some departments get more low ratings."""
+        cumulative = {}
+        for dept in departments:
+            low = min(0.6, max(0.0, self.rng.gauss(self.p["low_rating_share"], self.p["low_rating_share"] / 2)))
+            weights = [low * 0.35, low * 0.65, (1 - low) * 0.45, (1 - low) * 0.55]
+            cumulative[dept["id"]] = list(accumulate(weights))
+        return cumulative
+
+    def _load_submissions(self, conn, departments, users, surveys, questions, options):
+        per_department = self.p["users_per_department"]
+        total_users = len(users)
+        names_by_dept = {dept["id"]: [u["name"] for u in users[(dept["id"] - 1) * per_department:dept["id"] * per_department]]
+                         for dept in departments}
+        questions_by_survey = {}
+        for question in questions:
+            questions_by_survey.setdefault(question["survey_id"], []).append(question)
+        option_ids_by_question = {}
+        for option in options:
+            option_ids_by_question.setdefault(option["question_id"], []).append(option["id"])
+        weights = self._rating_weights(departments)
+        history_seconds = self.p["history_days"] * 86400
+        rng = self.rng
+
+        submissions, answers, responses = [], [], []
+        counts = {"survey_submissions": 0, "survey_answers": 0, "remark_responses": 0}
+
+        def flush():
+            _insert_chunks(conn, SurveySubmission, submissions)
+            _insert_chunks(conn, Answer, answers)
+            _insert_chunks(conn, RemarkResponse, responses)
+            counts["survey_submissions"] += len(submissions)
+            counts["survey_answers"] += len(answers)
+            counts["remark_responses"] += len(responses)
+            submissions.clear(); answers.clear(); responses.clear()
+
+        for survey in surveys:
+            rated = survey["rated_department_id"]
+            cumulative = weights[rated]
+            survey_questions = questions_by_survey[survey["id"]]
+            # Submitters: distinct users outside the rated department (whose IDs are one contiguous block)
+            block_start = (rated - 1) * per_department + 1
+            eligible = total_users - per_department
+            picks = rng.sample(range(eligible), min(self.p["submissions_per_survey"], eligible))
+            for pick in picks:
+                user_id = pick + 1 if pick + 1 < block_start else pick + 1 + per_department
+                submission_id = counts["survey_submissions"] + len(submissions) + 1
+                submitted_at = self.anchor - timedelta(seconds=rng.randrange(history_seconds))
+                ratings = []
+                for question in survey_questions:
+                    answer = {"id": counts["survey_answers"] + len(answers) + 1, "submission_id": submission_id,
+                              "question_id": question["id"], "rating_value": None, "text_response": None,
+                              "selected_option_id": None}
+                    if question["type"] == "multiple_choice":
+                        answer["selected_option_id"] = rng.choice(option_ids_by_question[question["id"]])
+                    else:
+                        rating = bisect(cumulative, rng.random() * cumulative[-1]) + 1
+                        answer["rating_value"] = rating
+                        ratings.append(rating)
+                        if rating <= 2: # The survey form requires a remark for ratings 1 and 2
+                            answer["text_response"] = rng.choice(LOW_RATING_REMARKS[question["category"]])
+                            if rng.random() < self.p["response_share"]:
+                                responses.append({
+                                    "id": counts["remark_responses"] + len(responses) + 1,
+                                    "survey_submission_id": submission_id,
+                                    "question_id": question["id"],
+                                    "explanation": rng.choice(EXPLANATIONS),
+                                    "action_plan": rng.choice(ACTION_PLANS),
+                                    "responsible_person": rng.choice(names_by_dept[rated]),
+                                    "responded_at": submitted_at + timedelta(days=rng.randint(1, 21)),
+                                    "responded_by_department_id": rated,
+                                })
+                    answers.append(answer)
+                submissions.append({
+                    "id": submission_id,
+                    "survey_id": survey["id"],
+                    "submitter_user_id": user_id,
+                    "submitted_at": submitted_at,
+                    "submitter_department_id": users[user_id - 1]["department_id"],
+                    "rated_department_id": rated,
+                    # Percentage of the maximum rating, the scale get_rating_description() expects
+                    "overall_customer_rating": round(sum(ratings) / (4 * len(ratings)) * 100, 2) if ratings else None,
+                    "rating_description": None,
+                    "suggestions": rng.choice(["", "", "Keep up the good work.", "Please share a monthly status update."]),
+                })
+                if len(answers) >= CHUNK_SIZE * 5:
+                    flush()
+        flush()
+        return counts
+
+    # --- Entry point ---
+
+    def load(self, engine):
+        """Loads the dataset into an empty, migrated database. Returns row counts per table."""
+        with engine.connect() as conn:
+            if conn.execute(select(func.count()).select_from(Department)).scalar_one():
+                raise RuntimeError("The target database already has data; generate into an empty database.")
+
+        with engine.connect() as conn:
+            if conn.dialect.name == "sqlite":
+                # Bulk-load settings for this connection only; integrity is guaranteed by construction
+                conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+                conn.exec_driver_sql("PRAGMA synchronous=OFF")
+                conn.exec_driver_sql("PRAGMA cache_size=-200000")
+                conn.commit()
+            with conn.begin():
+                departments = self._departments()
+                users = self._users(departments)
+                permissions = self._permissions(departments)
+                surveys, questions, options = self._surveys(departments)
+                for model, rows in ((Department, departments), (User, users), (Permission, permissions),
+                                    (Survey, surveys), (Question, questions), (Option, options)):
+                    _insert_chunks(conn, model, rows)
+                    self.counts[model.__tablename__] = len(rows)
+                self.counts.update(self._load_submissions(conn, departments, users, surveys, questions, options))
+            if conn.dialect.name == "sqlite":
+                conn.exec_driver_sql("ANALYZE") # Planner statistics, as a production database would have
+                conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+                conn.commit()
+        return self.counts
+
+
+def migrate(engine):
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    with engine.begin() as conn:
+        config.attributes["connection"] = conn
+        command.upgrade(config, "head")
+
+
+def build(path: str, params: dict) -> dict:
+    """Creates a fresh SQLite database at `path` with the dataset. Returns its metadata."""
+    for suffix in ("", "-wal", "-shm", ".json"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    engine = make_engine(f"sqlite:///{path}", profile="bench")
+    try:
+        started = time.perf_counter()
+        migrate(engine)
+        counts = DatasetGenerator(params).load(engine)
+        seconds = round(time.perf_counter() - started, 1)
+    finally:
+        engine.dispose()
+    meta = {"generator_version": GENERATOR_VERSION, "params": params, "counts": counts, "seconds": seconds}
+    with open(path + ".json", "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def ensure_dataset(scale: str = "small", seed: int = 1, path: str = None, **overrides) -> str:
+    """
+    Returns a SQLite URL for the dataset with these parameters, building it only when no
+    matching database exists yet (the parameters are kept next to it in <path>.json).
+    """
+    params = resolve_params(scale, seed, **overrides)
+    path = path or os.path.join(BENCH_DATA_DIR, f"lls_{scale}_seed{seed}.db")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    try:
+        with open(path + ".json") as f:
+            meta = json.load(f)
+        current = os.path.exists(path) and meta["generator_version"] == GENERATOR_VERSION and meta["params"] == params
+    except (OSError, ValueError, KeyError):
+        current = False
+    if not current:
+        build(path, params)
+    return f"sqlite:///{path}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic LLS Survey dataset (SQLite).")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="SQLite file to create (default: BENCH_DATA_DIR/lls_<scale>_seed<seed>.db)")
+    for name in ("departments", "users_per_department", "surveys_per_department", "questions_per_survey",
+                 "submissions_per_survey", "options_per_question", "history_days"):
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, type=int)
+    for name in ("multiple_choice_share", "low_rating_share", "response_share"):
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, type=float)
+    parser.add_argument("--anchor", help="Reference date (YYYY-MM-DD) the submission history ends at")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if a matching dataset exists")
+    args = parser.parse_args()
+
+    overrides = {key: value for key, value in vars(args).items()
+                 if key not in ("scale", "seed", "out", "force")}
+    params = resolve_params(args.scale, args.seed, **overrides)
+    path = args.out or os.path.join(BENCH_DATA_DIR, f"lls_{args.scale}_seed{args.seed}.db")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if args.force:
+        meta = build(path, params)
+    else:
+        ensure_dataset(args.scale, args.seed, path=path, **overrides)
+        with open(path + ".json") as f:
+            meta = json.load(f)
+    for table, count in meta["counts"].items():
+        print(f"{table:<20} {count:>12,}")
+    print(f"sqlite:///{path} (built in {meta['seconds']}s)")
@@ -0,0 +1,488 @@
+# bench/http_bench.py
+"""
+End-to-end HTTP benchmark for the backend routes.
+
+Boots the Flask app in a separate process against a copy of a generated dataset
+(bench/datagen.py) on the SQLite stand-in, logs in one user per client thread and
+drives each route with the given concurrency. Per route it reports throughput,
+p50/p95/p99 latency, SQL queries per request, and the server's peak RSS.
+
+    cd backend
+    python -m bench.http_bench --scale small --concurrency 4
+    python -m bench.http_bench --routes surveys,remarks_incoming --requests 500 --out run.json
+    python -m bench.http_bench --baseline bench/baseline.json          # exit 1 on regressions
+    python -m bench.http_bench --url http://localhost:5000 ...          # an already running server
+    python -m bench.http_bench --workers 4                               # under serve.py (gunicorn)
+
+The server process counts the queries of each request (X-Query-Count header, see query_stats.py)
+and reports its peak RSS at /__bench__/stats. Against --url servers those are
+reported when the server provides them, otherwise as null. With --workers the app runs
+under serve.py with that many worker processes; queries are still counted, the peak RSS
+is not reported (each worker has its own).
+
+Admission control (admission.py) is off in the servers started here, so every route is
+measured rather than shed; set ADMISSION_ENABLED=1 to benchmark with it. Requests shed
+with 503 + Retry-After (by a --url server, or with admission on) are counted as "shed",
+not as errors, and are left out of the latency and throughput figures.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import http.client
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUERY_COUNT_HEADER = "X-Query-Count"
+STATS_PATH = "/__bench__/stats"
+
+Scenario = namedtuple("Scenario", "name method path body requests")
+
+# name, method, path(worker), body(worker) or None, default request count.
+# Mutating routes draw their targets from the worker's fixture lists.
+SCENARIOS = [
+    Scenario("login", "POST", lambda w: "/login",
+             lambda w: {"username": w.username, "password": w.password}, 20), # bcrypt bound
+    Scenario("verify_auth", "GET", lambda w: "/verify_auth", None, 200),
+    Scenario("surveys", "GET", lambda w: "/api/surveys", None, 200),
+    Scenario("survey_detail", "GET", lambda w: f"/api/surveys/{w.rng.choice(w.survey_ids)}", None, 200),
+    Scenario("submit", "POST", lambda w: f"/api/surveys/{w.next_submission()[0]}/submit_response",
+             lambda w: w.submission_body(), 100),
+    Scenario("my_submissions", "GET", lambda w: "/api/survey_submissions", None, 200),
+    Scenario("remarks_incoming", "GET", lambda w: "/api/remarks/incoming", None, 50),
+    Scenario("remarks_outgoing", "GET", lambda w: "/api/remarks/outgoing", None, 50),
+    Scenario("remarks_respond", "POST", lambda w: "/api/remarks/respond", lambda w: w.remark_response_body(), 100),
+    Scenario("dashboard_overall", "GET", lambda w: "/api/dashboard/overall-stats", None, 50),
+    Scenario("dashboard_departments", "GET", lambda w: "/api/dashboard/department-metrics", None, 50),
+    Scenario("export_my_submissions", "GET", lambda w: "/api/export-data?type=My+Submitted+Surveys&timePeriod=last_30_days", None, 5),
+    Scenario("export_ratings", "GET", lambda w: "/api/export-data?type=Department+Ratings&timePeriod=last_30_days", None, 5),
+    Scenario("export_remarks", "GET", lambda w: "/api/export-data?type=Submitted+Remarks+Only&timePeriod=last_30_days", None, 5),
+]
+SCENARIOS_BY_NAME = {scenario.name: scenario for scenario in SCENARIOS}
+
+
+# --- Server process ---
+
+def serve(db_url: str, port: int):
+    """Runs the app on 127.0.0.1:port with per-request query counting (used as the benchmark's server process)."""
+    os.environ["DATABASE_URL"] = db_url
+    os.environ.setdefault("DB_PROFILE", "bench")
+    os.environ["QUERY_STATS_HEADERS"] = "1" # X-Query-Count from query_stats.py
+
+    from flask import jsonify
+    from werkzeug.serving import make_server, WSGIRequestHandler
+
+    from app import create_app
+    import warmup
+
+    app = create_app(warm_up=False) # Routes can't be added once warm-up has sent requests
+
+    @app.route(STATS_PATH)
+    def bench_stats():
+        return jsonify({"peak_rss_mb": peak_rss_mb(), "pid": os.getpid()})
+
+    if warmup.WARMUP_ENABLED:
+        warmup.warm_up(app)
+
+    WSGIRequestHandler.protocol_version = "HTTP/1.1" # keep-alive, like a production server
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    print(f"bench server ready on {port}", flush=True)
+    server.serve_forever()
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError: # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1) # bytes on macOS, KiB on Linux
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_url: str, workers: int = 0):
+    port = free_port()
+    env = {**os.environ, "PYTHONPATH": BACKEND_DIR + os.pathsep + os.environ.get("PYTHONPATH", "")}
+    env.setdefault("ADMISSION_ENABLED", "0") # Measure the routes, not the load shedding (see admission.py)
+    if workers:
+        env.update({"DATABASE_URL": db_url, "QUERY_STATS_HEADERS": "1", "SERVER_MAX_REQUESTS": "0"})
+        env.setdefault("DB_PROFILE", "bench")
+        command = [sys.executable, "serve.py", "--bind", f"127.0.0.1:{port}", "--workers", str(workers)]
+        ready_path = "/readyz"
+    else:
+        command = [sys.executable, "-m", "bench.http_bench", "--serve", db_url, "--port", str(port)]
+        ready_path = STATS_PATH
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Benchmark server exited with status {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", ready_path)
+            conn.getresponse().read()
+            return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Benchmark server did not start within 60s")
+
+
+# --- Clients ---
+
+class Worker:
+    """One client: a logged-in user with its own connection and targets for the mutating routes."""
+
+    def __init__(self, base_url, user, fixture, seed):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.username, self.password = user["username"], fixture["password"]
+        self.survey_ids = fixture["survey_ids"]
+        self.questions = fixture["questions_by_survey"]
+        self.pending_surveys = list(user["pending_surveys"])
+        self.remark_targets = user["remark_targets"]
+        self.rng = random.Random(seed)
+        self.cookie = ""
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        headers = {"Cookie": self.cookie} if self.cookie else {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=300)
+            try:
+                started = time.perf_counter()
+                self.conn.request(method, path, body=payload, headers=headers)
+                response = self.conn.getresponse()
+                response.read()
+                elapsed = time.perf_counter() - started
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # The server closed the kept-alive connection: reconnect once
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+        if response.getheader("Connection", "").lower() == "close":
+            self.conn.close()
+            self.conn = None
+        queries = response.getheader(QUERY_COUNT_HEADER)
+        return response, elapsed, int(queries) if queries is not None else None
+
+    def login(self):
+        response, _, _ = self.request("POST", "/login", {"username": self.username, "password": self.password})
+        if response.status != 200:
+            raise RuntimeError(f"Login failed for {self.username}: HTTP {response.status}")
+        cookies = SimpleCookie()
+        for header, value in response.getheaders():
+            if header.lower() == "set-cookie":
+                cookies.load(value)
+        self.cookie = "; ".join(f"{name}={morsel.value}" for name, morsel in cookies.items())
+
+    def next_submission(self):
+        if not self.pending_surveys:
+            raise LookupError("no surveys left to submit")
+        self._submission = self.pending_surveys.pop()
+        return self._submission
+
+    def submission_body(self):
+        answers = []
+        for question_id in self.questions[self._submission[0]]:
+            rating = self.rng.choice([1, 2, 3, 3, 4, 4, 4])
+            answers.append({"id": question_id, "rating": rating, "remarks": "Needs follow-up." if rating <= 2 else ""})
+        return {"answers": answers, "suggestion": "Benchmark submission"}
+
+    def remark_response_body(self):
+        if not self.remark_targets:
+            raise LookupError("no remarks to respond to")
+        submission_id, question_id = self.rng.choice(self.remark_targets)
+        return {"survey_id": submission_id, "question_data_id": question_id, "explanation": "Benchmark explanation",
+                "action_plan": "Benchmark action plan", "responsible_person": self.username}
+
+
+def load_fixture(db_url: str, concurrency: int, seed: int):
+    """Picks one active user per client (spread over departments) and their submit/respond targets."""
+    from sqlalchemy import create_engine, select
+    from database import SCHEMA_TRANSLATE_MAPS
+    from models import User, Survey, Question, SurveySubmission, Answer
+    from bench.datagen import BENCH_PASSWORD
+
+    engine = create_engine(db_url, execution_options={"schema_translate_map": SCHEMA_TRANSLATE_MAPS["sqlite"]})
+    rng = random.Random(seed)
+    try:
+        with engine.connect() as conn:
+            candidates = conn.execute(
+                select(User.id, User.username, User.department_id)
+                .where(User.is_active == True, User.id != 1).order_by(User.id)
+            ).all()
+            surveys = conn.execute(select(Survey.id, Survey.rated_department_id).order_by(Survey.id)).all()
+            questions_by_survey = {}
+            for survey_id, question_id in conn.execute(select(Question.survey_id, Question.id).order_by(Question.order)):
+                questions_by_survey.setdefault(survey_id, []).append(question_id)
+
+            by_department = {}
+            for row in candidates:
+                by_department.setdefault(row.department_id, []).append(row)
+            departments = sorted(by_department)
+            picked = [rng.choice(by_department[departments[i % len(departments)]]) for i in range(concurrency)]
+
+            users = []
+            for row in picked:
+                submitted = set(conn.execute(
+                    select(SurveySubmission.survey_id).where(SurveySubmission.submitter_user_id == row.id)
+                ).scalars())
+                remark_targets = conn.execute(
+                    select(Answer.submission_id, Answer.question_id)
+                    .join(SurveySubmission, SurveySubmission.id == Answer.submission_id)
+                    .where(SurveySubmission.rated_department_id == row.department_id, Answer.text_response.isnot(None))
+                    .order_by(Answer.id).limit(1000)
+                ).all()
+                users.append({
+                    "username": row.username,
+                    "pending_surveys": [(s.id,) for s in surveys
+                                        if s.rated_department_id != row.department_id and s.id not in submitted],
+                    "remark_targets": [tuple(target) for target in remark_targets],
+                })
+    finally:
+        engine.dispose()
+    return {"password": BENCH_PASSWORD, "survey_ids": [s.id for s in surveys],
+            "questions_by_survey": questions_by_survey, "users": users}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(scenario, workers, requests: int, warmup: int):
+    """Sends `requests` requests spread over the workers (after `warmup` unmeasured ones each)."""
+    lock = threading.Lock()
+    remaining = [requests]
+    latencies, queries = [], []
+    statuses = {}
+    skipped, shed = [0], [0]
+
+    def one(worker):
+        path = scenario.path(worker)
+        body = scenario.body(worker) if scenario.body else None
+        return worker.request(scenario.method, path, body)
+
+    def drive(worker):
+        for _ in range(warmup):
+            try:
+                one(worker)
+            except LookupError:
+                break
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            try:
+                response, elapsed, query_count = one(worker)
+            except LookupError: # This worker ran out of targets (e.g. surveys left to submit)
+                with lock:
+                    skipped[0] += 1
+                continue
+            with lock:
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+                if response.status == 503 and response.getheader("Retry-After"):
+                    shed[0] += 1 # Turned away by admission control: no latency to measure
+                    continue
+                latencies.append(elapsed)
+                if query_count is not None:
+                    queries.append(query_count)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(workers)) as pool:
+        list(pool.map(drive, workers))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+    errors = sum(count for status, count in statuses.items() if status >= 400) - shed[0]
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "shed": shed[0],
+        "skipped": skipped[0],
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+        "max_queries": max(queries) if queries else None,
+    }
+
+
+def server_stats(base_url):
+    parts = urlsplit(base_url)
+    try:
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+        conn.request("GET", STATS_PATH)
+        response = conn.getresponse()
+        return json.loads(response.read()) if response.status == 200 else {}
+    except (OSError, ValueError):
+        return {}
+
+
+# --- Baseline comparison ---
+
+def compare(results, baseline, tolerance: float):
+    """Returns regression messages for routes present in both runs."""
+    regressions = []
+    for name, current in results["routes"].items():
+        base = baseline.get("routes", {}).get(name)
+        if not base:
+            continue
+        # Latency: relative tolerance, ignoring sub-millisecond jitter
+        for key in ("p50_ms", "p95_ms"):
+            if current[key] is not None and base.get(key) is not None:
+                if current[key] > base[key] * (1 + tolerance) and current[key] - base[key] > 1:
+                    regressions.append(f"{name}: {key} {base[key]} -> {current[key]}")
+        if current["throughput_rps"] and base.get("throughput_rps"):
+            if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+                regressions.append(f"{name}: throughput {base['throughput_rps']} -> {current['throughput_rps']} req/s")
+        if current["queries_per_request"] is not None and base.get("queries_per_request") is not None:
+            if current["queries_per_request"] > base["queries_per_request"] + 0.5:
+                regressions.append(f"{name}: queries/request {base['queries_per_request']} -> {current['queries_per_request']}")
+        if current["errors"] > base.get("errors", 0):
+            regressions.append(f"{name}: errors {base.get('errors', 0)} -> {current['errors']}")
+        if current["shed"] > base.get("shed", 0):
+            regressions.append(f"{name}: shed {base.get('shed', 0)} -> {current['shed']}")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="HTTP benchmark for the backend routes.")
+    parser.add_argument("--scale", default="small", help="Dataset scale from bench/datagen.py")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url", help="Benchmark an already running server instead of booting one")
+    parser.add_argument("--db", help="SQLite dataset URL the --url server uses (for picking users and targets)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=0, help="Serve with serve.py and this many worker processes")
+    parser.add_argument("--requests", type=int, help="Requests per route (default: per-route, see SCENARIOS)")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured requests per client before each route")
+    parser.add_argument("--routes", help=f"Comma-separated subset of: {', '.join(SCENARIOS_BY_NAME)}")
+    parser.add_argument("--out", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare with a stored results JSON and exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown vs. the baseline")
+    parser.add_argument("--serve", metavar="DB_URL", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return 0
+
+    scenarios = SCENARIOS
+    if args.routes:
+        unknown = [name for name in args.routes.split(",") if name not in SCENARIOS_BY_NAME]
+        if unknown:
+            parser.error(f"Unknown routes: {', '.join(unknown)}")
+        scenarios = [SCENARIOS_BY_NAME[name] for name in args.routes.split(",")]
+
+    server = None
+    workdir = None
+    if args.url:
+        if not args.db:
+            parser.error("--url needs --db, the dataset the server is running on")
+        base_url, db_url = args.url.rstrip("/"), args.db
+    else:
+        # Imported here so the module loads without a configured DATABASE_URL in --serve mode
+        from bench.datagen import ensure_dataset
+        dataset_path = ensure_dataset(args.scale, args.seed)[len("sqlite:///"):]
+        # Submit/respond write to the database: run on a copy so the cached dataset stays pristine
+        workdir = tempfile.mkdtemp(prefix="lls_http_bench_")
+        db_path = os.path.join(workdir, "bench.db")
+        shutil.copyfile(dataset_path, db_path)
+        db_url = f"sqlite:///{db_path}"
+        server, base_url = start_server(db_url, args.workers)
+
+    try:
+        fixture = load_fixture(db_url, args.concurrency, args.seed)
+        workers = [Worker(base_url, user, fixture, args.seed + i) for i, user in enumerate(fixture["users"])]
+        for worker in workers:
+            worker.login()
+
+        results = {
+            "meta": {
+                "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+                "git_revision": git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "scale": None if args.url else args.scale,
+                "seed": args.seed,
+                "concurrency": args.concurrency,
+                "target": args.url or (f"serve.py, {args.workers} workers" if args.workers else "in-process werkzeug server"),
+            },
+            "routes": {},
+        }
+        print(f"{'route':<24}{'reqs':>6}{'err':>5}{'shed':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}")
+        for scenario in scenarios:
+            requests = args.requests or scenario.requests
+            result = run_scenario(scenario, workers, requests, args.warmup)
+            results["routes"][scenario.name] = result
+            queries = result["queries_per_request"] if result["queries_per_request"] is not None else "-"
+            print(f"{scenario.name:<24}{result['requests']:>6}{result['errors']:>5}{result['shed']:>6}{result['throughput_rps']:>9}"
+                  f"{result['p50_ms']!s:>9}{result['p95_ms']!s:>9}{result['p99_ms']!s:>9}{queries!s:>9}")
+        results["server"] = server_stats(base_url)
+        print(f"server peak RSS: {results['server'].get('peak_rss_mb')} MB")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(10)
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
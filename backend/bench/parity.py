@@ -0,0 +1,231 @@
+# bench/parity.py
+"""
+Parity check between the Flask app (app.py) and the ASGI read app (asgi.py).
+
+Both apps run in-process against one copy of a generated dataset (bench/datagen.py) on
+the SQLite stand-in. Every route of routes/async_routes.py is requested from both, for
+an admin and one user per department, with the same JWT cookie. For each request it
+compares
+  - the status, the body (byte for byte) and the ETag/Last-Modified/Cache-Control headers,
+  - that each app answers the other's ETag with 304 Not Modified, and
+  - auth failures (no cookie, garbage, bad signature, expired token).
+It then opens GET /api/events, bumps a data version the way a Flask commit does, and
+expects a "changed" event. Any difference is printed; the exit status is 1 if there
+were any.
+
+    cd backend
+    python -m bench.parity
+    python -m bench.parity --scale medium --users 20
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMPARED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control")
+USER_PATHS = ["/api/surveys", "/api/remarks/incoming", "/api/remarks/outgoing", "/api/dashboard/overall-stats",
+              "/api/dashboard/department-metrics", "/api/surveyable-departments", "/api/surveys/999999"]
+
+
+# --- Child process (both apps on the dataset in DATABASE_URL) ---
+
+class Parity:
+    def __init__(self, flask_client, asgi_client):
+        self.flask_client = flask_client
+        self.asgi_client = asgi_client
+        self.checked = 0
+        self.failures = []
+
+    def fail(self, label, message):
+        self.failures.append(f"{label}: {message}")
+
+    def compare(self, label, path, token=None, headers=None):
+        """Requests `path` from both apps and records the differences. Returns the Flask response."""
+        headers = headers or {}
+        self.flask_client.delete_cookie("access_token_cookie", domain="localhost")
+        self.asgi_client.cookies.clear()
+        if token is not None:
+            self.flask_client.set_cookie("access_token_cookie", token, domain="localhost")
+            self.asgi_client.cookies.set("access_token_cookie", token)
+        flask_response = self.flask_client.get(path, headers=headers)
+        asgi_response = self.asgi_client.get(path, headers=headers)
+        self.checked += 1
+
+        label = f"{label} GET {path}"
+        if flask_response.status_code != asgi_response.status_code:
+            self.fail(label, f"status {flask_response.status_code} (flask) != {asgi_response.status_code} (asgi)")
+        if flask_response.status_code != 304 and flask_response.get_data() != asgi_response.content:
+            self.fail(label, f"bodies differ: {first_difference(flask_response.get_data(), asgi_response.content)}")
+        for name in COMPARED_HEADERS:
+            if flask_response.status_code == 304 and name == "Content-Type":
+                continue
+            if flask_response.headers.get(name) != asgi_response.headers.get(name):
+                self.fail(label, f"{name} {flask_response.headers.get(name)!r} (flask) != {asgi_response.headers.get(name)!r} (asgi)")
+        return flask_response
+
+    def compare_conditional(self, label, path, token, etag):
+        """Both apps must answer If-None-Match with the other's ETag with a 304."""
+        response = self.compare(f"{label} If-None-Match", path, token, headers={"If-None-Match": etag})
+        if response.status_code != 304:
+            self.fail(f"{label} GET {path}", f"expected 304 for If-None-Match, got {response.status_code}")
+
+
+def first_difference(a: bytes, b: bytes) -> str:
+    index = next((i for i, (x, y) in enumerate(zip(a, b)) if x != y), min(len(a), len(b)))
+    return f"at byte {index}: {a[max(0, index - 40):index + 40]!r} vs {b[max(0, index - 40):index + 40]!r}"
+
+
+def check_events(app, token, parity: Parity, timeout: float = 10.0):
+    """Serves `app` with uvicorn, opens the event stream, bumps the 'surveys' version and waits for the event."""
+    import http.client
+    import uvicorn
+    import database
+    import data_versions
+    from routes.async_routes import SSE_POLL_SECONDS
+
+    # The test client buffers whole responses, so the stream is read from a real server
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + timeout
+    while not server.started and time.monotonic() < deadline:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+        conn.request("GET", "/api/events", headers={"Cookie": f"access_token_cookie={token}"})
+        response = conn.getresponse()
+        parity.checked += 1
+        if response.status != 200:
+            parity.fail("GET /api/events", f"status {response.status}")
+            return
+        time.sleep(SSE_POLL_SECONDS * 3) # Let the watcher read the current versions first
+        with database.engine.begin() as db_conn:
+            data_versions.bump(db_conn, {"surveys"})
+        event = None
+        while event is None:
+            line = response.fp.readline().decode()
+            if not line:
+                break
+            if line.startswith("data: "):
+                event = json.loads(line[len("data: "):])
+        if event is None or event.get("tables") != ["surveys"]:
+            parity.fail("GET /api/events", f"expected a 'surveys' change event, got {event}")
+        conn.close()
+    except OSError as e:
+        parity.fail("GET /api/events", f"no event within {timeout:.0f}s of a version bump ({e})")
+    finally:
+        server.should_exit = True
+        thread.join(timeout)
+
+
+def child(users: int):
+    import jwt
+    from fastapi.testclient import TestClient
+    from flask_jwt_extended import create_access_token
+
+    from app import create_app
+    import asgi
+    from database import SessionLocal
+    from models import Survey, User
+    from security import JWT_SECRET_KEY
+
+    flask_app = create_app(warm_up=False, background_services=False)
+    db = SessionLocal()
+    try:
+        admin = db.query(User).filter(User.role == "admin").order_by(User.id).first()
+        sample = {}
+        for user in db.query(User).filter(User.role != "admin", User.department_id.isnot(None)).order_by(User.id):
+            sample.setdefault(user.department_id, user)
+        sample = [admin] + list(sample.values())[:users]
+        survey_ids = [row.id for row in db.query(Survey.id).order_by(Survey.id)]
+    finally:
+        db.close()
+
+    def token_for(user, **kwargs):
+        with flask_app.app_context():
+            return create_access_token(identity=user.username, **kwargs)
+
+    parity = Parity(flask_app.test_client(), None)
+    with TestClient(asgi.app) as asgi_client:
+        parity.asgi_client = asgi_client
+
+        for user in sample:
+            token = token_for(user, additional_claims={"department_id": user.department_id, "role": user.role})
+            paths = USER_PATHS + ([f"/api/surveys/{survey_id}" for survey_id in survey_ids] if user is admin else [])
+            for path in paths:
+                response = parity.compare(user.username, path, token)
+                etag = response.headers.get("ETag")
+                if etag:
+                    parity.compare_conditional(user.username, path, token, etag)
+
+        # Tokens issued before the department_id claim existed
+        parity.compare(f"{sample[-1].username} (no department claim)", "/api/surveyable-departments", token_for(sample[-1]))
+
+        token = token_for(admin)
+        parity.compare("no cookie", "/api/surveys")
+        parity.compare("garbage token", "/api/surveys", "not-a-token")
+        parity.compare("bad signature", "/api/surveys", jwt.encode(jwt.decode(token, options={"verify_signature": False}),
+                                                                   JWT_SECRET_KEY + "x", algorithm="HS256"))
+        parity.compare("expired token", "/api/surveys", token_for(admin, expires_delta=timedelta(seconds=-5)))
+
+
+    check_events(asgi.app, token, parity)
+    print(json.dumps({"checked": parity.checked, "failures": parity.failures}))
+
+
+# --- Parent process ---
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Flask vs ASGI read app parity check.")
+    parser.add_argument("--scale", default="small", help="Dataset scale from bench/datagen.py")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--users", type=int, default=8, help="Users checked besides the admin (one per department)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        child(args.users)
+        return 0
+
+    from bench.datagen import ensure_dataset
+    source = ensure_dataset(args.scale, args.seed)[len("sqlite:///"):]
+    tmpdir = tempfile.mkdtemp(prefix="lls_parity_")
+    try:
+        path = os.path.join(tmpdir, "parity.db")
+        shutil.copy(source, path) # The event check bumps a data version
+        env = {
+            **os.environ,
+            "PYTHONPATH": BACKEND_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""),
+            "DATABASE_URL": f"sqlite:///{path}",
+            "DB_PROFILE": os.environ.get("DB_PROFILE", "bench"),
+            "LOG_LEVEL": "WARNING",
+            "WARMUP_ENABLED": "0",
+            "SSE_POLL_SECONDS": "0.2",
+            "SSE_HEARTBEAT_SECONDS": "1",
+        }
+        result = subprocess.run([sys.executable, "-m", "bench.parity", "--child", "--users", str(args.users)],
+                                cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            sys.stderr.write(result.stderr)
+            return result.returncode
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    for failure in report["failures"]:
+        print(f"MISMATCH {failure}")
+    print(f"{report['checked']} requests compared, {len(report['failures'])} mismatches.")
+    return 1 if report["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
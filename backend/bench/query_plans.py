@@ -0,0 +1,109 @@
+# bench/query_plans.py
+"""
+Query-plan regression check for the hot query predicates.
+
+Builds the "small" synthetic dataset (bench/datagen.py: Alembic schema, generated
+rows and ANALYZE statistics) in a temporary SQLite file, runs each hot query the
+routes issue, and checks with EXPLAIN QUERY PLAN that SQLite answers it from the
+expected index instead of scanning the table.
+
+    cd backend
+    python -m bench.query_plans
+
+Exits with status 1 when any plan regresses.
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp(prefix="lls_plans_")
+_db_path = os.path.join(_tmpdir, "plans.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+os.environ.setdefault("DB_PROFILE", "bench")
+
+from sqlalchemy import desc, event, select
+
+from database import engine
+from models import User, Question, Answer, RemarkResponse, SurveySubmission
+from bench.datagen import ensure_dataset
+
+# (description, statement, index the plan must use)
+HOT_QUERIES = [
+    ("latest submissions (dashboard)",
+     select(SurveySubmission.id).order_by(desc(SurveySubmission.submitted_at)).limit(5),
+     "ix_survey_submissions_submitted_at"),
+    ("time-period filter",
+     select(SurveySubmission.id).where(SurveySubmission.submitted_at >= datetime.utcnow() - timedelta(days=30)),
+     "ix_survey_submissions_submitted_at"),
+    ("incoming remarks / department metrics",
+     select(SurveySubmission.id).where(SurveySubmission.rated_department_id == 1),
+     "ix_survey_submissions_rated_dept_submitted_at"),
+    ("outgoing remarks",
+     select(SurveySubmission.id).where(SurveySubmission.submitter_department_id == 1),
+     "ix_survey_submissions_submitter_dept_submitted_at"),
+    ("user's submissions",
+     select(SurveySubmission.id).where(SurveySubmission.submitter_user_id == 1),
+     "ix_survey_submissions_submitter_user_id"),
+    ("answers per submission",
+     select(Answer.id).where(Answer.submission_id.in_([1, 2, 3])),
+     "sqlite_autoindex_survey_answers_1"),
+    ("questions per survey",
+     select(Question.id).where(Question.survey_id == 1),
+     "sqlite_autoindex_questions_1"),
+    ("remark responses per submission",
+     select(RemarkResponse.id).where(RemarkResponse.survey_submission_id == 1),
+     "sqlite_autoindex_remark_responses_1"),
+    ("users by department",
+     select(User.id).where(User.department_id.in_([1, 2])),
+     "ix_dbo_admin_users_department_id"),
+    ("users by department name",
+     select(User.id).where(User.department == "HR"),
+     "ix_dbo_admin_users_department"),
+    ("user directory page sorted by name",
+     select(User.id, User.name).order_by(User.name, User.id).limit(50),
+     "ix_dbo_admin_users_name"),
+    ("password reset lookup",
+     select(User.id).where(User.email == "someone@lls.com"),
+     "sqlite_autoindex_admin_users_1"),
+    ("login lookup",
+     select(User.id).where(User.username == "someone"),
+     "ix_dbo_admin_users_username"),
+]
+
+
+def explain(conn, statement):
+    """Runs the statement, capturing the SQL the engine sends, and returns its EXPLAIN QUERY PLAN rows."""
+    captured = []
+
+    def capture(conn_, cursor, sql, parameters, context, executemany):
+        captured.append((sql, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        conn.execute(statement).all()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    sql, parameters = captured[-1]
+    return [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, parameters)]
+
+
+def main() -> int:
+    ensure_dataset("small", path=_db_path)
+
+    failures = 0
+    with engine.connect() as conn:
+        for description, statement, expected_index in HOT_QUERIES:
+            plan = explain(conn, statement)
+            ok = any(expected_index in line for line in plan)
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {description}: {' | '.join(plan)}")
+            if not ok:
+                print(f"     expected the plan to use {expected_index}")
+
+    print(f"\n{len(HOT_QUERIES) - failures}/{len(HOT_QUERIES)} hot queries use their index.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
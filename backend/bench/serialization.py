@@ -0,0 +1,162 @@
+# bench/serialization.py
+"""
+JSON serialization and compression benchmark for the largest API payloads.
+
+Builds the "small" synthetic dataset (bench/datagen.py) in a temporary SQLite file,
+captures the objects the routes hand to jsonify (users page, survey list and detail,
+incoming/outgoing remarks, permissions, participation), and compares for each:
+  - serialization CPU: Flask's default provider vs json_provider.FastJSONProvider
+  - bytes on the wire: uncompressed, gzip and (when installed) brotli at the
+    levels compression.py uses
+
+    cd backend
+    python -m bench.serialization
+    python -m bench.serialization --iterations 200 --out serialization.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+_tmpdir = tempfile.mkdtemp(prefix="lls_serialization_")
+_db_path = os.path.join(_tmpdir, "serialization.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+os.environ.setdefault("DB_PROFILE", "bench")
+os.environ.setdefault("LOG_ACCESS", "0")
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import func, select
+
+from bench.datagen import ensure_dataset, BENCH_PASSWORD
+import compression
+import json_provider
+
+
+def pick_remarks_user(engine):
+    """A user of the department with the most rated submissions (the largest remarks lists)."""
+    from models import User, SurveySubmission
+    with engine.connect() as conn:
+        department_id = conn.execute(
+            select(SurveySubmission.rated_department_id)
+            .group_by(SurveySubmission.rated_department_id)
+            .order_by(func.count().desc()).limit(1)
+        ).scalar()
+        return conn.execute(
+            select(User.username).where(User.department_id == department_id, User.is_active == True).limit(1)
+        ).scalar()
+
+
+def capture_payloads(app, remarks_user):
+    """{name: object passed to jsonify} for the benchmarked routes."""
+    captured = {}
+    provider = app.json
+    original_response = provider.response
+
+    def capture(*args, **kwargs):
+        captured["last"] = provider._prepare_response_obj(args, kwargs)
+        return original_response(*args, **kwargs)
+
+    provider.response = capture
+    routes = [
+        ("admin", "users_page", "/api/users?page_size=200"),
+        ("admin", "surveys", "/api/surveys"),
+        ("admin", "survey_detail", "/api/surveys/1"),
+        ("admin", "permissions", "/api/permissions"),
+        ("admin", "participation_pending", "/api/participation/pending"),
+        (remarks_user, "remarks_incoming", "/api/remarks/incoming"),
+        (remarks_user, "remarks_outgoing", "/api/remarks/outgoing"),
+    ]
+    payloads = {}
+    clients = {}
+    try:
+        for username, name, path in routes:
+            if username not in clients:
+                clients[username] = app.test_client()
+                clients[username].post("/login", json={"username": username, "password": BENCH_PASSWORD})
+            captured.pop("last", None)
+            response = clients[username].get(path)
+            if response.status_code == 200 and "last" in captured:
+                payloads[name] = captured["last"]
+            else:
+                print(f"skipping {name}: HTTP {response.status_code}", file=sys.stderr)
+    finally:
+        provider.response = original_response
+    return payloads
+
+
+def time_per_call(func, obj, iterations: int) -> float:
+    """Best-of-3 mean microseconds per call."""
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func(obj)
+        best = min(best, (time.perf_counter() - started) / iterations)
+    return round(best * 1e6, 1)
+
+
+def measure(app, payloads, iterations: int):
+    default = DefaultJSONProvider(app)
+    fast = json_provider.FastJSONProvider(app)
+    results = {}
+    for name, obj in payloads.items():
+        before = default.dumps(obj).encode()
+        after = fast.dumps_bytes(obj)
+        row = {
+            "default_us": time_per_call(default.dumps, obj, iterations),
+            "fast_us": time_per_call(fast.dumps_bytes, obj, iterations),
+            "default_bytes": len(before),
+            "fast_bytes": len(after),
+            "gzip_bytes": len(compression.compress(after, "gzip")),
+            "gzip_us": time_per_call(lambda data: compression.compress(data, "gzip"), after, max(1, iterations // 10)),
+        }
+        if compression.brotli is not None:
+            row["br_bytes"] = len(compression.compress(after, "br"))
+            row["br_us"] = time_per_call(lambda data: compression.compress(data, "br"), after, max(1, iterations // 10))
+        results[name] = row
+    return results
+
+
+def print_table(results):
+    has_brotli = any("br_bytes" in row for row in results.values())
+    header = f"{'payload':<24}{'default us':>11}{'fast us':>9}{'speedup':>8}{'bytes':>9}{'gzip':>8}{'gzip us':>9}"
+    if has_brotli:
+        header += f"{'br':>8}{'br us':>8}"
+    print(header)
+    for name, row in results.items():
+        speedup = row["default_us"] / row["fast_us"] if row["fast_us"] else 0
+        line = (f"{name:<24}{row['default_us']:>11}{row['fast_us']:>9}{speedup:>7.1f}x"
+                f"{row['fast_bytes']:>9}{row['gzip_bytes']:>8}{row['gzip_us']:>9}")
+        if has_brotli:
+            line += f"{row.get('br_bytes', '-'):>8}{row.get('br_us', '-'):>8}"
+        print(line)
+    if not has_brotli:
+        print("(brotli not installed: br columns skipped)")
+    if json_provider.orjson is None:
+        print("(orjson not installed: 'fast' is the stdlib fallback)")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="JSON serialization and compression benchmark.")
+    parser.add_argument("--iterations", type=int, default=100, help="Serializations per payload and round")
+    parser.add_argument("--out", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    ensure_dataset("small", path=_db_path)
+    from database import engine
+    from app import create_app
+
+    app = create_app(warm_up=False) # Cold response cache, so every route serializes its payload
+    payloads = capture_payloads(app, pick_remarks_user(engine))
+    results = measure(app, payloads, args.iterations)
+    print_table(results)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+# bench/startup.py
+"""
+Start-up benchmark: import time, app build time and time to first request.
+
+Every run is a fresh interpreter (a new worker after a deploy) against the "small"
+dataset (bench/datagen.py) on the SQLite stand-in. A run measures
+  - import_ms:   `import app` (modules only; the app is built by create_app())
+  - create_ms:   create_app(), including the warm-up when it is on
+  - first_ms:    the first request of each route in FIRST_PATHS, and second_ms the next one
+  - ready_ms:    import + create + first request of the first route, i.e. how long after
+                 start-up the first user gets a response
+and reports whether pandas was imported before the first export, and what importing
+it costs that export. Runs are repeated with the warm-up off and on; medians are printed.
+
+    cd backend
+    python -m bench.startup
+    python -m bench.startup --runs 9 --out startup.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_PATHS = ["/api/surveys", "/api/surveys/1", "/api/departments", "/api/dashboard/department-metrics"]
+MODES = {"cold": "0", "warm": "1"} # WARMUP_ENABLED per mode
+
+
+# --- Child process (one measured start-up) ---
+
+def child():
+    started = time.perf_counter()
+    import app as app_module
+    imported = time.perf_counter()
+    app = app_module.create_app()
+    created = time.perf_counter()
+    pandas_loaded = "pandas" in sys.modules
+
+    from flask_jwt_extended import create_access_token
+    with app.app_context():
+        token = create_access_token(identity="bench")
+    client = app.test_client()
+    client.set_cookie(app.config["JWT_ACCESS_TOKEN_NAME"], token, domain=app.config["JWT_COOKIE_DOMAIN"])
+
+    first, second = {}, {}
+    ready = None
+    for path in FIRST_PATHS:
+        for timings in (first, second):
+            request_started = time.perf_counter()
+            response = client.get(path)
+            finished = time.perf_counter()
+            timings[path] = round((finished - request_started) * 1000, 2)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} returned {response.status_code}")
+            if ready is None:
+                ready = finished - started
+
+    pandas_started = time.perf_counter()
+    import pandas # noqa: F401  (what the first export now pays)
+    pandas_ms = (time.perf_counter() - pandas_started) * 1000
+
+    print(json.dumps({
+        "import_ms": round((imported - started) * 1000, 1),
+        "create_ms": round((created - imported) * 1000, 1),
+        "ready_ms": round(ready * 1000, 1),
+        "first_ms": first,
+        "second_ms": second,
+        "pandas_at_startup": pandas_loaded,
+        "pandas_import_ms": round(pandas_ms, 1),
+        "warmup": app.extensions.get("warmup"),
+    }))
+
+
+# --- Parent process ---
+
+def run_once(db_url: str, warmup: str) -> dict:
+    env = {
+        **os.environ,
+        "PYTHONPATH": BACKEND_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""),
+        "DATABASE_URL": db_url,
+        "DB_PROFILE": os.environ.get("DB_PROFILE", "bench"),
+        "WARMUP_ENABLED": warmup,
+        "LOG_LEVEL": "WARNING",
+    }
+    result = subprocess.run([sys.executable, "-m", "bench.startup", "--child"], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(runs):
+    median = lambda values: round(statistics.median(values), 1)
+    return {
+        "runs": len(runs),
+        "import_ms": median([run["import_ms"] for run in runs]),
+        "create_ms": median([run["create_ms"] for run in runs]),
+        "ready_ms": median([run["ready_ms"] for run in runs]),
+        "first_ms": {path: median([run["first_ms"][path] for run in runs]) for path in FIRST_PATHS},
+        "second_ms": {path: median([run["second_ms"][path] for run in runs]) for path in FIRST_PATHS},
+        "pandas_at_startup": runs[0]["pandas_at_startup"],
+        "pandas_import_ms": median([run["pandas_import_ms"] for run in runs]),
+    }
+
+
+def print_report(results):
+    modes = list(results)
+    print(f"{'':<44}" + "".join(f"{mode:>12}" for mode in modes))
+    for key in ("import_ms", "create_ms", "ready_ms"):
+        print(f"{key:<44}" + "".join(f"{results[mode][key]:>12}" for mode in modes))
+    for path in FIRST_PATHS:
+        print(f"{'first ' + path:<44}" + "".join(f"{results[mode]['first_ms'][path]:>12}" for mode in modes))
+        print(f"{'  second':<44}" + "".join(f"{results[mode]['second_ms'][path]:>12}" for mode in modes))
+    first = results[modes[0]]
+    print(f"pandas imported at startup: {first['pandas_at_startup']} "
+          f"(deferred to the first export: {first['pandas_import_ms']} ms)")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="App start-up benchmark.")
+    parser.add_argument("--runs", type=int, default=5, help="Start-ups per mode")
+    parser.add_argument("--out", help="Write the results as JSON to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        child()
+        return 0
+
+    from bench.datagen import ensure_dataset
+    source = ensure_dataset("small").replace("sqlite:///", "", 1)
+    tmpdir = tempfile.mkdtemp(prefix="lls_startup_")
+    try:
+        path = os.path.join(tmpdir, "startup.db")
+        shutil.copy(source, path)
+        db_url = f"sqlite:///{path}"
+        results = {mode: summarize([run_once(db_url, flag) for _ in range(args.runs)]) for mode, flag in MODES.items()}
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print_report(results)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
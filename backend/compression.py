@@ -0,0 +1,74 @@
+# compression.py
+"""
+Negotiated response compression.
+
+Responses of at least COMPRESS_MIN_BYTES with a compressible mimetype (JSON, text,
+CSV) are compressed with brotli when the client accepts it and the brotli package is
+installed, otherwise with gzip. Small bodies are sent as they are, since compressing
+them costs more CPU than the bytes it saves. File downloads (send_file; Excel exports
+are zip-compressed already) and responses that are already encoded are left alone.
+
+Settings (environment):
+    COMPRESS_ENABLED=1
+    COMPRESS_MIN_BYTES=1024
+    COMPRESS_GZIP_LEVEL=6        1 (fastest) .. 9 (smallest)
+    COMPRESS_BROTLI_QUALITY=4    0 .. 11; 4-5 is about gzip -6 speed with smaller output
+"""
+import os
+import gzip
+
+try:
+    import brotli
+except ImportError: # Optional: gzip only
+    brotli = None
+
+COMPRESS_ENABLED = os.getenv("COMPRESS_ENABLED", "1") == "1"
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/plain", "text/html", "text/csv", "application/javascript"}
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+def choose_encoding(accept_encodings):
+    """The best supported encoding the client accepts (werkzeug Accept object), or None."""
+    best = accept_encodings.best_match(ENCODINGS)
+    return best if best and accept_encodings[best] > 0 else None
+
+
+def compress_response(response, accept_encodings):
+    if (
+        response.direct_passthrough
+        or response.status_code < 200 or response.status_code in (204, 206, 304)
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(accept_encodings)
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_app(app):
+    """Compresses the eligible responses of `app`."""
+    if not COMPRESS_ENABLED:
+        return
+    from flask import request
+
+    @app.after_request
+    def compress_eligible_response(response):
+        return compress_response(response, request.accept_encodings)
@@ -0,0 +1,125 @@
+# data_versions.py
+"""
+Per-table change counters.
+
+Every commit of a session that wrote one of TRACKED_TABLES also increments that table's
+row in data_versions, in the same transaction:
+  - ORM writes (db.add / dirty objects / db.delete) are picked up at flush, and
+  - insert()/update()/delete() statements run through session.execute() when they execute.
+So the counters move exactly when committed data changes, on every worker, and a
+rolled-back transaction leaves them alone.
+
+read() fetches the counters of a few tables in one primary-key lookup, which is what
+conditional GETs (http_cache.py) and cached responses compare instead of re-reading the
+tables. Writers that bypass the session (Core connections, e.g. bench/datagen.py) call
+bump() themselves when their data must invalidate cached responses.
+
+Callbacks registered with on_commit() are called with the set of tables a commit
+changed, after it succeeded (response_cache.py drops the affected entries this way).
+"""
+import logging
+from datetime import datetime
+
+from sqlalchemy import event, select, update
+
+from database import RoutingSession
+from models import DataVersion
+
+logger = logging.getLogger(__name__)
+
+TRACKED_TABLES = frozenset({
+    "admin_users", "departments", "permissions", "surveys", "questions", "question_options",
+    "survey_submissions", "survey_answers", "remark_responses",
+})
+
+_commit_listeners = []
+
+
+# --- Reading ---
+
+def versions_query(tables):
+    return (
+        select(DataVersion.name, DataVersion.version, DataVersion.updated_at)
+        .where(DataVersion.name.in_(sorted(tables)))
+    )
+
+
+def read(session, tables):
+    """{table: (version, updated_at)} for `tables`; tables without a counter row are left out."""
+    rows = session.execute(versions_query(tables))
+    return {name: (version, updated_at) for name, version, updated_at in rows}
+
+
+async def read_async(session, tables):
+    """read() on an AsyncSession (asgi.py)."""
+    rows = await session.execute(versions_query(tables))
+    return {name: (version, updated_at) for name, version, updated_at in rows}
+
+
+# --- Bumping ---
+
+def bump(connection, tables):
+    """Increments the counters of `tables` on `connection` (a Connection or Session), inside its transaction."""
+    tables = sorted(TRACKED_TABLES.intersection(tables))
+    if tables:
+        connection.execute(
+            update(DataVersion)
+            .where(DataVersion.name.in_(tables))
+            .values(version=DataVersion.version + 1, updated_at=datetime.utcnow())
+        )
+
+
+def _changed_tables(session) -> set:
+    return session.info.setdefault("changed_tables", set())
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _record_flushed_tables(session, flush_context):
+    # new/dirty/deleted still hold the pre-flush state here
+    changed = _changed_tables(session)
+    for collection in (session.new, session.dirty, session.deleted):
+        for obj in collection:
+            table = getattr(obj, "__tablename__", None)
+            if table in TRACKED_TABLES:
+                changed.add(table)
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _record_statement_tables(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None and table.name in TRACKED_TABLES:
+            _changed_tables(orm_execute_state.session).add(table.name)
+
+
+@event.listens_for(RoutingSession, "before_commit")
+def _bump_changed_tables(session):
+    session.flush() # Commit flushes only after this hook; flush first so its changes are counted
+    changed = session.info.pop("changed_tables", None)
+    if changed:
+        bump(session, changed)
+        session.info["committed_tables"] = changed
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _notify_committed_tables(session):
+    committed = TRACKED_TABLES.intersection(session.info.pop("committed_tables", ()))
+    if not committed:
+        return
+    for callback in _commit_listeners:
+        try:
+            callback(committed)
+        except Exception as e: # The commit has happened; a failing listener mustn't fail the request
+            logger.warning("Commit listener %s failed: %s", getattr(callback, "__qualname__", callback), e)
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_changed_tables(session):
+    session.info.pop("changed_tables", None)
+    session.info.pop("committed_tables", None)
+
+
+def on_commit(callback):
+    """Calls callback(tables) after every commit that changed any of TRACKED_TABLES. Usable as a decorator."""
+    _commit_listeners.append(callback)
+    return callback
@@ -1,25 +1,349 @@
 # F:\LLS Survey\backend\database.py
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import threading
+import time
+import logging
+from contextvars import ContextVar
+from functools import wraps
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from dotenv import load_dotenv
 
 load_dotenv() # Load environment variables from .env file
 
-# Construct the database URL from environment variables
-DATABASE_URL = (
+# Construct the database URL from environment variables.
+# DATABASE_URL, when set, overrides the MSSQL_* settings (e.g. sqlite:///bench.db for local benchmarking).
+DATABASE_URL = os.getenv("DATABASE_URL") or (
     f"mssql+pyodbc://{os.getenv('MSSQL_USER')}:{os.getenv('MSSQL_PASSWORD')}@"
     f"{os.getenv('MSSQL_SERVER')},{os.getenv('MSSQL_PORT')}/"
     f"{os.getenv('MSSQL_DB')}?driver=ODBC+Driver+17+for+SQL+Server"
 )
 
-# Create the SQLAlchemy engine
-# echo=True will print all SQL statements, useful for debugging
-engine = create_engine(DATABASE_URL, echo=True)
+# --- Engine Profiles ---
+# Named engine settings, selected with DB_PROFILE (default: prod).
+# Every value can be overridden individually with the matching DB_* environment variable.
+ENGINE_PROFILES = {
+    "dev": {
+        "echo": False,              # DB_ECHO=1 to print all SQL statements while debugging
+        "pool_size": 5,
+        "max_overflow": 5,
+        "pool_recycle": 1800,       # seconds
+        "pool_pre_ping": True,
+        "pool_timeout": 30,         # seconds to wait for a pooled connection
+        "statement_timeout": 0,     # seconds, 0 = no limit
+        "fast_executemany": True,
+        "async_pool_size": 10,      # connections of the async engine (asgi.py), shared by all its concurrent requests
+    },
+    "prod": {
+        "echo": False,
+        "pool_size": 20,
+        "max_overflow": 10,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "pool_timeout": 10,
+        "statement_timeout": 30,
+        "fast_executemany": True,
+        "async_pool_size": 50,
+    },
+    "bench": {
+        "echo": False,
+        "pool_size": 32,
+        "max_overflow": 0,
+        "pool_recycle": -1,
+        "pool_pre_ping": False,
+        "pool_timeout": 30,
+        "statement_timeout": 0,
+        "fast_executemany": True,
+        "async_pool_size": 64,
+    },
+}
+
+# Async drivers for the ASGI read app (asgi.py), by sync driver
+ASYNC_DRIVERS = {
+    "mssql+pyodbc": "mssql+aioodbc",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+# The models declare their tables in the 'dbo' schema (SQL Server).
+# On backends without schemas (SQLite stand-in) the schema is translated away.
+SCHEMA_TRANSLATE_MAPS = {
+    "mssql": {"dbo": "dbo"},
+    "sqlite": {"dbo": None},
+}
+
+
+def schema_for(dialect_name: str):
+    """The schema the 'dbo' tables live in on the given backend (None where schemas are translated away)."""
+    return SCHEMA_TRANSLATE_MAPS.get(dialect_name, {"dbo": None})["dbo"]
+
+
+def _env_override(name: str, default):
+    """Reads DB_<NAME> from the environment, coerced to the type of the profile default."""
+    raw = os.getenv(f"DB_{name.upper()}")
+    if raw is None or raw == "":
+        return default
+    if isinstance(default, bool):
+        return raw.strip().lower() in ("1", "true", "yes", "on")
+    if isinstance(default, int):
+        return int(raw)
+    return raw
+
+
+def get_engine_settings(profile: str = None) -> dict:
+    """Returns the resolved settings for a named profile, with DB_* environment overrides applied."""
+    profile = profile or os.getenv("DB_PROFILE", "prod")
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE '{profile}'. Expected one of: {', '.join(ENGINE_PROFILES)}")
+    settings = {key: _env_override(key, value) for key, value in ENGINE_PROFILES[profile].items()}
+    settings["profile"] = profile
+    return settings
+
+
+def to_async_url(url: str) -> str:
+    """The URL with its driver swapped for the matching asyncio driver (ASYNC_DRIVERS)."""
+    url_obj = make_url(url)
+    name = f"{url_obj.get_backend_name()}+{url_obj.get_driver_name()}"
+    if name not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver for '{name}'. Supported: {', '.join(ASYNC_DRIVERS)}")
+    return url_obj.set(drivername=ASYNC_DRIVERS[name]).render_as_string(hide_password=False)
+
+
+def make_engine(url: str = None, profile: str = None, is_async: bool = False):
+    """
+    Creates an engine for the given URL using a named profile (dev/prod/bench).
+    Pool and driver options that don't apply to the URL's backend are left out.
+    With is_async, returns an AsyncEngine on the URL's asyncio driver (see to_async_url),
+    pooling the profile's async_pool_size connections.
+    """
+    url = url or DATABASE_URL
+    settings = get_engine_settings(profile)
+    if is_async:
+        url = to_async_url(url)
+        settings["pool_size"] = settings["async_pool_size"]
+    url_obj = make_url(url)
+    backend = url_obj.get_backend_name()
+
+    engine_kwargs = {
+        "echo": settings["echo"],
+        "execution_options": {"schema_translate_map": SCHEMA_TRANSLATE_MAPS.get(backend, {"dbo": None})},
+    }
+    connect_args = {}
+
+    if backend == "sqlite":
+        # SQLite's 'timeout' is how long to wait on a locked database file.
+        connect_args["check_same_thread"] = False
+        if settings["statement_timeout"]:
+            connect_args["timeout"] = settings["statement_timeout"]
+        if url_obj.database not in (None, "", ":memory:"):
+            engine_kwargs.update(
+                pool_size=settings["pool_size"],
+                max_overflow=settings["max_overflow"],
+                pool_timeout=settings["pool_timeout"],
+                pool_recycle=settings["pool_recycle"],
+                pool_pre_ping=settings["pool_pre_ping"],
+            )
+    else:
+        engine_kwargs.update(
+            pool_size=settings["pool_size"],
+            max_overflow=settings["max_overflow"],
+            pool_timeout=settings["pool_timeout"],
+            pool_recycle=settings["pool_recycle"],
+            pool_pre_ping=settings["pool_pre_ping"],
+        )
+        if backend == "mssql" and url_obj.get_driver_name() == "pyodbc":
+            # Sends executemany() parameter batches in one round-trip (bulk inserts of answers, users, ...)
+            engine_kwargs["fast_executemany"] = settings["fast_executemany"]
+
+    if connect_args:
+        engine_kwargs["connect_args"] = connect_args
+
+    new_engine = (create_async_engine if is_async else create_engine)(url, **engine_kwargs)
+    events_target = new_engine.sync_engine if is_async else new_engine # Events are set on the sync core
+
+    if backend == "mssql" and url_obj.get_driver_name() == "pyodbc" and settings["statement_timeout"]:
+        @event.listens_for(events_target, "connect")
+        def _set_query_timeout(dbapi_connection, connection_record):
+            # pyodbc applies Connection.timeout as the query timeout of every cursor
+            dbapi_connection.timeout = settings["statement_timeout"]
+
+    if backend == "sqlite":
+        @event.listens_for(events_target, "connect")
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys=ON")
+            if settings["profile"] == "bench":
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.close()
+
+    return new_engine
+
+
+# Create the SQLAlchemy engine for the configured profile.
+# SQL echo is off by default; set DB_ECHO=1 to print all SQL statements while debugging.
+engine = make_engine()
+
+# --- Read Replica Routing ---
+# When REPLICA_DATABASE_URL is set, read-only routes (see read_replica below) run their
+# queries on the replica engine and everything else stays on the primary `engine`.
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL")
+replica_engine = make_engine(REPLICA_DATABASE_URL) if REPLICA_DATABASE_URL else None
+
+
+# --- Forked Worker Processes ---
+# A pre-forking server (serve.py) may import the app, and open connections, before forking
+# its workers. A DBAPI connection must never be used by two processes, so a forked child
+# starts with empty pools; close=False leaves the parent's connections open for the parent.
+def dispose_engines_after_fork():
+    for forked_engine in filter(None, (engine, replica_engine)):
+        forked_engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"): # Not on Windows, which can't fork
+    os.register_at_fork(after_in_child=dispose_engines_after_fork)
+
+logger = logging.getLogger(__name__)
+
+# "replica" while a read_replica-decorated handler runs; "primary" when a request forces the primary
+_read_target: ContextVar = ContextVar("read_target", default=None)
+
+
+class ReplicaHealth:
+    """
+    Cached view of whether the replica may serve reads.
+    The replica is probed at most every `interval` seconds; while one thread probes,
+    others keep using the last result. Optionally `lag_query` (SQL returning the replica
+    delay in seconds) marks the replica unusable when it is more than `max_lag` behind.
+    """
+
+    def __init__(self, replica, interval: float = 5.0, max_lag: float = 30.0, lag_query: str = None):
+        self.replica = replica
+        self.interval = interval
+        self.max_lag = max_lag
+        self.lag_query = lag_query
+        self.healthy = replica is not None
+        self.lag = None
+        self.checked_at = 0.0
+        self._probe_lock = threading.Lock()
+
+    def is_usable(self) -> bool:
+        if self.replica is None:
+            return False
+        if time.monotonic() - self.checked_at >= self.interval and self._probe_lock.acquire(blocking=False):
+            try:
+                self.probe()
+            finally:
+                self._probe_lock.release()
+        return self.healthy
+
+    def probe(self):
+        try:
+            with self.replica.connect() as conn:
+                conn.execute(text("SELECT 1"))
+                lag = float(conn.execute(text(self.lag_query)).scalar() or 0) if self.lag_query else 0.0
+            self.lag = lag
+            self.healthy = lag <= self.max_lag
+            if not self.healthy:
+                logger.warning("Replica is %.1fs behind (max %.1fs); reading from primary.", lag, self.max_lag)
+        except Exception as e:
+            self.healthy = False
+            logger.warning("Replica health check failed; reading from primary: %s", e)
+        finally:
+            self.checked_at = time.monotonic()
+
+
+replica_health = ReplicaHealth(
+    replica_engine,
+    interval=float(os.getenv("REPLICA_HEALTH_INTERVAL", "5")),
+    max_lag=float(os.getenv("REPLICA_MAX_LAG_SECONDS", "30")),
+    lag_query=os.getenv("REPLICA_LAG_QUERY"),
+)
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to the replica inside read_replica handlers.
+    Flushes, INSERT/UPDATE/DELETE statements and any session that has already
+    written always use the primary, so a session never reads its own writes from the replica.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            _read_target.get() == "replica"
+            and not self._flushing
+            and not self.info.get("has_written")
+            and not getattr(clause, "is_dml", False)
+            and replica_health.is_usable()
+        ):
+            return replica_engine
+        return engine
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_session_written(session, flush_context):
+    session.info["has_written"] = True
+
+
+def read_replica(func):
+    """Marks a route handler as read-only so its queries may be served by the replica."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if _read_target.get() == "primary":
+            return func(*args, **kwargs)
+        token = _read_target.set("replica")
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _read_target.reset(token)
+    return wrapper
+
+
+def force_primary():
+    """
+    Pins the current context (request) to the primary, overriding read_replica.
+    Returns a token for release_read_target().
+    """
+    return _read_target.set("primary")
+
+
+def release_read_target(token):
+    _read_target.reset(token)
+
+
+# --- Request-Scoped Sessions ---
+# Handlers open sessions with `next(get_db())`, and not every path closes them. While a
+# request is tracked, every session that begins a transaction is recorded and closed
+# when the request ends, so its connection always goes back to the pool.
+_request_sessions: ContextVar = ContextVar("request_sessions", default=None)
+
+
+@event.listens_for(RoutingSession, "after_begin")
+def _track_request_session(session, transaction, connection):
+    sessions = _request_sessions.get()
+    if sessions is not None:
+        sessions.add(session)
+
+
+def track_request_sessions():
+    """Starts recording the sessions used by the current context (request). Returns a token for close_request_sessions()."""
+    return _request_sessions.set(set())
+
+
+def close_request_sessions(token):
+    sessions = _request_sessions.get() or ()
+    _request_sessions.reset(token)
+    for session in sessions:
+        try:
+            session.close()
+        except Exception as e:
+            logger.warning("Error closing request session: %s", e)
+
 
 # Create a SessionLocal class for database sessions
 # Each request will get its own database session
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
 
 # Base class for declarative models
 Base = declarative_base()
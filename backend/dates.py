@@ -0,0 +1,16 @@
+# dates.py
+"""
+Date parsing shared by the routes and manage.py, so every entry point accepts the same formats.
+
+The frontend sends ISO 8601 timestamps, usually UTC with a 'Z' suffix; the database stores
+naive UTC datetimes.
+"""
+from datetime import datetime, timezone
+
+
+def parse_iso_datetime(value: str) -> datetime:
+    """An ISO 8601 timestamp ('Z' or any offset, or naive UTC) as a naive UTC datetime. Raises ValueError."""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
@@ -0,0 +1,106 @@
+# gunicorn.conf.py
+"""
+Gunicorn settings for production serving (read by serve.py, or `gunicorn -c gunicorn.conf.py`).
+
+One master process forks WEB_CONCURRENCY worker processes. Each worker handles
+SERVER_THREADS requests at a time ("gthread" workers). The request handlers are
+synchronous and most of their time is spent waiting on SQL, so threads are cheap.
+Separate processes are what let CPU-bound work (JSON, templating, Excel exports) run
+on more than one core.
+
+Preloading (SERVER_PRELOAD=1):
+  The master imports the app, builds it and runs the warm-up once (see warmup.py).
+  Workers then fork with the mappers, permission index and response cache already warm,
+  and share those pages copy-on-write.
+  Connections are never shared across processes. database.py empties the pools in
+  every forked child, and post_fork() below opens WARMUP_POOL_CONNECTIONS fresh ones
+  per worker. The master also closes its own connections once the workers are up.
+
+Recycling (SERVER_MAX_REQUESTS):
+  A worker restarts after this many requests, plus up to SERVER_MAX_REQUESTS_JITTER
+  more so the workers don't all restart together. This bounds slow memory growth.
+  Restarts are graceful: in-flight requests finish first.
+
+Reloading:
+  kill -HUP <master pid>
+    Re-reads this file, starts new workers and stops the old ones once they have
+    finished their requests. With preloading the new workers fork from the app the
+    master already loaded, so a HUP does not pick up code changes.
+  kill -USR2 <master pid>, then -TERM to the old master
+    Starts a new master with the new code next to the old one, for deploys without
+    dropped requests.
+  kill -TERM <master pid>
+    Graceful stop. Workers get SERVER_GRACEFUL_TIMEOUT seconds to finish.
+
+Things that change with several workers:
+  - Database connections: every worker has its own pool, so the server opens up to
+    WEB_CONCURRENCY x (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections (see database.py).
+    Keep this under the database's connection limit.
+  - In-process state is per worker: /metrics, the local response cache, the slow-query
+    log and the permission index.
+    Cached responses stay correct because their keys include the data versions.
+    Cross-worker cache and permission-index invalidation needs a shared backend
+    (RESPONSE_CACHE_URL=redis://...). Otherwise the index is rebuilt after
+    PERMISSION_INDEX_MAX_AGE.
+  - The mail dispatcher and the reminder scheduler are not started in the workers.
+    Run `python mailer.py` and `python participation.py remind` (cron) next to the server.
+  - Load balancers should poll GET /readyz (see health.py).
+
+Settings (environment):
+    SERVER_BIND=0.0.0.0:5000
+    WEB_CONCURRENCY              worker processes (default: number of CPUs)
+    SERVER_THREADS=4             request threads per worker
+    SERVER_PRELOAD=1
+    SERVER_MAX_REQUESTS=1000     0 = never recycle workers
+    SERVER_MAX_REQUESTS_JITTER=100
+    SERVER_TIMEOUT=60            seconds before a silent worker is killed and replaced
+    SERVER_GRACEFUL_TIMEOUT=30
+    SERVER_KEEPALIVE=5
+"""
+import os
+import multiprocessing
+
+wsgi_app = "app:create_app(background_services=False)"
+
+bind = os.getenv("SERVER_BIND", "0.0.0.0:5000").split(",")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+threads = int(os.getenv("SERVER_THREADS", "4"))
+worker_class = "gthread"
+preload_app = os.getenv("SERVER_PRELOAD", "1") == "1"
+max_requests = int(os.getenv("SERVER_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", "100"))
+timeout = int(os.getenv("SERVER_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("SERVER_KEEPALIVE", "5"))
+
+# Requests are logged by the app itself (logging_config.py), with request IDs
+accesslog = None
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "INFO").lower()
+proc_name = "lls-survey"
+
+
+# --- Server Hooks ---
+
+def when_ready(server):
+    # The master built (and warmed) the app when preloading; it serves no requests itself.
+    if preload_app:
+        import database
+        for engine in filter(None, (database.engine, database.replica_engine)):
+            engine.dispose()
+    if os.getenv("MAIL_DISPATCHER_ENABLED", "0") == "1" or os.getenv("REMINDER_SCHEDULER_ENABLED", "0") == "1":
+        server.log.warning("The mail dispatcher and reminder scheduler don't run in server workers; "
+                           "run `python mailer.py` and `python participation.py remind` separately.")
+    server.log.info("Serving with %d workers x %d threads (preload %s, max requests %d)",
+                    workers, threads, "on" if preload_app else "off", max_requests)
+
+
+def post_fork(server, worker):
+    # database.py has emptied the inherited pools; open this worker's own connections
+    if preload_app:
+        import warmup
+        if warmup.WARMUP_ENABLED:
+            try:
+                warmup.prime_pools()
+            except Exception as e:
+                server.log.warning("Worker %s could not prime its connection pool: %s", worker.pid, e)
@@ -0,0 +1,67 @@
+# health.py
+"""
+Liveness and readiness endpoints for load balancers and process supervisors.
+
+    GET /healthz   the worker is up and answering (no database access); always 200
+    GET /readyz    the worker can serve traffic: 200 when the primary database answers
+                   'SELECT 1' within the pool's checkout timeout, otherwise 503
+
+/readyz also reports whether the replica (when configured) is in use and how long the
+warm-up took; neither affects the status, since the app falls back to the primary and
+a cold worker still serves correct responses. Neither endpoint needs a login, and
+both are cheap enough to poll every few seconds from every worker.
+
+Settings (environment):
+    HEALTH_ENABLED=1
+"""
+import os
+import time
+import logging
+
+from flask import current_app, jsonify
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+HEALTH_ENABLED = os.getenv("HEALTH_ENABLED", "1") == "1"
+
+
+def check_database(engine) -> dict:
+    """{"ok", "ms"} for one 'SELECT 1' round trip on `engine` (plus "error" when it failed)."""
+    started = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        result = {"ok": True}
+    except Exception as e:
+        result = {"ok": False, "error": str(e).splitlines()[0] if str(e) else type(e).__name__}
+    result["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def healthz():
+    return jsonify({"status": "ok", "pid": os.getpid()}), 200
+
+
+def readyz():
+    import database
+
+    primary = check_database(database.engine)
+    body = {"status": "ready" if primary["ok"] else "unavailable", "pid": os.getpid(), "database": primary}
+    if database.replica_engine is not None:
+        body["replica"] = {"in_use": database.replica_health.is_usable(), "lag": database.replica_health.lag}
+    warmup = current_app.extensions.get("warmup")
+    body["warmup_ms"] = warmup["total_ms"] if warmup else None
+
+    if not primary["ok"]:
+        logger.warning("Readiness check failed: %s", primary["error"])
+        return jsonify(body), 503
+    return jsonify(body), 200
+
+
+def init_app(app):
+    """Serves GET /healthz and GET /readyz for `app`."""
+    if not HEALTH_ENABLED:
+        return
+    app.add_url_rule("/healthz", view_func=healthz, methods=["GET"])
+    app.add_url_rule("/readyz", view_func=readyz, methods=["GET"])
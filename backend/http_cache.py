@@ -0,0 +1,126 @@
+# http_cache.py
+"""
+Conditional GETs for read-mostly routes.
+
+A route decorated with @conditional("departments", ...) names the tables its response
+is built from. Before the handler runs, the tables' change counters are read in one
+query (data_versions.read) and turned into
+  - a weak ETag: a hash of the endpoint, the path and query string, and the counters, and
+  - a Last-Modified date: the latest change of any of the tables.
+A request whose If-None-Match (or, without it, If-Modified-Since) matches gets an empty
+304 straight away, without loading ORM objects or serializing JSON. Otherwise the
+handler runs and a 200 response is sent with the ETag, Last-Modified and the route's
+Cache-Control policy.
+
+The ETag is weak because compression.py may encode the same JSON differently.
+Responses must be the same for every caller of the URL (no per-user content).
+
+Settings (environment):
+    HTTP_CACHE_ENABLED=1
+    CACHE_CONTROL_DEFAULT="private, no-cache"  browsers keep the response but revalidate it every time
+    CACHE_CONTROL        per-route policies overriding the route's default, separated by ';', e.g.
+                         "permission_bp.get_departments=private, max-age=300;survey.get_surveys=private, max-age=30"
+    ETAG_SALT            part of every ETag; change it on deploys that change response formats
+"""
+import os
+import hashlib
+import logging
+from datetime import timezone
+from functools import wraps
+
+from flask import current_app, g, make_response, request
+
+import data_versions
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "1") == "1"
+CACHE_CONTROL_DEFAULT = os.getenv("CACHE_CONTROL_DEFAULT", "private, no-cache")
+ETAG_SALT = os.getenv("ETAG_SALT", "")
+
+
+def parse_policies(value: str) -> dict:
+    policies = {}
+    for item in filter(None, (part.strip() for part in (value or "").split(";"))):
+        endpoint, _, policy = item.partition("=")
+        policies[endpoint.strip()] = policy.strip()
+    return policies
+
+
+CACHE_CONTROL = parse_policies(os.getenv("CACHE_CONTROL", ""))
+
+
+def cache_control_for(endpoint: str, default: str = None) -> str:
+    return CACHE_CONTROL.get(endpoint) or default or CACHE_CONTROL_DEFAULT
+
+
+def make_etag(endpoint: str, url: str, versions: dict) -> str:
+    """Opaque validator for `url` as served by `endpoint` at the given table versions."""
+    stamp = ",".join(f"{table}:{version}" for table, (version, _) in sorted(versions.items()))
+    return hashlib.sha1(f"{ETAG_SALT}|{endpoint}|{url}|{stamp}".encode()).hexdigest()[:32]
+
+
+def last_modified(versions: dict):
+    stamps = [updated_at for _, updated_at in versions.values() if updated_at is not None]
+    return max(stamps).replace(tzinfo=timezone.utc) if stamps else None # Stored as naive UTC
+
+
+def is_not_modified(if_none_match, if_modified_since, etag: str, modified_at) -> bool:
+    """`if_none_match` (werkzeug ETags) and `if_modified_since` (aware datetime) as parsed from the request."""
+    if if_none_match:
+        return if_none_match.contains_weak(etag)
+    if modified_at is not None and if_modified_since is not None:
+        return modified_at.replace(microsecond=0) <= if_modified_since
+    return False
+
+
+def current_versions(tables):
+    """data_versions.read() for `tables`, read once per request (conditional and cached routes share it)."""
+    key = tuple(sorted(tables))
+    memo = g.setdefault("data_versions", {})
+    if key not in memo:
+        db = SessionLocal()
+        try:
+            memo[key] = data_versions.read(db, key)
+        finally:
+            db.close()
+    return memo[key]
+
+
+def conditional(*tables, cache_control: str = None):
+    """
+    Serves 304 Not Modified to clients holding the current version of the response,
+    which is built from `tables`. `cache_control` is the route's default policy
+    (CACHE_CONTROL overrides it per endpoint).
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not HTTP_CACHE_ENABLED or request.method not in ("GET", "HEAD"):
+                return func(*args, **kwargs)
+            try:
+                versions = current_versions(tables)
+            except Exception as e: # Serve uncached rather than fail the request
+                logger.warning("Could not read data versions for %s: %s", request.endpoint, e)
+                return func(*args, **kwargs)
+            if len(versions) != len(set(tables)): # A table without a counter row would never change the ETag
+                return func(*args, **kwargs)
+
+            etag = make_etag(request.endpoint, request.full_path, versions)
+            modified_at = last_modified(versions)
+            policy = cache_control_for(request.endpoint, cache_control)
+
+            if is_not_modified(request.if_none_match, request.if_modified_since, etag, modified_at):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(func(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if modified_at is not None:
+                response.last_modified = modified_at
+            response.headers["Cache-Control"] = policy
+            return response
+        return wrapper
+    return decorator
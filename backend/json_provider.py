@@ -0,0 +1,66 @@
+# json_provider.py
+"""
+Fast JSON provider for Flask (app.json_provider_class).
+
+Uses orjson when it is installed, which serializes dicts, lists, datetimes, dates,
+UUIDs, dataclasses and numpy values natively in C, and falls back to the stdlib
+encoder otherwise. Either way datetimes and dates are written as ISO 8601
+("2025-07-16T09:30:00", naive UTC as stored), so handlers can return them as they
+come from the models instead of calling .isoformat()/.strftime() themselves.
+
+Differences from Flask's default provider: datetimes are ISO 8601 instead of HTTP
+dates, and keys are not sorted (JSON_SORT_KEYS/sort_keys is ignored on the orjson path).
+
+dumps_bytes() is also what the ASGI read app (asgi.py) serializes with, so both apps
+write the same bytes for the same data.
+"""
+import json
+import decimal
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError: # Optional: the stdlib encoder is used instead
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+
+
+def _default(o):
+    """Types neither encoder handles natively."""
+    if isinstance(o, date): # datetime is a date subclass (stdlib path only; orjson handles both)
+        return o.isoformat()
+    if isinstance(o, decimal.Decimal):
+        return float(o)
+    return DefaultJSONProvider.default(o) # dataclasses, UUIDs, __html__ objects; raises TypeError otherwise
+
+
+def dumps_bytes(obj, **kwargs) -> bytes:
+    if orjson is not None and not kwargs:
+        return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+    kwargs.setdefault("default", _default)
+    kwargs.setdefault("ensure_ascii", False)
+    kwargs.setdefault("separators", (",", ":"))
+    return json.dumps(obj, **kwargs).encode()
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs) -> str:
+        return self.dumps_bytes(obj, **kwargs).decode()
+
+    def dumps_bytes(self, obj, **kwargs) -> bytes:
+        return dumps_bytes(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        # Builds the body as bytes directly (no str round-trip as in the default provider)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
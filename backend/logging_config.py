@@ -0,0 +1,243 @@
+# logging_config.py
+"""
+Structured, non-blocking logging.
+
+configure_logging() routes every log record through a QueueHandler. A QueueListener
+thread formats and writes the records (one JSON object per line by default), so
+handlers never wait on stdout. Records are enqueued unformatted: the message's
+%-arguments are only rendered on the listener thread, and calls below the configured
+level return before building a record at all. So log with arguments, not f-strings:
+
+    logger.info("Permissions saved: %d added", added)       # rendered off the request thread
+    logger.debug("Payload: %s", payload)                     # costs nothing unless DEBUG is on
+
+init_app() gives every request an ID (the incoming X-Request-ID header when it is a
+plausible ID, otherwise a new one). The ID is returned in the X-Request-ID header and
+added to every record logged while the request runs, together with the route.
+RequestLogMiddleware does the same for the ASGI read app (asgi.py).
+
+Settings (environment):
+    LOG_LEVEL=INFO
+    LOG_FORMAT=json          or "text" for human-readable lines during development
+    LOG_SAMPLE_RATES         per-route sampling of INFO and lower lines, e.g.
+                             "verify_auth=0.1,survey.get_surveys=0.01" (warnings are never sampled)
+    LOG_ACCESS=1             one line per request on the "access" logger (method, path, status, duration)
+"""
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_ACCESS = os.getenv("LOG_ACCESS", "1") == "1"
+
+REQUEST_ID_HEADER = "X-Request-ID"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# (request id, route) of the request being handled on this thread/task
+_request_context: ContextVar = ContextVar("log_request_context", default=(None, None))
+
+# Attributes every LogRecord has; anything else was passed with extra={...}
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id", "route"}
+
+
+def parse_sample_rates(value: str) -> dict:
+    rates = {}
+    for item in filter(None, (part.strip() for part in (value or "").split(","))):
+        route, _, rate = item.partition("=")
+        rates[route.strip()] = float(rate)
+    return rates
+
+
+LOG_SAMPLE_RATES = parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+
+
+# --- Formatting (listener thread) ---
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+            entry["route"] = record.route
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = "-"
+        return super().format(record)
+
+
+# --- Enqueueing (request thread) ---
+
+class RequestQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records with the current request's ID and route attached, dropping sampled-out
+    INFO/DEBUG lines. Unlike the stock QueueHandler it doesn't format the message before
+    enqueueing; that happens on the listener thread.
+    """
+
+    def __init__(self, log_queue, sample_rates=None):
+        super().__init__(log_queue)
+        self.sample_rates = sample_rates or {}
+
+    def prepare(self, record):
+        return record
+
+    def emit(self, record):
+        request_id, route = _request_context.get()
+        if record.levelno <= logging.INFO and route in self.sample_rates and random.random() >= self.sample_rates[route]:
+            return
+        record.request_id = request_id
+        record.route = route
+        if record.exc_info and record.exc_text is None:
+            # Tracebacks reference frames that may change before the listener gets to them
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        super().emit(record)
+
+
+_listener = None
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream=None):
+    """Installs the queue-based handler on the root logger (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(RequestQueueHandler(log_queue, LOG_SAMPLE_RATES))
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_stop_listener) # Flush what is still queued on shutdown
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def _restart_listener_after_fork():
+    # The listener thread isn't copied into a forked child (e.g. a serve.py worker), so records
+    # would queue up unwritten there. The child gets its own queue and listener.
+    global _listener
+    if _listener is None:
+        return
+    log_queue = queue.SimpleQueue()
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, RequestQueueHandler):
+            handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+if hasattr(os, "register_at_fork"): # Not on Windows, which can't fork
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+
+# --- Flask Integration ---
+
+access_logger = logging.getLogger("access")
+
+
+def init_app(app):
+    """Assigns request IDs, tags log records with them and writes the access log."""
+    from flask import g, request
+
+    @app.before_request
+    def start_request_log_context():
+        incoming = request.headers.get(REQUEST_ID_HEADER, "")
+        g.request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        g.request_log_started = time.perf_counter()
+        g.request_log_token = _request_context.set((g.request_id, request.endpoint or "unmatched"))
+
+    @app.after_request
+    def finish_request_log(response):
+        request_id = g.get("request_id")
+        if request_id is None:
+            return response
+        response.headers[REQUEST_ID_HEADER] = request_id
+        if LOG_ACCESS and access_logger.isEnabledFor(logging.INFO):
+            access_logger.info(
+                "%s %s %s", request.method, request.path, response.status_code,
+                extra={"status": response.status_code,
+                       "duration_ms": round((time.perf_counter() - g.request_log_started) * 1000, 2)},
+            )
+        return response
+
+    @app.teardown_request
+    def reset_request_log_context(exc=None):
+        token = g.pop("request_log_token", None)
+        if token is not None:
+            _request_context.reset(token)
+
+
+# --- ASGI Integration ---
+
+class RequestLogMiddleware:
+    """init_app() for the ASGI read app (asgi.py): request IDs, tagged records and the access log."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        incoming = next((value.decode("latin-1") for name, value in scope["headers"] if name == b"x-request-id"), "")
+        request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        started = time.perf_counter()
+        status = 500
+        token = _request_context.set((request_id, scope["path"])) # Routes are labelled by path here
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", ()), (b"x-request-id", request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            if LOG_ACCESS and access_logger.isEnabledFor(logging.INFO):
+                access_logger.info(
+                    "%s %s %s", scope["method"], scope["path"], status,
+                    extra={"status": status, "duration_ms": round((time.perf_counter() - started) * 1000, 2)},
+                )
+            _request_context.reset(token)
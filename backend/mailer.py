@@ -0,0 +1,322 @@
+# mailer.py
+"""
+Outbox-based email delivery.
+
+Request handlers call enqueue() to insert one mail_outbox row per recipient (a single
+bulk INSERT, committed with the request's transaction) and return immediately.
+OutboxDispatcher runs in the background, claims due rows in batches, sends them over
+a pool of reused SMTP connections with MAIL_CONCURRENCY parallel senders, and retries
+failures with exponential backoff up to MAIL_MAX_ATTEMPTS.
+
+Run the dispatcher as its own process:
+    python mailer.py            # poll forever
+    python mailer.py --once     # deliver what is due, then exit
+or inside the web process with MAIL_DISPATCHER_ENABLED=1.
+
+For local testing point SMTP_HOST/SMTP_PORT at a stand-in SMTP server, e.g.
+    python -m aiosmtpd -n -l localhost:1025
+"""
+import os
+import queue
+import smtplib
+import socket
+import threading
+import time
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from sqlalchemy import insert, update, select, and_, or_
+
+from database import SessionLocal
+from models import MailOutbox
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "25"))
+SMTP_USER = os.getenv("SMTP_USER")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "0") == "1"
+SMTP_SSL = os.getenv("SMTP_SSL", "0") == "1"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+MAIL_FROM = os.getenv("MAIL_FROM", "survey-noreply@lls.com")
+
+MAIL_CONCURRENCY = int(os.getenv("MAIL_CONCURRENCY", "4"))
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", "200"))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "5"))
+MAIL_RETRY_BACKOFF = float(os.getenv("MAIL_RETRY_BACKOFF", "60"))     # seconds, doubled per attempt
+MAIL_POLL_INTERVAL = float(os.getenv("MAIL_POLL_INTERVAL", "5"))      # seconds between polls when idle
+MAIL_CLAIM_TIMEOUT = float(os.getenv("MAIL_CLAIM_TIMEOUT", "600"))    # seconds before a stuck 'sending' row is retried
+
+
+# --- Enqueueing ---
+
+def enqueue(db, kind: str, messages) -> int:
+    """
+    Adds one outbox row per message in a single bulk INSERT. The caller commits.
+    `messages` are dicts with recipient_email, subject, body and optionally recipient_user_id.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            "kind": kind,
+            "recipient_user_id": message.get("recipient_user_id"),
+            "recipient_email": message["recipient_email"],
+            "subject": message["subject"],
+            "body": message["body"],
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+        }
+        for message in messages
+    ]
+    if rows:
+        db.execute(insert(MailOutbox), rows)
+    return len(rows)
+
+
+# --- SMTP Connection Pool ---
+
+class SMTPConnectionPool:
+    """Keeps up to `size` logged-in SMTP connections for reuse across messages."""
+
+    def __init__(self, size: int, host=SMTP_HOST, port=SMTP_PORT, user=SMTP_USER, password=SMTP_PASSWORD,
+                 starttls=SMTP_STARTTLS, use_ssl=SMTP_SSL, timeout=SMTP_TIMEOUT):
+        self.host, self.port, self.user, self.password = host, port, user, password
+        self.starttls, self.use_ssl, self.timeout = starttls, use_ssl, timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _connect(self):
+        smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        conn = smtp_class(self.host, self.port, timeout=self.timeout)
+        if self.starttls and not self.use_ssl:
+            conn.starttls()
+        if self.user:
+            conn.login(self.user, self.password)
+        return conn
+
+    def send(self, message: EmailMessage):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            conn.send_message(message)
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException):
+            # The server refused this message (sender, recipients or data): the connection
+            # is still usable, so reset its state and keep it. SMTPServerDisconnected is not
+            # an SMTPResponseException, so it is not caught here.
+            try:
+                conn.rset()
+            except Exception:
+                self._discard(conn)
+            else:
+                self._release(conn)
+            raise
+        except (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout):
+            # The pooled connection went stale: retry once on a fresh one
+            self._discard(conn)
+            conn = self._connect()
+            try:
+                conn.send_message(message)
+            except Exception:
+                self._discard(conn)
+                raise
+        except Exception:
+            self._discard(conn) # Unknown state: don't reuse it
+            raise
+        self._release(conn)
+
+    def _release(self, conn):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            self._discard(conn)
+
+    def _discard(self, conn):
+        try:
+            conn.quit()
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+# --- Dispatcher ---
+
+class OutboxDispatcher:
+    def __init__(self, session_factory=SessionLocal, pool: SMTPConnectionPool = None,
+                 concurrency: int = MAIL_CONCURRENCY, batch_size: int = MAIL_BATCH_SIZE,
+                 max_attempts: int = MAIL_MAX_ATTEMPTS, poll_interval: float = MAIL_POLL_INTERVAL):
+        self.session_factory = session_factory
+        self.pool = pool or SMTPConnectionPool(size=concurrency)
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.dispatcher_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="mail-sender")
+        self._stop = threading.Event()
+        self._thread = None
+
+    def claim_batch(self, db):
+        """Marks up to batch_size due rows as 'sending' by this dispatcher and returns them."""
+        now = datetime.utcnow()
+        stale_claim = now - timedelta(seconds=MAIL_CLAIM_TIMEOUT)
+        due = or_(
+            and_(MailOutbox.status == "pending", MailOutbox.next_attempt_at <= now),
+            and_(MailOutbox.status == "sending", MailOutbox.claimed_at < stale_claim),
+        )
+        ids = db.execute(
+            select(MailOutbox.id).where(due).order_by(MailOutbox.id).limit(self.batch_size)
+        ).scalars().all()
+        if not ids:
+            return []
+        # The status condition is repeated so a row claimed concurrently by another dispatcher is skipped
+        db.execute(
+            update(MailOutbox)
+            .where(MailOutbox.id.in_(ids), due)
+            .values(status="sending", claimed_by=self.dispatcher_id, claimed_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return db.execute(
+            select(MailOutbox.id, MailOutbox.recipient_email, MailOutbox.subject, MailOutbox.body, MailOutbox.attempts)
+            .where(MailOutbox.id.in_(ids), MailOutbox.claimed_by == self.dispatcher_id, MailOutbox.status == "sending")
+        ).all()
+
+    def _send_one(self, row):
+        message = EmailMessage()
+        message["From"] = MAIL_FROM
+        message["To"] = row.recipient_email
+        message["Subject"] = row.subject
+        message.set_content(row.body)
+        try:
+            self.pool.send(message)
+            return row, None
+        except Exception as e:
+            return row, e
+
+    def run_once(self) -> int:
+        """Sends one claimed batch. Returns the number of rows processed."""
+        db = self.session_factory()
+        try:
+            rows = self.claim_batch(db)
+            if not rows:
+                return 0
+
+            results = list(self._executor.map(self._send_one, rows))
+
+            now = datetime.utcnow()
+            sent_ids = [row.id for row, error in results if error is None]
+            retries, failures = [], []
+            for row, error in results:
+                if error is None:
+                    continue
+                attempts = row.attempts + 1
+                if attempts >= self.max_attempts:
+                    failures.append({"id": row.id, "status": "failed", "attempts": attempts, "last_error": str(error),
+                                     "claimed_by": None})
+                else:
+                    retries.append({"id": row.id, "status": "pending", "attempts": attempts, "last_error": str(error),
+                                    "claimed_by": None,
+                                    "next_attempt_at": now + timedelta(seconds=MAIL_RETRY_BACKOFF * 2 ** (attempts - 1))})
+
+            if sent_ids:
+                db.execute(
+                    update(MailOutbox).where(MailOutbox.id.in_(sent_ids))
+                    .values(status="sent", sent_at=now, claimed_by=None, last_error=None)
+                    .execution_options(synchronize_session=False)
+                )
+            if retries:
+                db.execute(update(MailOutbox), retries)
+            if failures:
+                db.execute(update(MailOutbox), failures)
+            db.commit()
+
+            logger.info("Mail batch: %d sent, %d to retry, %d failed.", len(sent_ids), len(retries), len(failures))
+            return len(rows)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def drain(self) -> int:
+        """Sends batches until nothing is due."""
+        total = 0
+        while True:
+            processed = self.run_once()
+            total += processed
+            if processed == 0:
+                return total
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.run_once()
+            except Exception as e:
+                logger.exception("Mail dispatcher batch failed: %s", e)
+                processed = 0
+            if processed < self.batch_size:
+                self._stop.wait(self.poll_interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="mail-dispatcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._executor.shutdown(wait=True)
+        self.pool.close()
+
+
+_dispatcher = None
+
+
+def start_background_dispatcher():
+    """Starts the process-wide dispatcher thread (used by the web process when MAIL_DISPATCHER_ENABLED=1)."""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = OutboxDispatcher()
+    return _dispatcher.start()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Deliver queued outbox emails.")
+    parser.add_argument("--once", action="store_true", help="Send everything that is due, then exit.")
+    args = parser.parse_args()
+
+    dispatcher = OutboxDispatcher()
+    if args.once:
+        print(f"Processed {dispatcher.drain()} outbox rows.")
+        dispatcher.stop()
+    else:
+        print(f"Mail dispatcher {dispatcher.dispatcher_id} polling every {dispatcher.poll_interval}s (Ctrl+C to stop).")
+        dispatcher.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            dispatcher.stop()
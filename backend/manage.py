@@ -0,0 +1,334 @@
+# manage.py
+"""
+Admin CLI for bulk, idempotent upserts of departments, users and the permission matrix.
+
+    python manage.py departments departments.csv        # column: name
+    python manage.py users users.xlsx                   # username, name, email, department[, password, role, is_active]
+    python manage.py permissions matrix.csv --replace   # from_department, to_department, start_date, end_date[, can_survey_self]
+
+Every command compares the file with the database first and applies only the
+difference (inserts and updates in batches of MANAGE_BATCH_SIZE with executemany),
+so re-running it with the same file changes nothing. --dry-run prints that diff
+without writing. Rows with errors are reported and skipped; the exit status is 1
+if there were any.
+
+Only database.py/models.py are used (not the Flask app or its routes), and the
+schema is expected to exist already (`alembic upgrade head`). Running web processes
+pick up permission changes within PERMISSION_INDEX_MAX_AGE seconds; conditional
+GETs see the change at once through the data_versions counters.
+"""
+import os
+import sys
+import time
+import argparse
+
+from sqlalchemy import select, insert, update, delete
+
+from database import SessionLocal
+from dates import parse_iso_datetime
+import data_versions # noqa: F401  (commits bump the change counters behind cached responses)
+from models import Department, User, Permission
+from user_import import iter_rows, hash_pool, hash_passwords, ImportFileError, IMPORT_HASH_WORKERS, DEFAULT_ROLE
+
+MANAGE_BATCH_SIZE = int(os.getenv("MANAGE_BATCH_SIZE", "1000")) # Also keeps IN lists under SQL Server's 2100 parameters
+TRUE_VALUES = {"1", "true", "yes", "y"}
+
+
+def chunked(items, size=MANAGE_BATCH_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def parse_bool(value: str) -> bool:
+    return value.strip().lower() in TRUE_VALUES
+
+
+class Plan:
+    """The difference between a file and the database: rows to insert, update and delete."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.inserts = []   # row dicts for insert()
+        self.updates = []   # row dicts with the primary key "id" for update()
+        self.deletes = []   # primary keys
+        self.changes = []   # human-readable lines for the diff
+        self.errors = []    # (row_number, message)
+        self.unchanged = 0
+
+    def error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+    def summary(self) -> str:
+        return (f"{self.name}: {len(self.inserts)} to add, {len(self.updates)} to update, "
+                f"{len(self.deletes)} to delete, {self.unchanged} unchanged, {len(self.errors)} errors")
+
+    def print(self, verbose: bool):
+        lines = [f"! row {row_number}: {message}" for row_number, message in self.errors] + self.changes
+        shown = lines if verbose else lines[:20]
+        for line in shown:
+            print(f"  {line}")
+        if len(shown) < len(lines):
+            print(f"  ... {len(lines) - len(shown)} more (use --verbose to list all)")
+        print(self.summary())
+
+
+def _department_ids_by_name(db):
+    return {name.lower(): (dept_id, name) for dept_id, name in db.execute(select(Department.id, Department.name))}
+
+
+# --- Departments ---
+
+def plan_departments(db, rows) -> Plan:
+    plan = Plan("departments")
+    known = _department_ids_by_name(db)
+    for row_number, record in rows:
+        name = record["name"]
+        if not name:
+            plan.error(row_number, "Missing name")
+        elif name.lower() in known:
+            plan.unchanged += 1
+        else:
+            known[name.lower()] = (None, name) # Later rows with the same name (any case) are duplicates
+            plan.inserts.append({"name": name})
+            plan.changes.append(f"+ {name}")
+    return plan
+
+
+def apply_departments(db, plan: Plan):
+    for batch in chunked(plan.inserts):
+        db.execute(insert(Department), batch)
+        db.commit()
+
+
+# --- Users ---
+
+USER_COLUMNS = ("username", "name", "email", "department")
+
+
+def plan_users(db, rows, reset_passwords: bool = False) -> Plan:
+    plan = Plan("users")
+    departments = _department_ids_by_name(db)
+    existing = {
+        row.username.lower(): row for row in db.execute(
+            select(User.id, User.username, User.name, User.email, User.department, User.department_id, User.role, User.is_active)
+        )
+    }
+    email_owner = {row.email.lower(): username for username, row in existing.items()}
+    seen = set()
+
+    for row_number, record in rows:
+        missing = [column for column in USER_COLUMNS if not record.get(column)]
+        if missing:
+            plan.error(row_number, f"Missing {', '.join(missing)}")
+            continue
+        username, email = record["username"], record["email"]
+        key = username.lower()
+        if key in seen:
+            plan.error(row_number, f"Username '{username}' appears more than once in the file")
+            continue
+        seen.add(key)
+        department = departments.get(record["department"].lower())
+        if department is None:
+            plan.error(row_number, f"Department '{record['department']}' not found")
+            continue
+        owner = email_owner.get(email.lower())
+        if owner is not None and owner != key:
+            plan.error(row_number, f"Email '{email}' already belongs to '{owner}'")
+            continue
+
+        wanted = {
+            "name": record["name"],
+            "email": email,
+            "department": department[1],
+            "department_id": department[0],
+        }
+        if record.get("role"):
+            wanted["role"] = record["role"]
+        if record.get("is_active"):
+            wanted["is_active"] = parse_bool(record["is_active"])
+
+        current = existing.get(key)
+        if current is None:
+            if not record.get("password"):
+                plan.error(row_number, f"New user '{username}' needs a password")
+                continue
+            plan.inserts.append({"username": username, "role": DEFAULT_ROLE, "is_active": True,
+                                 **wanted, "password": record["password"]})
+            plan.changes.append(f"+ {username} ({email}, {department[1]})")
+        else:
+            diff = {field: value for field, value in wanted.items() if getattr(current, field) != value}
+            reset = reset_passwords and bool(record.get("password"))
+            if diff or reset:
+                plan.updates.append({"id": current.id, **diff, **({"password": record["password"]} if reset else {})})
+                described = [f"{field} {getattr(current, field)!r} -> {value!r}" for field, value in diff.items()
+                             if field != "department_id"]
+                if reset:
+                    described.append("password reset")
+                plan.changes.append(f"~ {username}: {', '.join(described)}")
+            else:
+                plan.unchanged += 1
+        email_owner[email.lower()] = key
+    return plan
+
+
+def apply_users(db, plan: Plan, workers: int = IMPORT_HASH_WORKERS):
+    pool = hash_pool(workers)
+    for batch in chunked(plan.inserts):
+        for row, hashed in zip(batch, hash_passwords(pool, [row.pop("password") for row in batch])):
+            row["hashed_password"] = hashed
+        db.execute(insert(User), batch)
+        db.commit()
+
+    # Executemany groups rows by the set of columns they change
+    for batch in chunked(plan.updates):
+        resets = [row for row in batch if "password" in row]
+        for row, hashed in zip(resets, hash_passwords(pool, [row.pop("password") for row in resets])):
+            row["hashed_password"] = hashed
+        db.execute(update(User), batch)
+        db.commit()
+
+
+# --- Permissions ---
+
+PERMISSION_COLUMNS = ("from_department", "to_department", "start_date", "end_date")
+
+
+def plan_permissions(db, rows, replace: bool = False) -> Plan:
+    plan = Plan("permissions")
+    departments = _department_ids_by_name(db)
+    names = {dept_id: name for dept_id, name in departments.values()}
+    existing = {
+        (row.from_dept_id, row.to_dept_id): row for row in db.execute(
+            select(Permission.id, Permission.from_dept_id, Permission.to_dept_id,
+                   Permission.start_date, Permission.end_date, Permission.can_survey_self)
+        )
+    }
+    seen = set()
+
+    for row_number, record in rows:
+        missing = [column for column in PERMISSION_COLUMNS if not record.get(column)]
+        if missing:
+            plan.error(row_number, f"Missing {', '.join(missing)}")
+            continue
+        from_dept = departments.get(record["from_department"].lower())
+        to_dept = departments.get(record["to_department"].lower())
+        if from_dept is None or to_dept is None:
+            unknown = record["from_department"] if from_dept is None else record["to_department"]
+            plan.error(row_number, f"Department '{unknown}' not found")
+            continue
+        try:
+            start_date, end_date = parse_iso_datetime(record["start_date"]), parse_iso_datetime(record["end_date"])
+        except ValueError:
+            plan.error(row_number, "Invalid start_date/end_date. Expected ISO format.")
+            continue
+        if end_date < start_date:
+            plan.error(row_number, "end_date is before start_date")
+            continue
+        can_survey_self = parse_bool(record.get("can_survey_self", ""))
+        if from_dept[0] == to_dept[0] and not can_survey_self:
+            plan.error(row_number, f"'{from_dept[1]}' surveying itself needs can_survey_self")
+            continue
+
+        key = (from_dept[0], to_dept[0])
+        if key in seen:
+            plan.error(row_number, f"{from_dept[1]} -> {to_dept[1]} appears more than once in the file")
+            continue
+        seen.add(key)
+
+        wanted = {"start_date": start_date, "end_date": end_date, "can_survey_self": can_survey_self}
+        label = f"{from_dept[1]} -> {to_dept[1]}"
+        current = existing.get(key)
+        if current is None:
+            plan.inserts.append({"from_dept_id": key[0], "to_dept_id": key[1], **wanted})
+            plan.changes.append(f"+ {label} ({start_date:%Y-%m-%d} .. {end_date:%Y-%m-%d})")
+        else:
+            diff = {field: value for field, value in wanted.items() if getattr(current, field) != value}
+            if diff:
+                plan.updates.append({"id": current.id, **diff})
+                plan.changes.append(f"~ {label}: " + ", ".join(f"{field} {getattr(current, field)} -> {value}" for field, value in diff.items()))
+            else:
+                plan.unchanged += 1
+
+    if replace and not plan.errors:
+        for key, current in existing.items():
+            if key not in seen:
+                plan.deletes.append(current.id)
+                plan.changes.append(f"- {names.get(key[0])} -> {names.get(key[1])}")
+    elif replace:
+        print("Not deleting permissions missing from the file because some rows have errors.")
+    return plan
+
+
+def apply_permissions(db, plan: Plan):
+    for batch in chunked(plan.deletes):
+        db.execute(delete(Permission).where(Permission.id.in_(batch)).execution_options(synchronize_session=False))
+    for batch in chunked(plan.updates):
+        db.execute(update(Permission), batch)
+    for batch in chunked(plan.inserts):
+        db.execute(insert(Permission), batch)
+    db.commit() # One transaction, so the matrix is never seen half-replaced
+
+
+# --- CLI ---
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk upsert departments, users and permissions from CSV/XLSX files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name, help_text):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("path", help="CSV or XLSX file with a header row")
+        command.add_argument("--dry-run", action="store_true", help="Print the diff without writing anything")
+        command.add_argument("--verbose", action="store_true", help="List every change and error, not just the first 20")
+        return command
+
+    add_command("departments", "Add departments that don't exist yet (column: name)")
+    users = add_command("users", "Create or update users by username")
+    users.add_argument("--reset-passwords", action="store_true",
+                       help="Also set the password of existing users that have one in the file")
+    users.add_argument("--workers", type=int, default=IMPORT_HASH_WORKERS, help="Password hashing threads")
+    permissions = add_command("permissions", "Create or update survey windows by (from_department, to_department)")
+    permissions.add_argument("--replace", action="store_true",
+                             help="Also delete permissions that are not in the file (the file is the whole matrix)")
+    args = parser.parse_args(argv)
+
+    required = {"departments": ("name",), "users": USER_COLUMNS, "permissions": PERMISSION_COLUMNS}[args.command]
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as f:
+            rows = iter_rows(f, args.path, required)
+            if args.command == "departments":
+                plan = plan_departments(db, rows)
+            elif args.command == "users":
+                plan = plan_users(db, rows, reset_passwords=args.reset_passwords)
+            else:
+                plan = plan_permissions(db, rows, replace=args.replace)
+        # The plan is built from a read-only snapshot; end that transaction before writing
+        db.rollback()
+
+        plan.print(args.verbose)
+        if args.dry_run:
+            print("Dry run: nothing was written.")
+        elif plan.inserts or plan.updates or plan.deletes:
+            if args.command == "departments":
+                apply_departments(db, plan)
+            elif args.command == "users":
+                apply_users(db, plan, workers=args.workers)
+            else:
+                apply_permissions(db, plan)
+            print(f"Applied in {time.perf_counter() - started:.2f}s.")
+    except ImportFileError as e:
+        print(f"Error: {e}")
+        return 2
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return 1 if plan.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+# metrics.py
+"""
+Runtime metrics in the Prometheus text exposition format, served at GET /metrics.
+
+    lls_http_requests_total{endpoint,method,status}          requests per blueprint endpoint
+    lls_http_request_duration_seconds{endpoint}              latency histogram
+    lls_http_requests_in_flight                              requests being handled
+    lls_db_statements_total{engine}                          SQL statements executed
+    lls_db_statement_duration_seconds{engine}                SQL statement latency histogram
+    lls_db_pool_size / _checked_out / _overflow{engine}      connection pool state (read at scrape time)
+    lls_export_jobs_in_progress / lls_export_jobs_total      Excel exports
+    lls_password_hash_queue                                  passwords waiting in the bcrypt hashing pool (user_import.py)
+    lls_response_cache_requests_total{endpoint,result}       response cache hits/misses (response_cache.py)
+    lls_response_cache_entries / _bytes                      size of this worker's response cache
+    lls_admission_rejected_total{route_class,reason}         requests shed with 503 (admission.py)
+    lls_admission_wait_seconds{route_class}                  time admitted requests queued for a slot
+    lls_admission_in_flight / _waiting / _limit{route_class} admission state per route class
+
+Recording is lock-free: every thread updates its own shard of each metric, and a
+scrape merges the shards (shards of finished threads are folded into a running total),
+so a busy request path never waits on another request or on the scraper.
+
+Settings (environment):
+    METRICS_ENABLED=0   don't record or serve metrics
+    METRICS_TOKEN       when set, /metrics requires 'Authorization: Bearer <token>'
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+REGISTRY = []
+
+
+# --- Metric Types ---
+
+class _Shards:
+    """Per-thread value dicts. A thread only ever writes its own dict, so updates take no lock."""
+
+    def __init__(self, merge):
+        self._merge = merge
+        self._local = threading.local()
+        self._lock = threading.Lock() # Taken once per thread (first update) and by scrapes
+        self._live = []
+        self._retired = {}
+
+    def mine(self) -> dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._live.append((threading.current_thread(), values))
+            return values
+
+    def collect(self) -> dict:
+        with self._lock:
+            live = []
+            for thread, values in self._live:
+                if thread.is_alive():
+                    live.append((thread, values))
+                else:
+                    self._merge(self._retired, values)
+            self._live = live
+            total = {}
+            self._merge(total, self._retired)
+            for _, values in live:
+                self._merge(total, values)
+        return total
+
+
+def _add_values(into: dict, values: dict):
+    for key, value in list(values.items()):
+        into[key] = into.get(key, 0) + value
+
+
+def _add_buckets(into: dict, values: dict):
+    for key, counts in list(values.items()):
+        current = into.get(key)
+        into[key] = list(counts) if current is None else [a + b for a, b in zip(current, counts)]
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def _label_names_for(self, sample_name):
+        return self.labelnames
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._shards = _Shards(_add_values)
+
+    def inc(self, *labels, amount: float = 1):
+        values = self._shards.mine()
+        values[labels] = values.get(labels, 0) + amount
+
+    def samples(self):
+        values = self._shards.collect()
+        if not values and not self.labelnames:
+            values = {(): 0} # Unlabeled metrics are exposed from the start
+        return [(self.name, labels, value) for labels, value in sorted(values.items())]
+
+
+class Gauge(Counter):
+    """
+    A gauge that goes up and down by deltas (in-flight requests, queue depths).
+    Each thread's net delta is kept in its shard, so inc()/dec() pairs may run on different threads.
+    """
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    @contextmanager
+    def track(self, *labels, amount: float = 1):
+        """Raises the gauge while the block (or decorated function) runs."""
+        self.inc(*labels, amount=amount)
+        try:
+            yield
+        finally:
+            self.dec(*labels, amount=amount)
+
+
+class CallbackGauge(_Metric):
+    """A gauge read at scrape time; `read` returns an iterable of (label values, value)."""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames, read):
+        super().__init__(name, help_text, labelnames)
+        self.read = read
+
+    def samples(self):
+        return [(self.name, tuple(labels), value) for labels, value in self.read()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=HTTP_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+        self._shards = _Shards(_add_buckets)
+
+    def observe(self, value: float, *labels):
+        values = self._shards.mine()
+        counts = values.get(labels)
+        if counts is None:
+            counts = values[labels] = [0] * (len(self.buckets) + 2) # buckets..., +Inf, sum
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[len(self.buckets)] += 1
+        counts[-1] += value
+
+    def samples(self):
+        result = []
+        for labels, counts in sorted(self._shards.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                result.append((f"{self.name}_bucket", labels + (_format_value(bound),), cumulative))
+            result.append((f"{self.name}_sum", labels, counts[-1]))
+            result.append((f"{self.name}_count", labels, cumulative))
+        return result
+
+    def _label_names_for(self, sample_name):
+        return self.labelnames + ("le",) if sample_name.endswith("_bucket") else self.labelnames
+
+
+# --- Exposition ---
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric._header())
+        for sample_name, labels, value in metric.samples():
+            names = metric._label_names_for(sample_name)
+            label_text = ",".join(f'{name}="{_escape(label)}"' for name, label in zip(names, labels))
+            lines.append(f"{sample_name}{{{label_text}}} {_format_value(value)}" if label_text
+                         else f"{sample_name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# --- Application Metrics ---
+
+HTTP_REQUESTS = Counter("lls_http_requests_total", "HTTP requests handled.", ("endpoint", "method", "status"))
+HTTP_LATENCY = Histogram("lls_http_request_duration_seconds", "HTTP request latency.", ("endpoint",), HTTP_BUCKETS)
+HTTP_IN_FLIGHT = Gauge("lls_http_requests_in_flight", "HTTP requests currently being handled.")
+
+DB_STATEMENTS = Counter("lls_db_statements_total", "SQL statements executed.", ("engine",))
+DB_LATENCY = Histogram("lls_db_statement_duration_seconds", "SQL statement latency.", ("engine",), SQL_BUCKETS)
+
+EXPORT_JOBS_IN_PROGRESS = Gauge("lls_export_jobs_in_progress", "Excel exports currently being generated.")
+EXPORT_JOBS = Counter("lls_export_jobs_total", "Excel exports generated.", ("type",))
+PASSWORD_HASH_QUEUE = Gauge("lls_password_hash_queue", "Passwords submitted to the bcrypt hashing pool and not yet hashed.")
+
+_engines = {}
+
+
+def _pool_reader(attribute):
+    def read():
+        for name, engine in _engines.items():
+            method = getattr(engine.pool, attribute, None)
+            if callable(method): # Pools without limits (e.g. SQLite's) lack these
+                yield (name,), method()
+    return read
+
+
+CallbackGauge("lls_db_pool_size", "Configured connection pool size.", ("engine",), _pool_reader("size"))
+CallbackGauge("lls_db_pool_checked_out", "Pooled connections currently in use.", ("engine",), _pool_reader("checkedout"))
+CallbackGauge("lls_db_pool_overflow", "Connections open beyond pool_size (negative while below it).", ("engine",), _pool_reader("overflow"))
+
+
+def instrument_engine(engine, name: str):
+    """Records statement counts/latency and pool state for `engine` under engine="<name>"."""
+    from sqlalchemy import event
+
+    if name in _engines:
+        return
+    _engines[name] = engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _record_statement(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        DB_STATEMENTS.inc(name)
+        if started is not None:
+            DB_LATENCY.observe(time.perf_counter() - started, name)
+
+
+def init_app(app):
+    """Records request metrics for `app` and serves them at GET /metrics."""
+    if not METRICS_ENABLED:
+        return
+
+    from flask import g, request, Response
+    import database
+
+    instrument_engine(database.engine, "primary")
+    if database.replica_engine is not None:
+        instrument_engine(database.replica_engine, "replica")
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+
+    @app.after_request
+    def record_request(response):
+        started = g.get("metrics_started")
+        if started is not None:
+            endpoint = request.endpoint or "unmatched" # 404s: don't label by raw path
+            HTTP_REQUESTS.inc(endpoint, request.method, str(response.status_code))
+            HTTP_LATENCY.observe(time.perf_counter() - started, endpoint)
+        return response
+
+    @app.teardown_request
+    def finish_request(exc=None):
+        if g.pop("metrics_started", None) is not None:
+            HTTP_IN_FLIGHT.dec()
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+            return Response("Unauthorized\n", status=401, mimetype="text/plain")
+        return Response(render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,54 @@
+# migrations/env.py
+from logging.config import fileConfig
+
+from alembic import context
+
+from database import engine, Base
+import models  # noqa: F401  (registers all tables on Base.metadata)
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline():
+    """Emits the migration SQL to stdout (alembic upgrade head --sql) instead of running it."""
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    # The engine carries the 'dbo' schema_translate_map, so the same migrations
+    # run against SQL Server and the SQLite stand-in. Callers that build their own
+    # database (e.g. bench/datagen.py) pass a connection in config.attributes.
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_migrations(connection)
+        return
+    with engine.connect() as connection:
+        _run_migrations(connection)
+
+
+def _run_migrations(connection):
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=connection.dialect.name == "sqlite",
+        compare_type=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
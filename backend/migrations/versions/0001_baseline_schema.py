@@ -0,0 +1,153 @@
+"""baseline schema
+
+The tables as they were created by Base.metadata.create_all before migrations existed.
+Existing databases already have them: mark them as migrated with
+    alembic stamp 0001
+and then run `alembic upgrade head`. Fresh databases (e.g. the SQLite stand-in)
+just run `alembic upgrade head`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from database import schema_for
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    schema = schema_for(op.get_bind().dialect.name)
+    op.create_table(
+        'departments',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(255), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+        schema=schema,
+    )
+    op.create_index('ix_dbo_departments_id', 'departments', ['id'], schema=schema)
+    op.create_index('ix_dbo_departments_name', 'departments', ['name'], unique=True, schema=schema)
+
+    op.create_table(
+        'admin_users',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('username', sa.String(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('department', sa.String()),
+        sa.Column('hashed_password', sa.String(), nullable=False),
+        sa.Column('role', sa.String()),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.UniqueConstraint('email'),
+        schema=schema,
+    )
+    op.create_index('ix_dbo_admin_users_id', 'admin_users', ['id'], schema=schema)
+    op.create_index('ix_dbo_admin_users_username', 'admin_users', ['username'], unique=True, schema=schema)
+
+    op.create_table(
+        'permissions',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('from_dept_id', sa.Integer(), sa.ForeignKey('dbo.departments.id'), nullable=False),
+        sa.Column('to_dept_id', sa.Integer(), sa.ForeignKey('dbo.departments.id'), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.UniqueConstraint('from_dept_id', 'to_dept_id', name='uq_from_to_dept'),
+        schema=schema,
+    )
+    op.create_index('ix_dbo_permissions_id', 'permissions', ['id'], schema=schema)
+
+    op.create_table(
+        'surveys',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('description', sa.Text()),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('rated_department_id', sa.Integer(), sa.ForeignKey('dbo.departments.id'), nullable=False),
+        sa.Column('managing_department_id', sa.Integer(), sa.ForeignKey('dbo.departments.id')),
+        schema=schema,
+    )
+    op.create_index('ix_dbo_surveys_id', 'surveys', ['id'], schema=schema)
+
+    op.create_table(
+        'questions',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('survey_id', sa.Integer(), sa.ForeignKey('dbo.surveys.id'), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('type', sa.Enum('rating', 'text', 'multiple_choice', name='question_type'), nullable=False),
+        sa.Column('order', sa.Integer(), nullable=False),
+        sa.Column('category', sa.String()),
+        sa.UniqueConstraint('survey_id', 'order', name='uq_survey_question_order'),
+        schema=schema,
+    )
+    op.create_index('ix_dbo_questions_id', 'questions', ['id'], schema=schema)
+
+    op.create_table(
+        'question_options',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('question_id', sa.Integer(), sa.ForeignKey('dbo.questions.id'), nullable=False),
+        sa.Column('text', sa.String(), nullable=False),
+        sa.Column('value', sa.String()),
+        sa.Column('order', sa.Integer(), nullable=False),
+        sa.UniqueConstraint('question_id', 'order', name='uq_question_option_order'),
+        schema=schema,
+    )
+    op.create_index('ix_dbo_question_options_id', 'question_options', ['id'], schema=schema)
+
+    op.create_table(
+        'survey_submissions',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('survey_id', sa.Integer(), sa.ForeignKey('dbo.surveys.id'), nullable=False),
+        sa.Column('submitter_user_id', sa.Integer(), sa.ForeignKey('dbo.admin_users.id'), nullable=False),
+        sa.Column('submitted_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('submitter_department_id', sa.Integer(), sa.ForeignKey('dbo.departments.id'), nullable=False),
+        sa.Column('rated_department_id', sa.Integer(), sa.ForeignKey('dbo.departments.id'), nullable=False),
+        sa.Column('overall_customer_rating', sa.Float()),
+        sa.Column('rating_description', sa.Text()),
+        sa.Column('suggestions', sa.Text()),
+        sa.UniqueConstraint('survey_id', 'submitter_user_id', name='uq_user_survey_submission'),
+        schema=schema,
+    )
+    op.create_index('ix_dbo_survey_submissions_id', 'survey_submissions', ['id'], schema=schema)
+
+    op.create_table(
+        'survey_answers',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('submission_id', sa.Integer(), sa.ForeignKey('dbo.survey_submissions.id'), nullable=False),
+        sa.Column('question_id', sa.Integer(), sa.ForeignKey('dbo.questions.id'), nullable=False),
+        sa.Column('rating_value', sa.Integer()),
+        sa.Column('text_response', sa.Text()),
+        sa.Column('selected_option_id', sa.Integer(), sa.ForeignKey('dbo.question_options.id')),
+        sa.UniqueConstraint('submission_id', 'question_id', name='uq_submission_question_answer'),
+        schema=schema,
+    )
+    op.create_index('ix_dbo_survey_answers_id', 'survey_answers', ['id'], schema=schema)
+
+    op.create_table(
+        'remark_responses',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('survey_submission_id', sa.Integer(), sa.ForeignKey('dbo.survey_submissions.id'), nullable=False),
+        sa.Column('question_id', sa.Integer(), sa.ForeignKey('dbo.questions.id'), nullable=False),
+        sa.Column('explanation', sa.Text(), nullable=False),
+        sa.Column('action_plan', sa.Text(), nullable=False),
+        sa.Column('responsible_person', sa.String(), nullable=False),
+        sa.Column('responded_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('responded_by_department_id', sa.Integer(), sa.ForeignKey('dbo.departments.id'), nullable=False),
+        sa.UniqueConstraint('survey_submission_id', 'question_id', name='uq_remark_response_per_question'),
+        schema=schema,
+    )
+    op.create_index('ix_dbo_remark_responses_id', 'remark_responses', ['id'], schema=schema)
+
+
+def downgrade():
+    schema = schema_for(op.get_bind().dialect.name)
+    for table in (
+        'remark_responses', 'survey_answers', 'survey_submissions', 'question_options',
+        'questions', 'surveys', 'permissions', 'admin_users', 'departments',
+    ):
+        op.drop_table(table, schema=schema)
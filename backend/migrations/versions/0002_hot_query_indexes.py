@@ -0,0 +1,60 @@
+"""indexes for hot query predicates
+
+survey_submissions: submitted_at (time-period filters, latest-5 dashboard query),
+(rated_department_id, submitted_at) INCLUDE overall_customer_rating (incoming remarks,
+department metrics), (submitter_department_id, submitted_at) (outgoing remarks) and
+submitter_user_id (a user's submissions).
+admin_users.department is narrowed to NVARCHAR(255) (the length of departments.name)
+so SQL Server can index it.
+
+survey_answers.submission_id, questions.survey_id, remark_responses.survey_submission_id
+and admin_users.email are already the leading columns of unique constraints, whose
+indexes serve those lookups, so no extra index is created for them.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from database import schema_for
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    schema = schema_for(op.get_bind().dialect.name)
+    if op.get_bind().dialect.name != 'sqlite':  # SQLite doesn't enforce VARCHAR lengths
+        op.alter_column('admin_users', 'department', existing_type=sa.String(), type_=sa.String(255),
+                        existing_nullable=True, schema=schema)
+    op.create_index('ix_dbo_admin_users_department', 'admin_users', ['department'], schema=schema)
+
+    op.create_index('ix_survey_submissions_submitted_at', 'survey_submissions', ['submitted_at'], schema=schema)
+    op.create_index(
+        'ix_survey_submissions_rated_dept_submitted_at', 'survey_submissions',
+        ['rated_department_id', 'submitted_at'], schema=schema,
+        mssql_include=['overall_customer_rating'],
+    )
+    op.create_index(
+        'ix_survey_submissions_submitter_dept_submitted_at', 'survey_submissions',
+        ['submitter_department_id', 'submitted_at'], schema=schema,
+    )
+    op.create_index('ix_survey_submissions_submitter_user_id', 'survey_submissions', ['submitter_user_id'], schema=schema)
+
+
+def downgrade():
+    schema = schema_for(op.get_bind().dialect.name)
+    op.drop_index('ix_survey_submissions_submitter_user_id', table_name='survey_submissions', schema=schema)
+    op.drop_index('ix_survey_submissions_submitter_dept_submitted_at', table_name='survey_submissions', schema=schema)
+    op.drop_index('ix_survey_submissions_rated_dept_submitted_at', table_name='survey_submissions', schema=schema)
+    op.drop_index('ix_survey_submissions_submitted_at', table_name='survey_submissions', schema=schema)
+
+    op.drop_index('ix_dbo_admin_users_department', table_name='admin_users', schema=schema)
+    if op.get_bind().dialect.name != 'sqlite':
+        op.alter_column('admin_users', 'department', existing_type=sa.String(255), type_=sa.String(),
+                        existing_nullable=True, schema=schema)
@@ -0,0 +1,49 @@
+"""admin_users.department_id foreign key
+
+Adds admin_users.department_id -> departments.id and backfills it from the
+department name stored in admin_users.department. The name column stays for
+API compatibility; users whose name matches no department keep a NULL id.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from database import schema_for
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    schema = schema_for(op.get_bind().dialect.name)
+    with op.batch_alter_table('admin_users', schema=schema) as batch_op:
+        batch_op.add_column(sa.Column('department_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            'fk_admin_users_department_id', 'departments', ['department_id'], ['id'],
+            referent_schema=schema,
+        )
+        batch_op.create_index('ix_dbo_admin_users_department_id', ['department_id'])
+
+    admin_users = sa.table('admin_users', sa.column('department'), sa.column('department_id'), schema=schema)
+    departments = sa.table('departments', sa.column('id'), sa.column('name'), schema=schema)
+    op.execute(
+        admin_users.update().values(
+            department_id=sa.select(departments.c.id)
+            .where(departments.c.name == admin_users.c.department)
+            .scalar_subquery()
+        )
+    )
+
+
+def downgrade():
+    schema = schema_for(op.get_bind().dialect.name)
+    with op.batch_alter_table('admin_users', schema=schema) as batch_op:
+        batch_op.drop_index('ix_dbo_admin_users_department_id')
+        batch_op.drop_constraint('fk_admin_users_department_id', type_='foreignkey')
+        batch_op.drop_column('department_id')
@@ -0,0 +1,35 @@
+"""permission survey window columns
+
+The permission routes read and write start_date, end_date and can_survey_self,
+which models.py never declared. Adds them to permissions.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from database import schema_for
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    schema = schema_for(op.get_bind().dialect.name)
+    with op.batch_alter_table('permissions', schema=schema) as batch_op:
+        batch_op.add_column(sa.Column('start_date', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('end_date', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('can_survey_self', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade():
+    schema = schema_for(op.get_bind().dialect.name)
+    with op.batch_alter_table('permissions', schema=schema) as batch_op:
+        batch_op.drop_column('can_survey_self')
+        batch_op.drop_column('end_date')
+        batch_op.drop_column('start_date')
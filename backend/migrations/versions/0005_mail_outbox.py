@@ -0,0 +1,48 @@
+"""mail outbox
+
+Outbox table for notification emails. Requests insert rows; the dispatcher in
+mailer.py delivers them in the background.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from database import schema_for
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    schema = schema_for(op.get_bind().dialect.name)
+    op.create_table(
+        'mail_outbox',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('kind', sa.String(50), nullable=False),
+        sa.Column('recipient_user_id', sa.Integer(), sa.ForeignKey('dbo.admin_users.id', ondelete='SET NULL')),
+        sa.Column('recipient_email', sa.String(255), nullable=False),
+        sa.Column('subject', sa.String(255), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text()),
+        sa.Column('next_attempt_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('claimed_by', sa.String(64)),
+        sa.Column('claimed_at', sa.DateTime()),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('sent_at', sa.DateTime()),
+        schema=schema,
+    )
+    op.create_index('ix_dbo_mail_outbox_id', 'mail_outbox', ['id'], schema=schema)
+    op.create_index('ix_mail_outbox_status_next_attempt_at', 'mail_outbox', ['status', 'next_attempt_at'], schema=schema)
+
+
+def downgrade():
+    schema = schema_for(op.get_bind().dialect.name)
+    op.drop_table('mail_outbox', schema=schema)
@@ -0,0 +1,36 @@
+"""index admin_users.name for the user directory search
+
+/api/users sorts and prefix-searches on username, name, email and department.
+username, email and department are already indexed; admin_users.name is narrowed
+to NVARCHAR(255) so SQL Server can index it, and indexed.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from database import schema_for
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    schema = schema_for(op.get_bind().dialect.name)
+    if op.get_bind().dialect.name != 'sqlite':  # SQLite doesn't enforce VARCHAR lengths
+        op.alter_column('admin_users', 'name', existing_type=sa.String(), type_=sa.String(255),
+                        existing_nullable=False, schema=schema)
+    op.create_index('ix_dbo_admin_users_name', 'admin_users', ['name'], schema=schema)
+
+
+def downgrade():
+    schema = schema_for(op.get_bind().dialect.name)
+    op.drop_index('ix_dbo_admin_users_name', table_name='admin_users', schema=schema)
+    if op.get_bind().dialect.name != 'sqlite':
+        op.alter_column('admin_users', 'name', existing_type=sa.String(255), type_=sa.String(),
+                        existing_nullable=False, schema=schema)
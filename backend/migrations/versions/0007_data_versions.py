@@ -0,0 +1,42 @@
+"""data versions
+
+One change counter per table, bumped by every commit that writes the table.
+Conditional GETs (http_cache.py) build their ETags from these rows instead of
+reading the tables themselves.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from database import schema_for
+
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+TRACKED_TABLES = (
+    'admin_users', 'departments', 'permissions', 'surveys', 'questions', 'question_options',
+    'survey_submissions', 'survey_answers', 'remark_responses',
+)
+
+
+def upgrade():
+    schema = schema_for(op.get_bind().dialect.name)
+    data_versions = op.create_table(
+        'data_versions',
+        sa.Column('name', sa.String(64), primary_key=True),
+        sa.Column('version', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        schema=schema,
+    )
+    op.bulk_insert(data_versions, [{'name': name, 'version': 1} for name in TRACKED_TABLES])
+
+
+def downgrade():
+    schema = schema_for(op.get_bind().dialect.name)
+    op.drop_table('data_versions', schema=schema)
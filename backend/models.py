@@ -1,7 +1,8 @@
 # F:\LLS Survey\backend\models.py
 from database import Base
-from sqlalchemy import Column, Integer, String, DateTime, func, ForeignKey, UniqueConstraint, Text, Enum, Float, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, func, ForeignKey, UniqueConstraint, Index, Text, Enum, Float, Boolean
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import expression
 
 # Existing User Model (Consolidated)
 class User(Base):
@@ -10,9 +11,10 @@ class User(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True, nullable=False)
-    name = Column(String, nullable=False)
-    email = Column(String, unique=True, nullable=False)
-    department = Column(String) # This is the department NAME, not an ID.
+    name = Column(String(255), nullable=False, index=True) # Indexed for the /api/users search and sort
+    email = Column(String, unique=True, nullable=False) # The unique constraint's index serves password reset lookups
+    department = Column(String(255), index=True) # Department NAME, kept in sync with department_id for API compatibility
+    department_id = Column(Integer, ForeignKey('dbo.departments.id'), nullable=True, index=True)
     hashed_password = Column(String, nullable=False)
     role = Column(String, default='user')  # Either 'admin', 'user', 'manager', 'rep', etc.
     created_at = Column(DateTime, server_default=func.now())
@@ -22,6 +24,9 @@ class User(Base):
     # This maps 'submitter' in SurveySubmission to a User
     survey_submissions_made = relationship("SurveySubmission", back_populates="submitter")
 
+    # The user's department row; joins and lookups go through department_id, not the name
+    department_ref = relationship("Department", foreign_keys=[department_id], back_populates="users")
+
     def __repr__(self):
         return f"<User(id={self.id}, username='{self.username}', name='{self.name}')>"
 
@@ -39,6 +44,9 @@ class Department(Base):
     # FIX: Explicitly tell SQLAlchemy which foreign key to use for this relationship
     surveys_managed = relationship("Survey", foreign_keys='Survey.managing_department_id', back_populates="managing_department")
     
+    # Users belonging to this department (User.department_id)
+    users = relationship("User", foreign_keys='User.department_id', back_populates="department_ref")
+
     # Relationship for permissions
     permissions_from = relationship("Permission", foreign_keys='Permission.from_dept_id', back_populates="from_department")
     permissions_to = relationship("Permission", foreign_keys='Permission.to_dept_id', back_populates="to_department")
@@ -60,11 +68,16 @@ class Permission(Base):
     to_dept_id = Column(Integer, ForeignKey('dbo.departments.id'), nullable=False)
     created_at = Column(DateTime, server_default=func.now())
 
+    # Survey window (naive UTC) and whether a department may survey itself
+    start_date = Column(DateTime, nullable=True)
+    end_date = Column(DateTime, nullable=True)
+    can_survey_self = Column(Boolean, nullable=False, default=False, server_default=expression.false())
+
     from_department = relationship("Department", foreign_keys=[from_dept_id], back_populates="permissions_from")
     to_department = relationship("Department", foreign_keys=[to_dept_id], back_populates="permissions_to")
 
     def __repr__(self):
-        return f"<Permission(id={self.id}, from_dept_id={self.from_dept_id}, to_dept_id={self.to_dept_id})>"
+        return f"<Permission(id={self.id}, from_dept_id={self.from_dept_id}, to_dept_id={self.to_dept_id}, start_date={self.start_date}, end_date={self.end_date})>"
 
 # --- Core Survey Models ---
 
@@ -117,6 +130,7 @@ class Question(Base):
     options = relationship("Option", back_populates="question", cascade="all, delete-orphan", order_by="Option.order")
     answers = relationship("Answer", back_populates="question")
 
+    # The (survey_id, order) index also serves question lookups per survey
     __table_args__ = (UniqueConstraint('survey_id', 'order', name='uq_survey_question_order'),
                       {'schema': 'dbo'})
 
@@ -181,7 +195,15 @@ class SurveySubmission(Base):
     remark_responses = relationship("RemarkResponse", back_populates="survey_submission", cascade="all, delete-orphan")
 
     # Prevent duplicate submissions by the same user for the same survey
+    # Indexes: time-period filters and the latest-submissions dashboard query (submitted_at),
+    # per-department remarks/metrics (rated/submitter department + submitted_at, with the rating
+    # included so department averages are answered from the index) and a user's own submissions.
     __table_args__ = (UniqueConstraint('survey_id', 'submitter_user_id', name='uq_user_survey_submission'),
+                      Index('ix_survey_submissions_submitted_at', 'submitted_at'),
+                      Index('ix_survey_submissions_rated_dept_submitted_at', 'rated_department_id', 'submitted_at',
+                            mssql_include=['overall_customer_rating']),
+                      Index('ix_survey_submissions_submitter_dept_submitted_at', 'submitter_department_id', 'submitted_at'),
+                      Index('ix_survey_submissions_submitter_user_id', 'submitter_user_id'),
                       {'schema': 'dbo'})
 
     def __repr__(self):
@@ -209,6 +231,7 @@ class Answer(Base):
     selected_option = relationship("Option", back_populates="answers_chosen")
 
     # Prevent duplicate answers for the same question within a submission
+    # (its index, led by submission_id, also serves answer lookups per submission)
     __table_args__ = (UniqueConstraint('submission_id', 'question_id', name='uq_submission_question_answer'),
                       {'schema': 'dbo'})
 
@@ -240,8 +263,61 @@ class RemarkResponse(Base):
     remarked_question = relationship("Question") # Link to the question this response is for
 
     # A single response per remark per submission
+    # (its index, led by survey_submission_id, also serves response lookups per submission)
     __table_args__ = (UniqueConstraint('survey_submission_id', 'question_id', name='uq_remark_response_per_question'),
                       {'schema': 'dbo'})
 
     def __repr__(self):
         return f"<RemarkResponse(id={self.id}, submission_id={self.survey_submission_id}, question_id={self.question_id})>"
+
+
+# --- Notification Models ---
+
+class MailOutbox(Base):
+    """
+    An email waiting to be (or already) sent by the outbox dispatcher in mailer.py.
+    Requests only insert rows here; delivery happens in the background.
+    """
+    __tablename__ = "mail_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False)  # e.g. 'permission_alert'
+    recipient_user_id = Column(Integer, ForeignKey('dbo.admin_users.id', ondelete='SET NULL'), nullable=True)
+    recipient_email = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+
+    status = Column(String(20), nullable=False, default='pending', server_default='pending')  # pending / sending / sent / failed
+    attempts = Column(Integer, nullable=False, default=0, server_default='0')
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, server_default=func.now())
+    claimed_by = Column(String(64), nullable=True)  # dispatcher that is currently sending the row
+    claimed_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    sent_at = Column(DateTime, nullable=True)
+
+    # The dispatcher polls for due pending rows
+    __table_args__ = (Index('ix_mail_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+                      {'schema': 'dbo'})
+
+    def __repr__(self):
+        return f"<MailOutbox(id={self.id}, kind='{self.kind}', recipient_email='{self.recipient_email}', status='{self.status}')>"
+
+
+# --- Change Tracking ---
+
+class DataVersion(Base):
+    """
+    A change counter per table, bumped in the same transaction as every commit that writes
+    the table (see data_versions.py). Conditional GETs derive their ETags from these rows.
+    """
+    __tablename__ = "data_versions"
+
+    name = Column(String(64), primary_key=True)  # table name
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+    updated_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = {'schema': 'dbo'}
+
+    def __repr__(self):
+        return f"<DataVersion(name='{self.name}', version={self.version})>"
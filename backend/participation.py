@@ -0,0 +1,231 @@
+# participation.py
+"""
+Participation engine: which users still owe which surveys.
+
+A user owes a survey when, at the given time,
+  - a Permission window from the user's department to the survey's rated department is open
+    (and a self-survey permission allows it),
+  - the survey is not about the user's own department (submission rejects those), and
+  - the user has no SurveySubmission for it.
+
+Everything is computed with one set-based query over admin_users, permissions, surveys
+and survey_submissions (an anti-join on the (survey_id, submitter_user_id) unique
+index), so it doesn't issue per-user queries for thousands of users.
+
+Reminders:
+    python participation.py remind      # queue reminder emails now (e.g. from cron)
+or set REMINDER_SCHEDULER_ENABLED=1 to run ReminderScheduler inside the web process.
+"""
+import os
+import threading
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func, case, or_, exists
+
+from database import SessionLocal
+from models import User, Permission, Survey, SurveySubmission, Department, MailOutbox
+import mailer
+
+logger = logging.getLogger(__name__)
+
+REMINDER_KIND = "survey_reminder"
+REMINDER_INTERVAL_HOURS = float(os.getenv("REMINDER_INTERVAL_HOURS", "24"))       # how often the scheduler runs
+REMINDER_MIN_GAP_HOURS = float(os.getenv("REMINDER_MIN_GAP_HOURS", "24"))         # don't remind a user more often than this
+
+
+def _assignments(at: datetime):
+    """(user, survey, window end) for every survey a user is expected to submit at `at`."""
+    return (
+        select(
+            User.id.label("user_id"),
+            User.username,
+            User.email,
+            User.department_id,
+            Survey.id.label("survey_id"),
+            Survey.title.label("survey_title"),
+            Survey.rated_department_id,
+            Permission.end_date.label("window_end"),
+        )
+        .select_from(User)
+        .join(Permission, Permission.from_dept_id == User.department_id)
+        .join(Survey, Survey.rated_department_id == Permission.to_dept_id)
+        .where(
+            User.is_active == True,
+            Permission.start_date <= at,
+            Permission.end_date >= at,
+            or_(Permission.from_dept_id != Permission.to_dept_id, Permission.can_survey_self == True),
+            Survey.rated_department_id != User.department_id,
+        )
+    )
+
+
+def _submitted(assignments):
+    return exists().where(
+        SurveySubmission.survey_id == assignments.c.survey_id,
+        SurveySubmission.submitter_user_id == assignments.c.user_id,
+    )
+
+
+def outstanding_assignments(db, at: datetime = None, department_id: int = None, user_ids=None):
+    """Rows of (user_id, username, email, department_id, survey_id, survey_title, rated_department_id, window_end) still owed."""
+    at = at or datetime.utcnow()
+    query = _assignments(at)
+    if department_id is not None:
+        query = query.where(User.department_id == department_id)
+    if user_ids is not None:
+        query = query.where(User.id.in_(list(user_ids)))
+    assignments = query.subquery()
+    return db.execute(
+        select(assignments)
+        .where(~_submitted(assignments))
+        .order_by(assignments.c.department_id, assignments.c.username, assignments.c.survey_id)
+    ).all()
+
+
+def users_with_outstanding(db, at: datetime = None, user_ids=None) -> set:
+    """IDs of users (optionally limited to user_ids) who still owe at least one survey."""
+    at = at or datetime.utcnow()
+    query = _assignments(at)
+    if user_ids is not None:
+        query = query.where(User.id.in_(list(user_ids)))
+    assignments = query.subquery()
+    return set(db.execute(select(assignments.c.user_id).where(~_submitted(assignments)).distinct()).scalars())
+
+
+def completion_by_department(db, at: datetime = None):
+    """Per department: assigned and completed (user, survey) pairs, completion rate and users still pending."""
+    at = at or datetime.utcnow()
+    assignments = _assignments(at).subquery()
+    done = case((_submitted(assignments), 1), else_=0)
+
+    per_user = (
+        select(
+            assignments.c.department_id,
+            assignments.c.user_id,
+            func.count().label("assigned"),
+            func.sum(done).label("completed"),
+        )
+        .group_by(assignments.c.department_id, assignments.c.user_id)
+        .subquery()
+    )
+    per_department = db.execute(
+        select(
+            per_user.c.department_id,
+            func.count().label("users"),
+            func.sum(per_user.c.assigned).label("assigned"),
+            func.sum(per_user.c.completed).label("completed"),
+            func.sum(case((per_user.c.completed < per_user.c.assigned, 1), else_=0)).label("pending_users"),
+        ).group_by(per_user.c.department_id)
+    ).all()
+    metrics_by_id = {row.department_id: row for row in per_department}
+
+    result = []
+    for dept_id, dept_name in db.execute(select(Department.id, Department.name).order_by(Department.name)):
+        row = metrics_by_id.get(dept_id)
+        assigned = int(row.assigned) if row else 0
+        completed = int(row.completed or 0) if row else 0
+        result.append({
+            "department_id": dept_id,
+            "department_name": dept_name,
+            "users_with_assignments": int(row.users) if row else 0,
+            "pending_users": int(row.pending_users or 0) if row else 0,
+            "assigned": assigned,
+            "completed": completed,
+            "completion_rate": round(100.0 * completed / assigned, 2) if assigned else None,
+        })
+    return result
+
+
+def queue_reminders(db, at: datetime = None, min_gap_hours: float = REMINDER_MIN_GAP_HOURS) -> int:
+    """
+    Queues one reminder email per user who still owes surveys, listing all of them.
+    Users reminded within the last min_gap_hours are skipped. Returns the number queued; the caller commits.
+    """
+    at = at or datetime.utcnow()
+    recently_reminded = set(db.execute(
+        select(MailOutbox.recipient_user_id).where(
+            MailOutbox.kind == REMINDER_KIND,
+            MailOutbox.created_at >= at - timedelta(hours=min_gap_hours),
+            MailOutbox.recipient_user_id.isnot(None),
+        ).distinct()
+    ).scalars())
+
+    owed_by_user = {}
+    for row in outstanding_assignments(db, at):
+        if row.user_id in recently_reminded:
+            continue
+        owed_by_user.setdefault(row.user_id, []).append(row)
+
+    messages = []
+    for user_id, rows in owed_by_user.items():
+        lines = "\n".join(
+            f"  - {row.survey_title} (open until {row.window_end.strftime('%Y-%m-%d')})" for row in rows
+        )
+        messages.append({
+            "recipient_user_id": user_id,
+            "recipient_email": rows[0].email,
+            "subject": f"LLS Survey: {len(rows)} survey(s) still waiting for your feedback",
+            "body": f"Hello {rows[0].username},\n\nThe following surveys are still open for you:\n{lines}\n",
+        })
+    return mailer.enqueue(db, REMINDER_KIND, messages)
+
+
+def run_reminders(session_factory=SessionLocal) -> int:
+    db = session_factory()
+    try:
+        queued = queue_reminders(db)
+        db.commit()
+        logger.info("Queued %d survey reminder emails.", queued)
+        return queued
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+class ReminderScheduler:
+    """Runs run_reminders() every REMINDER_INTERVAL_HOURS on a daemon thread."""
+
+    def __init__(self, interval_hours: float = REMINDER_INTERVAL_HOURS):
+        self.interval = interval_hours * 3600
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                run_reminders()
+            except Exception as e:
+                logger.exception("Reminder run failed: %s", e)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="reminder-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Survey participation tools.")
+    parser.add_argument("command", choices=["remind", "completion"])
+    args = parser.parse_args()
+
+    if args.command == "remind":
+        print(f"Queued {run_reminders()} reminder emails.")
+    else:
+        db = SessionLocal()
+        try:
+            for row in completion_by_department(db):
+                rate = f"{row['completion_rate']}%" if row['completion_rate'] is not None else "-"
+                print(f"{row['department_name']:<30} {row['completed']:>6}/{row['assigned']:<6} {rate:>8}  pending users: {row['pending_users']}")
+        finally:
+            db.close()
@@ -0,0 +1,136 @@
+# permission_index.py
+"""
+Process-wide, in-memory index of the permission matrix.
+
+    from_dept_id -> intervals of (start, end, to_dept_id, can_survey_self), sorted by start
+
+The index is built from two queries (permissions and departments) and answers
+"which departments can this department survey at time X" and "who can survey whom
+at time X" from memory. set_permissions and create_department call invalidate();
+the next lookup rebuilds it. Each worker process keeps its own copy, so a copy older
+than PERMISSION_INDEX_MAX_AGE seconds is rebuilt as well.
+
+Rebuilds always read the primary, even from @read_replica routes: a copy built from a
+lagging replica would be kept for PERMISSION_INDEX_MAX_AGE. A rebuild that was already
+running when invalidate() was called read the rows from before the write, so its
+snapshot is used for that one lookup but not kept.
+"""
+import os
+import threading
+import time
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime
+
+from database import SessionLocal, force_primary, release_read_target
+from models import Department, Permission
+
+PermissionInterval = namedtuple("PermissionInterval", "start end to_dept_id can_survey_self")
+
+# Immutable snapshot swapped in as a whole, so readers never need the lock
+_Snapshot = namedtuple("_Snapshot", "intervals_by_from_dept starts_by_from_dept department_names built_at")
+
+
+class PermissionIndex:
+    def __init__(self, session_factory=SessionLocal, max_age: float = 60.0):
+        self.session_factory = session_factory
+        self.max_age = max_age
+        self._snapshot = None
+        self._generation = 0 # Bumped by invalidate(); a rebuild only installs its snapshot if unchanged
+        self._rebuild_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+
+    def invalidate(self):
+        """Drops the current snapshot; the next lookup rebuilds it from the database."""
+        with self._state_lock:
+            self._generation += 1
+            self._snapshot = None
+
+    def rebuild(self):
+        generation = self._generation
+        token = force_primary() # Never cache a lagging replica's view of the matrix
+        db = self.session_factory()
+        try:
+            department_names = dict(db.query(Department.id, Department.name))
+            rows = db.query(
+                Permission.from_dept_id, Permission.to_dept_id, Permission.start_date,
+                Permission.end_date, Permission.can_survey_self
+            ).filter(Permission.start_date.isnot(None), Permission.end_date.isnot(None)).all()
+        finally:
+            db.close()
+            release_read_target(token)
+
+        intervals_by_from_dept = {}
+        for row in rows:
+            intervals_by_from_dept.setdefault(row.from_dept_id, []).append(
+                PermissionInterval(row.start_date, row.end_date, row.to_dept_id, bool(row.can_survey_self))
+            )
+        for intervals in intervals_by_from_dept.values():
+            intervals.sort(key=lambda interval: interval.start)
+
+        snapshot = _Snapshot(
+            intervals_by_from_dept={dept_id: tuple(intervals) for dept_id, intervals in intervals_by_from_dept.items()},
+            starts_by_from_dept={dept_id: [i.start for i in intervals] for dept_id, intervals in intervals_by_from_dept.items()},
+            department_names=department_names,
+            built_at=time.monotonic(),
+        )
+        with self._state_lock:
+            if self._generation == generation: # Not invalidated while the rows were read
+                self._snapshot = snapshot
+        return snapshot
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot.built_at < self.max_age:
+            return snapshot
+        with self._rebuild_lock:
+            # Another thread may have rebuilt it while this one waited for the lock
+            snapshot = self._snapshot
+            if snapshot is not None and time.monotonic() - snapshot.built_at < self.max_age:
+                return snapshot
+            return self.rebuild()
+
+    def active_intervals(self, from_dept_id: int, at: datetime = None):
+        """Intervals of from_dept_id that are open at `at` (default: now, UTC), excluding disallowed self-surveys."""
+        at = at or datetime.utcnow()
+        snapshot = self.snapshot()
+        intervals = snapshot.intervals_by_from_dept.get(from_dept_id, ())
+        # Only intervals that started at or before `at` can be open
+        candidates = intervals[:bisect_right(snapshot.starts_by_from_dept.get(from_dept_id, []), at)]
+        return [
+            interval for interval in candidates
+            if interval.end >= at and (interval.to_dept_id != from_dept_id or interval.can_survey_self)
+        ]
+
+    def active_targets(self, from_dept_id: int, at: datetime = None):
+        """Departments ({"id", "name"}, sorted by name) that from_dept_id can survey at `at`."""
+        department_names = self.snapshot().department_names
+        targets = {
+            interval.to_dept_id: department_names[interval.to_dept_id]
+            for interval in self.active_intervals(from_dept_id, at)
+            if interval.to_dept_id in department_names
+        }
+        return sorted(({"id": dept_id, "name": name} for dept_id, name in targets.items()), key=lambda d: d["name"])
+
+    def active_matrix(self, at: datetime = None):
+        """Every (from department, to department) pair that is open at `at`, for the admin view."""
+        at = at or datetime.utcnow()
+        snapshot = self.snapshot()
+        names = snapshot.department_names
+        matrix = []
+        for from_dept_id in snapshot.intervals_by_from_dept:
+            for interval in self.active_intervals(from_dept_id, at):
+                matrix.append({
+                    "from_department_id": from_dept_id,
+                    "from_department_name": names.get(from_dept_id),
+                    "to_department_id": interval.to_dept_id,
+                    "to_department_name": names.get(interval.to_dept_id),
+                    "can_survey_self": interval.can_survey_self,
+                    "start_date": interval.start.isoformat(),
+                    "end_date": interval.end.isoformat(),
+                })
+        matrix.sort(key=lambda p: (p["from_department_name"] or "", p["to_department_name"] or ""))
+        return matrix
+
+
+permission_index = PermissionIndex(max_age=float(os.getenv("PERMISSION_INDEX_MAX_AGE", "60")))
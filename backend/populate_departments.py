@@ -1,47 +1,32 @@
 # populate_departments.py
+# Seeds the initial departments. The schema comes from `alembic upgrade head`;
+# for other department lists use `python manage.py departments <file>`.
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine
-from models import Base, Department # Import Base and Department models
+from database import SessionLocal
+from manage import plan_departments, apply_departments
 
-# Ensure tables are created if they don't exist
-Base.metadata.create_all(bind=engine)
+# Define departments to add
+DEFAULT_DEPARTMENTS = [
+    "HR",
+    "IT",
+    "Sales",
+    "Marketing",
+    "Finance",
+    "Operations",
+    "Customer Service",
+    "Research & Development",
+    "Legal"
+]
 
 def populate_departments():
     db: Session = SessionLocal()
     try:
-        # Define departments to add
-        departments_to_add = [
-            "HR",
-            "IT",
-            "Sales",
-            "Marketing",
-            "Finance",
-            "Operations",
-            "Customer Service",
-            "Research & Development",
-            "Legal"
-        ]
-
-        # Check if departments already exist to avoid duplicates
-        existing_departments = db.query(Department.name).all()
-        existing_department_names = {d[0] for d in existing_departments}
-
-        new_departments_count = 0
-        for dept_name in departments_to_add:
-            if dept_name not in existing_department_names:
-                new_dept = Department(name=dept_name)
-                db.add(new_dept)
-                new_departments_count += 1
-                print(f"Adding department: {dept_name}")
-            else:
-                print(f"Department '{dept_name}' already exists. Skipping.")
-
-        if new_departments_count > 0:
-            db.commit()
-            print(f"Successfully added {new_departments_count} new departments.")
-        else:
-            print("No new departments to add. All defined departments already exist.")
-
+        # Departments that already exist (in any letter case) are skipped
+        rows = enumerate(({"name": name} for name in DEFAULT_DEPARTMENTS), start=1)
+        plan = plan_departments(db, rows)
+        db.rollback()
+        plan.print(verbose=True)
+        apply_departments(db, plan)
     except Exception as e:
         db.rollback()
         print(f"An error occurred during department population: {e}")
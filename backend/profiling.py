@@ -0,0 +1,222 @@
+# profiling.py
+"""
+On-demand profiling of single requests.
+
+A request carrying a valid profile token, either as the 'X-Profile-Token' header or
+the '?profile_token=' query flag, runs with a sampling profiler attached to its thread.
+The profiler records the thread's stack every PROFILE_INTERVAL_MS. When the request
+ends the samples are written to PROFILES_DIR in the collapsed-stack format
+("frame;frame;frame count" per line), which flamegraph.pl, speedscope and inferno read
+directly, with a .json sidecar describing the request. The response's X-Profile-Id
+header names the profile.
+
+Tokens are HMAC-signed expiry times, issued to admins by POST /api/admin/profiles/token
+and listed/downloaded at GET /api/admin/profiles[/<id>]:
+
+    curl -X POST .../api/admin/profiles/token            -> {"token": "1767225600.3f9a..."}
+    curl -H 'X-Profile-Token: 1767225600.3f9a...' '.../api/export-data?type=...'
+    curl .../api/admin/profiles/<X-Profile-Id>  > export.folded
+    flamegraph.pl export.folded > export.svg
+
+Settings (environment):
+    PROFILE_SECRET          signing key (default: derived from the JWT secret)
+    PROFILES_DIR            where profiles are written (default: <tmp>/lls_profiles)
+    PROFILE_INTERVAL_MS=5   sampling interval
+    PROFILE_MAX_CONCURRENT=2, PROFILE_MAX_FILES=200
+"""
+import os
+import re
+import sys
+import hmac
+import json
+import time
+import uuid
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+PROFILES_DIR = os.getenv("PROFILES_DIR", os.path.join(tempfile.gettempdir(), "lls_profiles"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "2"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+PROFILE_TOKEN_TTL = int(os.getenv("PROFILE_TOKEN_TTL", "900")) # seconds
+
+PROFILE_HEADER = "X-Profile-Token"
+PROFILE_QUERY_FLAG = "profile_token"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+_PROFILE_ID = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+# --- Sampling ---
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's Python stack every `interval` seconds from a background thread."""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+# --- Tokens ---
+
+class ProfileTokens:
+    def __init__(self, secret: str):
+        self.key = hashlib.sha256(("profile:" + secret).encode()).digest()
+
+    def _sign(self, expires: int) -> str:
+        return hmac.new(self.key, str(expires).encode(), hashlib.sha256).hexdigest()
+
+    def issue(self, ttl: int = PROFILE_TOKEN_TTL):
+        expires = int(time.time()) + ttl
+        return f"{expires}.{self._sign(expires)}", expires
+
+    def verify(self, token: str) -> bool:
+        expires, _, signature = (token or "").partition(".")
+        if not expires.isdigit() or int(expires) < time.time():
+            return False
+        return hmac.compare_digest(signature, self._sign(int(expires)))
+
+
+# --- Storage ---
+
+def list_profiles(limit: int = 100):
+    """Metadata of the stored profiles, newest first."""
+    if not os.path.isdir(PROFILES_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILES_DIR), reverse=True):
+        if name.endswith(".json"):
+            try:
+                with open(os.path.join(PROFILES_DIR, name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+            if len(profiles) >= limit:
+                break
+    return profiles
+
+
+def profile_path(profile_id: str):
+    """Path of a stored profile's collapsed stacks, or None for unknown/invalid IDs."""
+    if not _PROFILE_ID.match(profile_id or ""):
+        return None
+    path = os.path.join(PROFILES_DIR, f"{profile_id}.folded")
+    return path if os.path.isfile(path) else None
+
+
+def _prune():
+    names = sorted(name for name in os.listdir(PROFILES_DIR) if name.endswith(".json"))
+    for name in names[:max(0, len(names) - PROFILE_MAX_FILES)]:
+        for extension in (".json", ".folded"):
+            try:
+                os.remove(os.path.join(PROFILES_DIR, name[:-len(".json")] + extension))
+            except OSError:
+                pass
+
+
+def save_profile(sampler: StackSampler, metadata: dict) -> str:
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    profile_id = metadata["id"]
+    with open(os.path.join(PROFILES_DIR, f"{profile_id}.folded"), "w", encoding="utf-8") as f:
+        f.write(sampler.collapsed())
+    with open(os.path.join(PROFILES_DIR, f"{profile_id}.json"), "w", encoding="utf-8") as f:
+        json.dump(metadata, f)
+    _prune()
+    return profile_id
+
+
+# --- Flask Integration ---
+
+tokens = None # ProfileTokens, set by init_app()
+_slots = threading.BoundedSemaphore(PROFILE_MAX_CONCURRENT)
+
+
+def init_app(app):
+    """Profiles requests of `app` that carry a valid profile token."""
+    global tokens
+    from flask import g, request
+
+    tokens = ProfileTokens(os.getenv("PROFILE_SECRET") or app.config["JWT_SECRET_KEY"])
+
+    @app.before_request
+    def start_profiler():
+        token = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_QUERY_FLAG)
+        if not token:
+            return
+        if not tokens.verify(token):
+            logger.warning("Ignoring invalid or expired profile token for %s", request.path)
+            return
+        if not _slots.acquire(blocking=False):
+            logger.warning("Not profiling %s: %d profiles already running", request.path, PROFILE_MAX_CONCURRENT)
+            return
+        g.profile_id = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{request.endpoint or 'unmatched'}-{uuid.uuid4().hex[:8]}"
+        g.profile_started = time.perf_counter()
+        g.profiler = StackSampler(threading.get_ident()).start()
+
+    @app.after_request
+    def add_profile_id(response):
+        if g.get("profiler") is not None:
+            response.headers[PROFILE_ID_HEADER] = g.profile_id
+            g.profile_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def stop_profiler(exc=None):
+        sampler = g.pop("profiler", None)
+        if sampler is None:
+            return
+        try:
+            sampler.stop()
+            save_profile(sampler, {
+                "id": g.profile_id,
+                "at": datetime.utcnow().isoformat(),
+                "method": request.method,
+                "path": request.path,
+                "args": {key: value for key, value in request.args.items() if key != PROFILE_QUERY_FLAG},
+                "endpoint": request.endpoint,
+                "status": g.get("profile_status"),
+                "duration_ms": round((time.perf_counter() - g.profile_started) * 1000, 2),
+                "samples": sampler.samples,
+                "interval_ms": sampler.interval * 1000,
+            })
+        except Exception as e:
+            logger.warning("Could not save profile %s: %s", g.get("profile_id"), e)
+        finally:
+            _slots.release()
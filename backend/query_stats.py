@@ -0,0 +1,187 @@
+# query_stats.py
+"""
+Per-request SQL statement counting and N+1 detection.
+
+Every statement executed on the primary or replica engine is counted, timed and
+grouped by its shape (the SQL text with whitespace and IN-lists normalized) for the
+request that issued it. After the request the totals are checked against the route's
+query budget, and any shape repeated N_PLUS_ONE_THRESHOLD or more times is reported
+as a likely N+1 (a query issued inside a loop).
+
+Budgets are declared per route with the query_budget decorator:
+
+    @survey_bp.route('/remarks/incoming', methods=['GET'])
+    @jwt_required()
+    @query_budget(3)
+    def get_incoming_remarks(): ...
+
+Settings (environment):
+    QUERY_BUDGET_MODE      warn (default) logs violations, raise fails the request with
+                           QueryBudgetExceeded (for tests/CI), off disables the checks
+    QUERY_BUDGET_DEFAULT   budget for routes without query_budget (0 = unlimited)
+    N_PLUS_ONE_THRESHOLD   repeats of one statement shape reported as N+1 (default 5)
+    QUERY_STATS_HEADERS=1  adds X-Query-Count / X-Query-Time-Ms response headers
+
+Outside of requests (scripts, tests) use track_queries():
+
+    with track_queries() as stats:
+        ...
+    print(stats.count, stats.repeated())
+"""
+import os
+import re
+import time
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "warn").lower()
+QUERY_BUDGET_DEFAULT = int(os.getenv("QUERY_BUDGET_DEFAULT", "0"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+QUERY_STATS_HEADERS = os.getenv("QUERY_STATS_HEADERS", "0") == "1"
+
+QUERY_COUNT_HEADER = "X-Query-Count"
+QUERY_TIME_HEADER = "X-Query-Time-Ms"
+
+_WHITESPACE = re.compile(r"\s+")
+# Expanded IN-lists ("IN (?, ?, ?)") of any length share one shape
+_IN_LIST = re.compile(r"\bIN\s*\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)", re.IGNORECASE)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised after a request when QUERY_BUDGET_MODE=raise and the route broke its query budget."""
+
+
+def statement_shape(statement: str) -> str:
+    return _IN_LIST.sub("IN (...)", _WHITESPACE.sub(" ", statement).strip())
+
+
+class QueryStats:
+    """Statements executed in one request (or track_queries block)."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD):
+        """(shape, count) of the statement shapes executed at least `threshold` times, most frequent first."""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def violations(self, max_queries: int = None, max_repeats: int = N_PLUS_ONE_THRESHOLD):
+        problems = []
+        if max_queries and self.count > max_queries:
+            problems.append(f"{self.count} queries, budget {max_queries}")
+        for shape, count in self.repeated(max_repeats) if max_repeats else ():
+            problems.append(f"possible N+1, {count}x: {shape[:200]}")
+        return problems
+
+
+_current: ContextVar = ContextVar("query_stats", default=None)
+
+
+def current_stats():
+    """The QueryStats of the running request, or None outside of one."""
+    return _current.get()
+
+
+@contextmanager
+def track_queries():
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+# --- Engine Instrumentation ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        context._query_stats_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = getattr(context, "_query_stats_started", None)
+    if stats is not None and started is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+def instrument(engine):
+    """Counts the statements executed on `engine` towards the current request."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# --- Route Budgets ---
+
+def query_budget(max_queries: int = None, max_repeats: int = None):
+    """
+    Declares a route's query budget: at most `max_queries` statements per request, and
+    no statement shape repeated `max_repeats` (default N_PLUS_ONE_THRESHOLD) or more times.
+    max_repeats=0 turns the N+1 check off for routes that repeat statements by design (batches).
+    """
+    def decorator(func):
+        func.query_budget = (max_queries, max_repeats)
+        return func
+    return decorator
+
+
+def check_request(stats: QueryStats, view, endpoint: str):
+    """Logs or raises (per QUERY_BUDGET_MODE) when a request broke its route's budget."""
+    if QUERY_BUDGET_MODE == "off" or stats is None:
+        return
+    max_queries, max_repeats = getattr(view, "query_budget", (None, None))
+    problems = stats.violations(
+        max_queries if max_queries is not None else QUERY_BUDGET_DEFAULT,
+        max_repeats if max_repeats is not None else N_PLUS_ONE_THRESHOLD,
+    )
+    if not problems:
+        return
+    message = f"Query budget exceeded in {endpoint}: " + "; ".join(problems)
+    if QUERY_BUDGET_MODE == "raise":
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+def init_app(app):
+    """Instruments the database engines and checks every request of `app` against its query budget."""
+    from flask import g, request
+    import database
+
+    for engine in filter(None, (database.engine, database.replica_engine)):
+        instrument(engine)
+
+    @app.before_request
+    def start_query_stats():
+        g.query_stats_token = _current.set(QueryStats())
+
+    @app.after_request
+    def finish_query_stats(response):
+        stats = _current.get()
+        if stats is None:
+            return response
+        if QUERY_STATS_HEADERS:
+            response.headers[QUERY_COUNT_HEADER] = str(stats.count)
+            response.headers[QUERY_TIME_HEADER] = f"{stats.seconds * 1000:.1f}"
+        check_request(stats, app.view_functions.get(request.endpoint), request.endpoint)
+        return response
+
+    @app.teardown_request
+    def reset_query_stats(exc=None):
+        token = g.pop("query_stats_token", None)
+        if token is not None:
+            _current.reset(token)
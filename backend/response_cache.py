@@ -0,0 +1,367 @@
+# response_cache.py
+"""
+Cache for computed responses.
+
+@cached("surveys", "questions", ...) keeps the 200 responses of a route, keyed by
+  - the endpoint, path and query string,
+  - an optional vary() value (e.g. the caller's department, for per-user responses), and
+  - the change counters of the tables the response is built from (data_versions).
+A commit that writes one of the tables bumps its counter in the database, so from that
+moment every worker computes a different key and none can serve the old response. The
+counter lookup is shared with http_cache.conditional, so a cached route costs one
+primary-key query on a hit.
+
+Entries live in two levels:
+  - LocalCache, per worker: LRU bounded by RESPONSE_CACHE_MAX_ENTRIES and
+    RESPONSE_CACHE_MAX_BYTES, with a TTL per entry.
+  - optionally a shared backend, read and filled by all workers (RESPONSE_CACHE_URL):
+    "redis://..." (needs the redis package), or "memory://", an in-process stand-in
+    with the same behaviour for tests and single-process development.
+Every commit publishes the tables it changed (data_versions.on_commit). The committing
+worker drops the affected entries; with a shared backend the event also reaches the
+other workers, which drop theirs and run the callbacks registered with on_invalidate().
+Superseded entries are so freed at once rather than left for LRU/TTL eviction.
+
+Hits and misses per endpoint are counted in lls_response_cache_requests_total
+(GET /metrics) and summarized at GET /api/admin/response-cache.
+
+Settings (environment):
+    RESPONSE_CACHE_ENABLED=1
+    RESPONSE_CACHE_TTL=300            seconds, unless the route sets its own
+    RESPONSE_CACHE_MAX_ENTRIES=2000
+    RESPONSE_CACHE_MAX_BYTES=67108864
+    RESPONSE_CACHE_URL                shared backend (default: none, local only)
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+try:
+    import redis
+except ImportError: # Optional: only needed for a redis:// shared backend
+    redis = None
+
+from flask import current_app, make_response, request
+
+import data_versions
+from http_cache import current_versions
+from metrics import Counter, CallbackGauge
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "")
+
+CachedResponse = namedtuple("CachedResponse", "body mimetype")
+
+RESPONSE_CACHE_REQUESTS = Counter(
+    "lls_response_cache_requests_total", "Cacheable requests by result (hit_local, hit_shared, miss).",
+    ("endpoint", "result"),
+)
+
+
+# --- Local LRU ---
+
+_Entry = namedtuple("_Entry", "expires tags value size")
+
+
+class LocalCache:
+    """Thread-safe LRU of CachedResponses, bounded by entry count and body bytes, with per-entry TTL."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def set(self, key, value: CachedResponse, ttl: float, tags):
+        size = len(value.body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(time.monotonic() + ttl, frozenset(tags), value, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries))) # Least recently used first
+
+    def invalidate(self, tables):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry.tags & tables]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# --- Shared Backends ---
+
+class MemoryBackend:
+    """
+    In-process stand-in for the Redis backend: every instance in the process shares one
+    store and one event bus, like workers sharing a Redis server.
+    """
+    _store = {} # key -> (expires, tags, value)
+    _subscribers = []
+    _lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._store.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[2]
+
+    def set(self, key, value, ttl, tags):
+        with self._lock:
+            self._store[key] = (time.monotonic() + ttl, frozenset(tags), value)
+
+    def invalidate(self, tables):
+        with self._lock:
+            for key in [key for key, entry in self._store.items() if entry[1] & tables]:
+                del self._store[key]
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(set(tables))
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+
+
+class RedisBackend:
+    """
+    Entries as Redis strings with an expiry, plus one set of entry keys per table for
+    invalidation. Invalidations are published on CHANNEL to every subscribed worker.
+    """
+    CHANNEL = "lls:response-cache:invalidate"
+
+    def __init__(self, url: str, prefix: str = "lls:response-cache:"):
+        if redis is None:
+            raise RuntimeError("RESPONSE_CACHE_URL is a redis:// URL but the redis package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _tag_key(self, table):
+        return f"{self.prefix}tag:{table}"
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        mimetype, _, body = raw.partition(b"\n")
+        return CachedResponse(body, mimetype.decode())
+
+    def set(self, key, value, ttl, tags):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(self.prefix + key, value.mimetype.encode() + b"\n" + value.body, ex=max(1, int(ttl)))
+        for table in tags:
+            pipe.sadd(self._tag_key(table), self.prefix + key)
+            pipe.expire(self._tag_key(table), max(1, int(ttl)))
+        pipe.execute()
+
+    def invalidate(self, tables):
+        for table in tables:
+            keys = self.client.smembers(self._tag_key(table))
+            self.client.delete(self._tag_key(table), *keys)
+        self.client.publish(self.CHANNEL, ",".join(sorted(tables)))
+
+    def subscribe(self, callback):
+        def listen():
+            while True:
+                try:
+                    pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(self.CHANNEL)
+                    for message in pubsub.listen():
+                        callback(set(message["data"].decode().split(",")))
+                except Exception as e:
+                    logger.warning("Response cache subscription lost, reconnecting: %s", e)
+                    time.sleep(1)
+        threading.Thread(target=listen, name="response-cache-events", daemon=True).start()
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+def make_shared_backend(url: str):
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return MemoryBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported RESPONSE_CACHE_URL '{url}'. Expected redis://... or memory://")
+
+
+# --- Two-Level Cache ---
+
+class ResponseCache:
+    def __init__(self, local: LocalCache, shared=None):
+        self.local = local
+        self.shared = shared
+        self._listeners = []
+        self._subscribed_pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_subscribed(self):
+        # Per process: a worker forked after import needs its own subscriber thread
+        if self.shared is None or self._subscribed_pid == os.getpid():
+            return
+        with self._lock:
+            if self._subscribed_pid != os.getpid():
+                self.shared.subscribe(self._handle_invalidation)
+                self._subscribed_pid = os.getpid()
+
+    def _handle_invalidation(self, tables):
+        self.local.invalidate(tables)
+        for callback in self._listeners:
+            try:
+                callback(tables)
+            except Exception as e:
+                logger.warning("Invalidation listener %s failed: %s", getattr(callback, "__qualname__", callback), e)
+
+    def get(self, key, ttl: float, tags):
+        """(value, "hit_local" | "hit_shared") or (None, "miss")."""
+        self._ensure_subscribed()
+        value = self.local.get(key)
+        if value is not None:
+            return value, "hit_local"
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception as e: # A shared backend outage degrades to local caching
+                logger.warning("Response cache backend get failed: %s", e)
+            if value is not None:
+                self.local.set(key, value, ttl, tags)
+                return value, "hit_shared"
+        return None, "miss"
+
+    def set(self, key, value: CachedResponse, ttl: float, tags):
+        self.local.set(key, value, ttl, tags)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value, ttl, tags)
+            except Exception as e:
+                logger.warning("Response cache backend set failed: %s", e)
+
+    def invalidate(self, tables):
+        """Drops the entries built from `tables` here and, through the shared backend, in every worker."""
+        tables = set(tables)
+        if self.shared is None:
+            self._handle_invalidation(tables)
+            return
+        self._ensure_subscribed()
+        self.local.invalidate(tables) # Right away, without waiting for our own event
+        try:
+            self.shared.invalidate(tables)
+        except Exception as e:
+            logger.warning("Response cache backend invalidation failed: %s", e)
+            self._handle_invalidation(tables)
+
+    def on_invalidate(self, callback):
+        """Calls callback(tables) whenever this worker learns that tables changed (its own commits or other workers')."""
+        self._listeners.append(callback)
+        return callback
+
+    def clear(self):
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self) -> dict:
+        results = {}
+        for _, (endpoint, result), count in RESPONSE_CACHE_REQUESTS.samples():
+            results.setdefault(endpoint, {"hit_local": 0, "hit_shared": 0, "miss": 0})[result] = count
+        return {
+            "enabled": RESPONSE_CACHE_ENABLED,
+            "backend": type(self.shared).__name__ if self.shared is not None else None,
+            "entries": len(self.local),
+            "bytes": self.local.bytes,
+            "max_entries": self.local.max_entries,
+            "max_bytes": self.local.max_bytes,
+            "endpoints": results,
+        }
+
+
+response_cache = ResponseCache(LocalCache(), make_shared_backend(RESPONSE_CACHE_URL))
+data_versions.on_commit(response_cache.invalidate)
+
+CallbackGauge("lls_response_cache_entries", "Responses in this worker's local cache.", (),
+              lambda: [((), len(response_cache.local))])
+CallbackGauge("lls_response_cache_bytes", "Body bytes in this worker's local cache.", (),
+              lambda: [((), response_cache.local.bytes)])
+
+
+# --- Route Decorator ---
+
+def cache_key(endpoint: str, url: str, vary, versions: dict) -> str:
+    stamp = ",".join(f"{table}:{version}" for table, (version, _) in sorted(versions.items()))
+    return hashlib.sha1(f"{endpoint}|{url}|{vary}|{stamp}".encode()).hexdigest()
+
+
+def cached(*tables, ttl: float = None, vary=None):
+    """
+    Caches the route's 200 responses, which are built from `tables`, for `ttl` seconds
+    (default RESPONSE_CACHE_TTL). `vary` is a callable returning what else the response
+    depends on, e.g. the caller's department.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not RESPONSE_CACHE_ENABLED or request.method != "GET":
+                return func(*args, **kwargs)
+            try:
+                versions = current_versions(tables)
+            except Exception as e: # Serve uncached rather than fail the request
+                logger.warning("Could not read data versions for %s: %s", request.endpoint, e)
+                return func(*args, **kwargs)
+            if len(versions) != len(set(tables)): # A table without a counter row would never change the key
+                return func(*args, **kwargs)
+
+            key = cache_key(request.endpoint, request.full_path, vary() if vary else None, versions)
+            lifetime = ttl or RESPONSE_CACHE_TTL
+            value, result = response_cache.get(key, lifetime, tables)
+            RESPONSE_CACHE_REQUESTS.inc(request.endpoint, result)
+            if value is not None:
+                return current_app.response_class(value.body, mimetype=value.mimetype)
+
+            response = make_response(func(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough:
+                response_cache.set(key, CachedResponse(response.get_data(), response.mimetype), lifetime, tables)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,121 @@
+# routes/admin_routes.py
+from functools import wraps
+from flask import Blueprint, request, jsonify, send_file
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from database import SessionLocal
+from models import User
+from security import get_frontend_role
+from slow_queries import slow_query_log, SORT_KEYS
+import profiling
+from response_cache import response_cache
+from admission import admission
+
+admin_bp = Blueprint('admin_bp', __name__, url_prefix='/api/admin')
+
+# Decorator for admin-only diagnostics. The role is read from the database on every call, not
+# from the token, so a demoted or deleted admin loses access at once rather than when the token expires.
+def admin_required(func):
+    @wraps(func)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        db = SessionLocal()
+        try:
+            user = db.query(User.role).filter(User.username == get_jwt_identity()).first()
+        finally:
+            db.close()
+        if user is None or get_frontend_role(user.role) != 'admin':
+            return jsonify({"detail": "Admin access required."}), 403
+        return func(*args, **kwargs)
+    return wrapper
+
+# Helper function to read a bounded positive ?<name>= integer
+def get_limit(name: str, default: int, maximum: int) -> int:
+    try:
+        return max(1, min(int(request.args.get(name, default)), maximum))
+    except ValueError:
+        return default
+
+
+# --- Slow Queries ---
+
+# GET the slowest statement shapes (?sort=total_ms|max_ms|avg_ms|count, ?limit=)
+@admin_bp.route('/slow-queries', methods=['GET'])
+@admin_required
+def get_slow_queries():
+    sort = request.args.get('sort', 'total_ms')
+    if sort not in SORT_KEYS:
+        return jsonify({"detail": f"Invalid sort '{sort}'. Expected one of: {', '.join(SORT_KEYS)}."}), 400
+    return jsonify({
+        "threshold_ms": slow_query_log.threshold_ms,
+        "recorded": len(slow_query_log.entries),
+        "queries": slow_query_log.top(get_limit('limit', 20, 200), sort),
+    }), 200
+
+# GET the most recent slow statements, newest first (?limit=)
+@admin_bp.route('/slow-queries/recent', methods=['GET'])
+@admin_required
+def get_recent_slow_queries():
+    return jsonify(slow_query_log.recent(get_limit('limit', 50, 500))), 200
+
+# DELETE the recorded slow statements (e.g. after deploying a fix)
+@admin_bp.route('/slow-queries', methods=['DELETE'])
+@admin_required
+def clear_slow_queries():
+    slow_query_log.clear()
+    return jsonify({"message": "Slow query log cleared."}), 200
+
+
+# --- Request Profiles ---
+
+# POST to issue a profile token (?ttl= seconds, default PROFILE_TOKEN_TTL). Any request sent with it
+# in the 'X-Profile-Token' header or '?profile_token=' flag is profiled (see profiling.py).
+@admin_bp.route('/profiles/token', methods=['POST'])
+@admin_required
+def issue_profile_token():
+    token, expires = profiling.tokens.issue(get_limit('ttl', profiling.PROFILE_TOKEN_TTL, 86400))
+    return jsonify({
+        "token": token,
+        "expires_at": expires,
+        "header": profiling.PROFILE_HEADER,
+        "query_flag": profiling.PROFILE_QUERY_FLAG,
+    }), 200
+
+# GET the stored profiles, newest first (?limit=)
+@admin_bp.route('/profiles', methods=['GET'])
+@admin_required
+def get_profiles():
+    return jsonify(profiling.list_profiles(get_limit('limit', 100, 1000))), 200
+
+# GET one profile as collapsed stacks (input for flamegraph.pl / speedscope)
+@admin_bp.route('/profiles/<profile_id>', methods=['GET'])
+@admin_required
+def download_profile(profile_id):
+    path = profiling.profile_path(profile_id)
+    if path is None:
+        return jsonify({"detail": "Profile not found."}), 404
+    return send_file(path, mimetype='text/plain', as_attachment=True, download_name=f"{profile_id}.folded")
+
+
+# --- Response Cache ---
+
+# GET response cache size and hits/misses per endpoint (see response_cache.py)
+@admin_bp.route('/response-cache', methods=['GET'])
+@admin_required
+def get_response_cache_stats():
+    return jsonify(response_cache.stats()), 200
+
+# DELETE every cached response (in this worker and the shared backend)
+@admin_bp.route('/response-cache', methods=['DELETE'])
+@admin_required
+def clear_response_cache():
+    response_cache.clear()
+    return jsonify({"message": "Response cache cleared."}), 200
+
+
+# --- Admission Control ---
+
+# GET this worker's admission limits, slots in use and queued requests per route class (see admission.py)
+@admin_bp.route('/admission', methods=['GET'])
+@admin_required
+def get_admission_stats():
+    return jsonify(admission.stats()), 200
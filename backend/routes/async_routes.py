@@ -0,0 +1,447 @@
+# routes/async_routes.py
+"""
+Async (ASGI) versions of the read-heavy routes, served by asgi.py.
+
+Each handler runs the same queries as its Flask counterpart in routes/survey_routes.py and
+routes/permission_routes.py on an AsyncSession (async_database.py) and returns the same
+JSON, serialized by json_provider.dumps_bytes. Authentication reads the same JWT cookie
+(security.decode_access_token), and auth failures get flask_jwt_extended's statuses and
+{"msg": ...} bodies. Conditional GETs use the Flask endpoint names, so a client's ETags
+are valid against either app. bench/parity.py checks the two apps against each other.
+
+GET /api/events is a Server-Sent Events stream with no Flask counterpart. It sends a
+"changed" event naming the tables whose data versions moved (data_versions.py), so open
+pages can refetch instead of polling. One VersionWatcher per process polls the counters
+for all of its streams.
+"""
+import os
+import asyncio
+import logging
+from functools import wraps
+
+import jwt
+from anyio import to_thread
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from sqlalchemy import desc, func, select
+from sqlalchemy.orm import joinedload
+from werkzeug.http import http_date, parse_date, parse_etags
+
+import data_versions
+import http_cache
+from async_database import read_session
+from json_provider import dumps_bytes
+from models import Answer, Department, Question, RemarkResponse, Survey, SurveySubmission, User
+from permission_index import permission_index
+from security import JWT_ACCESS_COOKIE_NAME, decode_access_token
+
+router = APIRouter(prefix="/api")
+
+logger = logging.getLogger(__name__)
+
+SSE_POLL_SECONDS = float(os.getenv("SSE_POLL_SECONDS", "2"))
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON bodies byte-for-byte like the Flask app's (json_provider.dumps_bytes and a trailing newline)."""
+
+    def render(self, content) -> bytes:
+        return dumps_bytes(content) + b"\n"
+
+
+# --- Authentication ---
+
+class AuthError(Exception):
+    """An invalid or missing access token; asgi.py answers it like flask_jwt_extended ({"msg": ...})."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+async def jwt_claims(request: Request) -> dict:
+    """Dependency: the claims of the request's access token cookie (jwt_required())."""
+    token = request.cookies.get(JWT_ACCESS_COOKIE_NAME)
+    if not token:
+        raise AuthError(401, f'Missing cookie "{JWT_ACCESS_COOKIE_NAME}"')
+    try:
+        return decode_access_token(token)
+    except jwt.ExpiredSignatureError:
+        raise AuthError(401, "Token has expired")
+    except jwt.InvalidTokenError as e:
+        raise AuthError(422, str(e))
+
+
+async def current_user(db, claims: dict):
+    return (await db.execute(select(User).where(User.username == claims["sub"]))).scalars().first()
+
+
+# --- Conditional GETs (see http_cache.py) ---
+
+def conditional(endpoint: str, *tables, cache_control: str = None):
+    """http_cache.conditional for async handlers; `endpoint` is the Flask route's endpoint name."""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs["request"]
+            if not http_cache.HTTP_CACHE_ENABLED:
+                return await func(*args, **kwargs)
+            try:
+                async with read_session() as db:
+                    versions = await data_versions.read_async(db, tables)
+            except Exception as e: # Serve uncached rather than fail the request
+                logger.warning("Could not read data versions for %s: %s", endpoint, e)
+                return await func(*args, **kwargs)
+            if len(versions) != len(set(tables)):
+                return await func(*args, **kwargs)
+
+            full_path = f"{request.url.path}?{request.url.query}" # Flask's request.full_path
+            etag = http_cache.make_etag(endpoint, full_path, versions)
+            modified_at = http_cache.last_modified(versions)
+            if_none_match = parse_etags(request.headers.get("If-None-Match"))
+            if_modified_since = parse_date(request.headers.get("If-Modified-Since"))
+
+            if http_cache.is_not_modified(if_none_match, if_modified_since, etag, modified_at):
+                response = Response(status_code=304)
+            else:
+                response = await func(*args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response.headers["ETag"] = f'W/"{etag}"'
+            if modified_at is not None and response.status_code == 200: # werkzeug drops it from 304s too
+                response.headers["Last-Modified"] = http_date(modified_at)
+            response.headers["Cache-Control"] = http_cache.cache_control_for(endpoint, cache_control)
+            return response
+        return wrapper
+    return decorator
+
+
+# --- Surveys ---
+
+@router.get("/surveys")
+@conditional("survey.get_surveys", "surveys", "departments")
+async def get_surveys(request: Request, claims: dict = Depends(jwt_claims)):
+    async with read_session() as db:
+        surveys = (await db.execute(
+            select(Survey).options(joinedload(Survey.rated_department), joinedload(Survey.managing_department))
+        )).scalars().all()
+        return FastJSONResponse([
+            {
+                "id": s.id,
+                "title": s.title,
+                "description": s.description,
+                "created_at": s.created_at,
+                "rated_department_id": s.rated_department_id,
+                "rated_dept_name": s.rated_department.name if s.rated_department else None,
+                "managing_department_id": s.managing_department_id,
+                "managing_dept_name": s.managing_department.name if s.managing_department else None,
+            }
+            for s in surveys
+        ])
+
+
+@router.get("/surveys/{survey_id}")
+@conditional("survey.get_survey_by_id", "surveys", "questions", "question_options", "departments")
+async def get_survey_by_id(survey_id: int, request: Request, claims: dict = Depends(jwt_claims)):
+    async with read_session() as db:
+        survey = (await db.execute(
+            select(Survey).options(
+                joinedload(Survey.questions).joinedload(Question.options),
+                joinedload(Survey.managing_department),
+                joinedload(Survey.rated_department),
+            ).where(Survey.id == survey_id)
+        )).unique().scalars().first()
+        if not survey:
+            return FastJSONResponse({"detail": "Survey not found"}, status_code=404)
+
+        questions_data = [
+            {
+                "id": question.id,
+                "text": question.text,
+                "type": question.type,
+                "order": question.order,
+                "category": question.category,
+                "options": [
+                    {"id": opt.id, "text": opt.text, "value": opt.value}
+                    for opt in question.options
+                ] if question.type == "multiple_choice" else []
+            }
+            for question in survey.questions
+        ]
+        return FastJSONResponse({
+            "id": survey.id,
+            "title": survey.title,
+            "description": survey.description,
+            "created_at": survey.created_at,
+            "managing_department_id": survey.managing_department_id,
+            "rated_department_id": survey.rated_department_id,
+            "managing_dept_name": survey.managing_department.name if survey.managing_department else None,
+            "rated_dept_name": survey.rated_department.name if survey.rated_department else None,
+            "questions": sorted(questions_data, key=lambda q: q['order']),
+        })
+
+
+# --- Remarks ---
+
+@router.get("/remarks/incoming")
+async def get_incoming_remarks(claims: dict = Depends(jwt_claims)):
+    try:
+        async with read_session() as db:
+            user = await current_user(db, claims)
+            if not user or not user.department:
+                return FastJSONResponse({"detail": "User or department not found"}, status_code=404)
+            if user.department_id is None:
+                return FastJSONResponse({"detail": "User's department not registered in database"}, status_code=404)
+            my_department_id = user.department_id
+
+            submissions = (await db.execute(
+                select(SurveySubmission).options(
+                    joinedload(SurveySubmission.answers).joinedload(Answer.question),
+                    joinedload(SurveySubmission.submitter_department),
+                    joinedload(SurveySubmission.rated_department),
+                ).where(SurveySubmission.rated_department_id == my_department_id)
+            )).unique().scalars().all()
+
+            responded = set((await db.execute(
+                select(RemarkResponse.survey_submission_id, RemarkResponse.question_id)
+                .join(SurveySubmission, SurveySubmission.id == RemarkResponse.survey_submission_id)
+                .where(SurveySubmission.rated_department_id == my_department_id)
+            )).tuples())
+
+            incoming_remarks = [
+                {
+                    "id": submission.id,
+                    "questionDataId": answer.question_id,
+                    "fromDepartment": submission.submitter_department.name if submission.submitter_department else 'Unknown',
+                    "ratedDepartmentId": submission.rated_department_id,
+                    "remark": answer.text_response,
+                    "ratingGiven": answer.rating_value,
+                    "surveyDate": submission.submitted_at,
+                    "category": answer.question.category if answer.question else None,
+                }
+                for submission in submissions
+                for answer in submission.answers
+                if answer.text_response and (submission.id, answer.question_id) not in responded
+            ]
+    except Exception as e:
+        logger.exception("Error fetching incoming remarks: %s", e)
+        return FastJSONResponse({"detail": f"Error fetching incoming remarks: {str(e)}"}, status_code=500)
+    return FastJSONResponse(incoming_remarks)
+
+
+@router.get("/remarks/outgoing")
+async def get_outgoing_remarks(claims: dict = Depends(jwt_claims)):
+    try:
+        async with read_session() as db:
+            user = await current_user(db, claims)
+            if not user or not user.department:
+                return FastJSONResponse({"detail": "User or department not found"}, status_code=404)
+            if user.department_id is None:
+                return FastJSONResponse({"detail": "User's department not registered in database"}, status_code=404)
+
+            submissions = (await db.execute(
+                select(SurveySubmission).options(
+                    joinedload(SurveySubmission.answers).joinedload(Answer.question),
+                    joinedload(SurveySubmission.rated_department),
+                    joinedload(SurveySubmission.remark_responses),
+                ).where(SurveySubmission.submitter_department_id == user.department_id)
+            )).unique().scalars().all()
+
+            outgoing_remarks = []
+            for submission in submissions:
+                rated_department_name = submission.rated_department.name if submission.rated_department else 'Unknown Department'
+                for answer in submission.answers:
+                    if not answer.text_response:
+                        continue
+                    found_response = next(
+                        (r for r in submission.remark_responses if r.question_id == answer.question_id),
+                        None
+                    )
+                    outgoing_remarks.append({
+                        "id": submission.id,
+                        "questionDataId": answer.question_id,
+                        "department": rated_department_name,
+                        "rating": answer.rating_value,
+                        "yourRemark": answer.text_response,
+                        "theirResponse": {
+                            "explanation": found_response.explanation if found_response else "",
+                            "actionPlan": found_response.action_plan if found_response else "",
+                            "responsiblePerson": found_response.responsible_person if found_response else "",
+                            "responseDate": (found_response.responded_at if found_response else None) or "",
+                        },
+                        "surveyDate": submission.submitted_at,
+                        "category": answer.question.category if answer.question else None,
+                    })
+    except Exception as e:
+        logger.exception("Error fetching outgoing remarks: %s", e)
+        return FastJSONResponse({"detail": f"Error fetching outgoing remarks: {str(e)}"}, status_code=500)
+    return FastJSONResponse(outgoing_remarks)
+
+
+# --- Dashboard Metrics ---
+
+@router.get("/dashboard/overall-stats")
+@conditional("survey.get_overall_dashboard_stats", "survey_submissions", "surveys", "admin_users", "departments")
+async def get_overall_dashboard_stats(request: Request, claims: dict = Depends(jwt_claims)):
+    try:
+        async with read_session() as db:
+            total_surveys_submitted = (await db.execute(select(func.count(SurveySubmission.id)))).scalar()
+            avg_overall_rating = (await db.execute(select(func.avg(SurveySubmission.overall_customer_rating)))).scalar()
+            average_overall_rating = round(float(avg_overall_rating), 2) if avg_overall_rating else 0.0
+
+            latest_submissions = (await db.execute(
+                select(SurveySubmission).options(
+                    joinedload(SurveySubmission.survey),
+                    joinedload(SurveySubmission.submitter),
+                    joinedload(SurveySubmission.rated_department),
+                ).order_by(desc(SurveySubmission.submitted_at)).limit(5)
+            )).scalars().all()
+
+            return FastJSONResponse({
+                "totalSurveysSubmitted": total_surveys_submitted,
+                "averageOverallRating": average_overall_rating,
+                "latestSubmissions": [
+                    {
+                        "responseId": submission.id,
+                        "surveyTitle": submission.survey.title if submission.survey else 'N/A',
+                        "ratedDepartmentName": submission.rated_department.name if submission.rated_department else "N/A",
+                        "overallRating": float(submission.overall_customer_rating) if submission.overall_customer_rating is not None else 0.0,
+                        "submittedBy": submission.submitter.username if submission.submitter else "N/A",
+                        "submittedAt": submission.submitted_at or "N/A",
+                    }
+                    for submission in latest_submissions
+                ],
+            })
+    except Exception as e:
+        logger.exception("Error fetching overall dashboard stats: %s", e)
+        return FastJSONResponse({"detail": f"Internal server error: {str(e)}"}, status_code=500)
+
+
+@router.get("/dashboard/department-metrics")
+@conditional("survey.get_department_dashboard_metrics", "survey_submissions", "departments")
+async def get_department_dashboard_metrics(request: Request, claims: dict = Depends(jwt_claims)):
+    try:
+        async with read_session() as db:
+            all_departments = (await db.execute(select(Department).order_by(Department.name))).scalars().all()
+            rated_dept_metrics = (await db.execute(
+                select(
+                    SurveySubmission.rated_department_id,
+                    func.avg(SurveySubmission.overall_customer_rating).label('average_rating'),
+                    func.count(SurveySubmission.id).label('total_surveys'),
+                ).group_by(SurveySubmission.rated_department_id)
+            )).all()
+
+        metrics_by_id = {metric.rated_department_id: metric for metric in rated_dept_metrics}
+        final_department_metrics = []
+        for dept in all_departments:
+            metric = metrics_by_id.get(dept.id)
+            final_department_metrics.append({
+                "department_id": dept.id,
+                "department_name": dept.name,
+                "average_rating": round(float(metric.average_rating), 2) if metric else 0.0,
+                "total_surveys": metric.total_surveys if metric else 0,
+            })
+        final_department_metrics.sort(key=lambda x: x['department_name'])
+        return FastJSONResponse(final_department_metrics)
+    except Exception as e:
+        logger.exception("Error fetching department dashboard metrics: %s", e)
+        return FastJSONResponse({"detail": f"Internal server error: {str(e)}"}, status_code=500)
+
+
+# --- Surveyable Departments ---
+
+@router.get("/surveyable-departments")
+async def get_surveyable_departments(claims: dict = Depends(jwt_claims)):
+    try:
+        # The current department, not the login-time claim (see routes/permission_routes.py)
+        async with read_session() as db:
+            user = (await db.execute(select(User.department, User.department_id)
+                                     .where(User.username == claims["sub"]))).first()
+        if not user:
+            return FastJSONResponse({"detail": "User not found."}, status_code=404)
+        if user.department_id is None:
+            return FastJSONResponse({"detail": f"Department '{user.department}' not found or registered."}, status_code=404)
+        from_department_id = user.department_id
+
+        # In memory, except when the index is rebuilt (sync queries): keep that off the event loop
+        surveyable_departments_data = await to_thread.run_sync(permission_index.active_targets, from_department_id)
+        if not surveyable_departments_data:
+            return FastJSONResponse({"message": "No departments are currently available for you to survey."})
+        return FastJSONResponse(surveyable_departments_data)
+    except Exception as e:
+        logger.exception("Error fetching surveyable departments: %s", e)
+        return FastJSONResponse({"detail": f"An error occurred fetching surveyable departments: {str(e)}"}, status_code=500)
+
+
+# --- Change Events (Server-Sent Events) ---
+
+class VersionWatcher:
+    """
+    Polls the data versions of all tracked tables every `interval` seconds while at least one
+    stream is subscribed, and puts {"tables", "versions"} on every subscriber's queue when any moved.
+    """
+
+    def __init__(self, interval: float = 2.0, queue_size: int = 100):
+        self.interval = interval
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self._task = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    async def _poll(self):
+        known = None
+        while self.subscribers:
+            try:
+                async with read_session() as db:
+                    current = await data_versions.read_async(db, data_versions.TRACKED_TABLES)
+                versions = {table: version for table, (version, _) in current.items()}
+                changed = sorted(table for table, version in versions.items() if known is not None and known.get(table) != version)
+                known = versions
+                if changed:
+                    self.publish({"tables": changed, "versions": {table: versions[table] for table in changed}})
+            except Exception as e:
+                logger.warning("Could not poll data versions for change events: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def publish(self, event: dict):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull: # A stalled client misses events rather than holding memory
+                pass
+
+
+version_watcher = VersionWatcher(interval=SSE_POLL_SECONDS)
+
+
+@router.get("/events")
+async def change_events(request: Request, claims: dict = Depends(jwt_claims)):
+    async def stream():
+        queue = version_watcher.subscribe()
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n" # Keeps proxies from closing an idle stream
+                    continue
+                yield f"event: changed\ndata: {dumps_bytes(event).decode()}\n\n"
+        finally:
+            version_watcher.unsubscribe(queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,86 @@
+# routes/participation_routes.py
+import logging
+from flask import Blueprint, request, jsonify
+from sqlalchemy.orm import Session
+from database import SessionLocal, read_replica
+from query_stats import query_budget
+from routes.admin_routes import admin_required # Participation reports and reminders are for admins only
+from datetime import datetime
+from dates import parse_iso_datetime
+import participation
+
+participation_bp = Blueprint('participation_bp', __name__, url_prefix='/api/participation')
+
+logger = logging.getLogger(__name__)
+
+# Helper function to parse an optional ?date=<ISO timestamp> (naive UTC), defaulting to now
+def get_requested_date():
+    date_str = request.args.get('date')
+    if not date_str:
+        return datetime.utcnow()
+    return parse_iso_datetime(date_str)
+
+# GET completion rate per department for the survey windows open at ?date= (default now)
+@participation_bp.route('/completion', methods=['GET'])
+@admin_required
+@read_replica
+@query_budget(4)
+def get_completion_by_department():
+    try:
+        at = get_requested_date()
+    except ValueError:
+        return jsonify({"detail": "Invalid date format. Expected ISO string."}), 400
+
+    db: Session = SessionLocal()
+    try:
+        return jsonify({
+            "date": at,
+            "departments": participation.completion_by_department(db, at)
+        }), 200
+    finally:
+        db.close()
+
+# GET users who still owe surveys, optionally for one department (?department_id=)
+@participation_bp.route('/pending', methods=['GET'])
+@admin_required
+@read_replica
+@query_budget(3)
+def get_pending_users():
+    try:
+        at = get_requested_date()
+    except ValueError:
+        return jsonify({"detail": "Invalid date format. Expected ISO string."}), 400
+    department_id = request.args.get('department_id', type=int)
+
+    db: Session = SessionLocal()
+    try:
+        pending = {}
+        for row in participation.outstanding_assignments(db, at, department_id=department_id):
+            user = pending.setdefault(row.user_id, {
+                "user_id": row.user_id,
+                "username": row.username,
+                "email": row.email,
+                "department_id": row.department_id,
+                "pending_surveys": []
+            })
+            user["pending_surveys"].append({
+                "survey_id": row.survey_id,
+                "survey_title": row.survey_title,
+                "rated_department_id": row.rated_department_id,
+                "window_end": row.window_end
+            })
+        return jsonify({"date": at, "users": list(pending.values())}), 200
+    finally:
+        db.close()
+
+# POST to queue reminder emails now for everyone who still owes surveys
+@participation_bp.route('/reminders', methods=['POST'])
+@admin_required
+@query_budget(max_repeats=0)
+def send_reminders():
+    try:
+        queued = participation.run_reminders()
+    except Exception as e:
+        logger.exception("Error queueing reminders: %s", e)
+        return jsonify({"detail": f"Error queueing reminders: {str(e)}"}), 500
+    return jsonify({"message": f"Queued reminders for {queued} users.", "queued": queued}), 200
@@ -1,15 +1,32 @@
 # F:\LLS Survey\backend\routes\permission_routes.py
+import logging
 from flask import Blueprint, request, jsonify
 from sqlalchemy.orm import Session
-from database import SessionLocal
+from database import SessionLocal, read_replica
+from query_stats import query_budget
+from http_cache import conditional
+from response_cache import cached, response_cache
 from models import Department, Permission, User # Import User model
 from security import get_frontend_role # Ensure this is imported for user role normalization
+from sqlalchemy import insert, update, delete
 from sqlalchemy.exc import IntegrityError
-from datetime import datetime # For date parsing
-from flask_jwt_extended import jwt_required, get_jwt_identity # Import JWT decorators
+from datetime import datetime
+from dates import parse_iso_datetime # ISO timestamps to naive UTC (shared with the other routes)
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt # Import JWT decorators
+from permission_index import permission_index
+import mailer
 
 permission_bp = Blueprint('permission_bp', __name__, url_prefix='/api')
 
+logger = logging.getLogger(__name__)
+
+# Permission and department writes on other workers reach this worker's index through the
+# response cache's invalidation events (with a shared backend), not only after PERMISSION_INDEX_MAX_AGE
+@response_cache.on_invalidate
+def _invalidate_permission_index(tables):
+    if tables & {"permissions", "departments"}:
+        permission_index.invalidate()
+
 # Helper function to get a database session
 def get_db():
     db = SessionLocal()
@@ -18,9 +35,19 @@ def get_db():
     finally:
         db.close()
 
+# Helper function to split long ID lists so IN clauses stay under SQL Server's 2100 parameter limit
+def chunked(items, size=1000):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
 # GET all departments (for admin matrix headers/rows)
 @permission_bp.route('/departments', methods=['GET'])
 # @jwt_required() # <-- COMMENTED OUT FOR DEVELOPMENT TO ALLOW PUBLIC ACCESS
+@read_replica
+@conditional("departments")
+@cached("departments")
+@query_budget(2)
 def get_departments():
     db: Session = next(get_db())
     departments = db.query(Department).order_by(Department.name).all() # Order by name for consistent display
@@ -31,6 +58,7 @@ def get_departments():
 # POST (Create) a new department (likely used elsewhere, but kept here)
 @permission_bp.route('/departments', methods=['POST'])
 @jwt_required() # This should remain protected
+@query_budget(4)
 def create_department():
     data = request.get_json()
     dept_name = data.get('name')
@@ -48,13 +76,14 @@ def create_department():
         db.add(new_dept)
         db.commit()
         db.refresh(new_dept)
+        permission_index.invalidate()
         return jsonify({"id": new_dept.id, "name": new_dept.name}), 201
     except IntegrityError: # Catch specific SQLAlchemy integrity errors
         db.rollback()
         return jsonify({"message": "Database integrity error. Department might already exist (duplicate)."}), 409
     except Exception as e:
         db.rollback()
-        print(f"Error creating department: {e}")
+        logger.exception("Error creating department: %s", e)
         return jsonify({"message": f"Internal server error: {str(e)}"}), 500
     finally:
         db.close()
@@ -62,6 +91,9 @@ def create_department():
 # GET existing permissions (for populating the admin matrix on load)
 @permission_bp.route('/permissions', methods=['GET'])
 # @jwt_required() # <-- COMMENTED OUT FOR DEVELOPMENT TO ALLOW PUBLIC ACCESS
+@read_replica
+@conditional("permissions")
+@query_budget(2)
 def get_permissions():
     db: Session = next(get_db())
     permissions = db.query(Permission).all()
@@ -70,15 +102,17 @@ def get_permissions():
     for perm in permissions:
         permissions_data.append({
             "id": perm.id, # Include ID if needed for frontend keying
-            "from_department_id": perm.from_department_id,
-            "to_department_id": perm.to_department_id,
+            "from_department_id": perm.from_dept_id,
+            "to_department_id": perm.to_dept_id,
             "can_survey_self": perm.can_survey_self, # Return can_survey_self
-            "start_date": perm.start_date.isoformat() if perm.start_date else None,
-            "end_date": perm.end_date.isoformat() if perm.end_date else None,
+            "start_date": perm.start_date,
+            "end_date": perm.end_date,
         })
     return jsonify(permissions_data), 200
 
-# POST to save permissions (replace all existing with new list)
+# POST to save permissions (the posted list becomes the full permission matrix)
+# The matrix is saved as a diff against the current rows, in one transaction:
+# only added pairs are inserted, changed pairs updated and removed pairs deleted.
 @permission_bp.route('/permissions', methods=['POST'])
 @jwt_required() # This should remain protected
 def set_permissions():
@@ -93,60 +127,93 @@ def set_permissions():
         return jsonify({"message": "Start date and end date are required."}), 400
 
     try:
-        start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00'))
-        end_date = datetime.fromisoformat(end_date_str.replace('Z', '+00:00'))
+        start_date = parse_iso_datetime(start_date_str)
+        end_date = parse_iso_datetime(end_date_str)
     except ValueError:
         return jsonify({"message": "Invalid date format. Expected ISO string (e.g., YYYY-MM-DDTHH:MM:SS.sssZ)."}), 400
 
+    # Desired matrix: (from_dept_id, to_dept_id) -> can_survey_self
+    requested = {}
+    for pair in allowed_pairs:
+        from_dept_id = pair.get('from_dept_id')
+        to_dept_id = pair.get('to_dept_id')
+        can_survey_self = bool(pair.get('can_survey_self', False))
+
+        if from_dept_id is None or to_dept_id is None:
+            logger.warning("Skipping permission: Invalid pair format - from_dept_id or to_dept_id missing. Pair: %s", pair)
+            continue
+
+        if from_dept_id == to_dept_id and not can_survey_self:
+            logger.debug("Skipping self-survey for department %s as can_survey_self is false.", from_dept_id)
+            continue
+
+        requested[(from_dept_id, to_dept_id)] = can_survey_self
+
     db: Session = next(get_db())
     try:
-        db.query(Permission).delete()
-        db.commit()
-        print("Existing permissions wiped from DB.")
-
-        new_permission_objects = []
-        for pair in allowed_pairs:
-            from_dept_id = pair.get('from_dept_id')
-            to_dept_id = pair.get('to_dept_id')
-            can_survey_self = pair.get('can_survey_self', False)
-
-            if from_dept_id is None or to_dept_id is None:
-                print(f"Skipping permission: Invalid pair format - from_dept_id or to_dept_id missing. Pair: {pair}")
-                continue
-
-            from_dept_exists = db.query(Department).filter_by(id=from_dept_id).first()
-            to_dept_exists = db.query(Department).filter_by(id=to_dept_id).first()
-
-            if not from_dept_exists or not to_dept_exists:
-                print(f"Skipping permission: Department not found. From ID: {from_dept_id}, To ID: {to_dept_id}. Pair: {pair}")
-                continue
-
-            if from_dept_id == to_dept_id and not can_survey_self:
-                print(f"Skipping self-survey for department {from_dept_id} as can_survey_self is false.")
-                continue
-
-            new_permission_objects.append(
-                Permission(
-                    from_department_id=from_dept_id,
-                    to_department_id=to_dept_id,
-                    start_date=start_date,
-                    end_date=end_date,
-                    can_survey_self=can_survey_self
-                )
+        # Validate every referenced department with one IN query
+        referenced_ids = {dept_id for pair in requested for dept_id in pair}
+        existing_ids = set()
+        for ids in chunked(referenced_ids):
+            existing_ids.update(dept_id for (dept_id,) in db.query(Department.id).filter(Department.id.in_(ids)))
+
+        for from_dept_id, to_dept_id in [pair for pair in requested if not set(pair) <= existing_ids]:
+            logger.warning("Skipping permission: Department not found. From ID: %s, To ID: %s.", from_dept_id, to_dept_id)
+            del requested[(from_dept_id, to_dept_id)]
+
+        current = {
+            (row.from_dept_id, row.to_dept_id): row
+            for row in db.query(
+                Permission.id, Permission.from_dept_id, Permission.to_dept_id,
+                Permission.start_date, Permission.end_date, Permission.can_survey_self
             )
-        
-        db.add_all(new_permission_objects)
+        }
+
+        to_insert = []
+        to_update = []
+        for (from_dept_id, to_dept_id), can_survey_self in requested.items():
+            row = current.get((from_dept_id, to_dept_id))
+            if row is None:
+                to_insert.append({
+                    "from_dept_id": from_dept_id,
+                    "to_dept_id": to_dept_id,
+                    "start_date": start_date,
+                    "end_date": end_date,
+                    "can_survey_self": can_survey_self,
+                })
+            elif (row.start_date, row.end_date, bool(row.can_survey_self)) != (start_date, end_date, can_survey_self):
+                to_update.append({
+                    "id": row.id,
+                    "start_date": start_date,
+                    "end_date": end_date,
+                    "can_survey_self": can_survey_self,
+                })
+        to_delete = [row.id for pair, row in current.items() if pair not in requested]
+
+        for ids in chunked(to_delete):
+            db.execute(delete(Permission).where(Permission.id.in_(ids)))
+        if to_update:
+            db.execute(update(Permission), to_update) # Bulk UPDATE by primary key
+        if to_insert:
+            db.execute(insert(Permission), to_insert) # Bulk INSERT (executemany)
         db.commit()
-        print(f"Saved {len(new_permission_objects)} new permission entries.")
-        return jsonify({"message": "Permissions saved successfully"}), 200
+        permission_index.invalidate()
+
+        logger.info("Permissions saved: %d added, %d updated, %d removed.", len(to_insert), len(to_update), len(to_delete))
+        return jsonify({
+            "message": "Permissions saved successfully",
+            "added": len(to_insert),
+            "updated": len(to_update),
+            "removed": len(to_delete),
+        }), 200
 
     except IntegrityError as e:
         db.rollback()
-        print(f"Integrity error during permission setting: {e}")
+        logger.warning("Integrity error during permission setting: %s", e)
         return jsonify({"message": f"Database error: {str(e)}"}), 500
     except Exception as e:
         db.rollback()
-        print(f"Error setting permissions: {e}")
+        logger.exception("Error setting permissions: %s", e)
         return jsonify({"message": f"An unexpected error occurred: {str(e)}"}), 500
     finally:
         db.close()
@@ -155,6 +222,7 @@ def set_permissions():
 # POST for Mail Alert Users
 @permission_bp.route('/permissions/mail-alert', methods=['POST'])
 @jwt_required() # This should remain protected
+@query_budget(4)
 def mail_alert_users():
     data = request.get_json()
     allowed_pairs = data.get('allowed_pairs', [])
@@ -165,95 +233,91 @@ def mail_alert_users():
         return jsonify({"message": "Missing allowed_pairs or date range for mail alert"}), 400
 
     try:
-        start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00'))
-        end_date = datetime.fromisoformat(end_date_str.replace('Z', '+00:00'))
+        start_date = parse_iso_datetime(start_date_str)
+        end_date = parse_iso_datetime(end_date_str)
     except ValueError:
         return jsonify({"message": "Invalid date format. Expected ISO string."}), 400
 
     db: Session = next(get_db())
     
     department_names_map = {dept.id: dept.name for dept in db.query(Department).all()}
-    from_dept_ids = {pair['from_dept_id'] for pair in allowed_pairs if 'from_dept_id' in pair}
-    
-    users_to_alert = []
-    for dept_id in from_dept_ids:
-        dept_name = department_names_map.get(dept_id)
-        if dept_name:
-            users_in_dept = db.query(User).filter(User.department == dept_name).all()
-            users_to_alert.extend(users_in_dept)
-
-    alert_summary = []
+
+    # Group the surveyable departments by the department whose users get alerted
+    to_dept_ids_by_from_dept = {}
+    for pair in allowed_pairs:
+        if 'from_dept_id' in pair and 'to_dept_id' in pair:
+            to_dept_ids_by_from_dept.setdefault(pair['from_dept_id'], []).append(pair['to_dept_id'])
+
+    # Only the columns needed to address the emails, for every recipient in one query
+    users_to_alert = db.query(User.id, User.username, User.email, User.department_id).filter(
+        User.department_id.in_(list(to_dept_ids_by_from_dept)),
+        User.is_active == True
+    ).all()
+
     if not users_to_alert:
-        print("No users found in the relevant departments for mail alert.")
-        return jsonify({"message": "Mail alert process initiated. No relevant users found for simulation."}), 200
+        db.close()
+        logger.info("No users found in the relevant departments for mail alert.")
+        return jsonify({"message": "Mail alert process initiated. No relevant users found.", "queued": 0}), 200
 
+    period = f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
+    messages = []
     for user in users_to_alert:
-        user_dept_id = next((d_id for d_id, d_name in department_names_map.items() if d_name == user.department), None)
-        
-        if user_dept_id is None:
-            continue
-
-        relevant_permissions_for_user = [
-            pair for pair in allowed_pairs 
-            if pair['from_dept_id'] == user_dept_id
+        surveyable_depts_names = [
+            department_names_map[to_dept_id]
+            for to_dept_id in to_dept_ids_by_from_dept.get(user.department_id, [])
+            if to_dept_id in department_names_map
         ]
-        
-        surveyable_depts_names = []
-        for p in relevant_permissions_for_user:
-            to_dept_name = department_names_map.get(p['to_dept_id'])
-            if to_dept_name:
-                surveyable_depts_names.append(to_dept_name)
 
         if surveyable_depts_names:
-            alert_summary.append(
-                f"Simulating email to user '{user.username}' ({user.email}) from department '{user.department}'. "
-                f"Can now survey: {', '.join(surveyable_depts_names)}. Survey period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}."
-            )
-            print(alert_summary[-1])
+            messages.append({
+                "recipient_user_id": user.id,
+                "recipient_email": user.email,
+                "subject": "LLS Survey: new departments are open for your feedback",
+                "body": (
+                    f"Hello {user.username},\n\n"
+                    f"You can now survey the following departments: {', '.join(surveyable_depts_names)}.\n"
+                    f"Survey period: {period}.\n"
+                ),
+            })
+
+    # Queue one outbox row per recipient; mailer.py delivers them in the background
+    try:
+        queued = mailer.enqueue(db, "permission_alert", messages)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.exception("Error queueing mail alerts: %s", e)
+        return jsonify({"message": f"Could not queue mail alerts: {str(e)}"}), 500
+    finally:
+        db.close()
 
+    logger.info("Queued %d permission alert emails for survey period %s.", queued, period)
     return jsonify({
-        "message": "Mail alert process initiated (simulated). Check backend logs for details.",
-        "alert_details": alert_summary
+        "message": f"Mail alert queued for {queued} users.",
+        "queued": queued
     }), 200
 
 # NEW ENDPOINT: Get departments that the logged-in user's department can survey (for User Frontend)
+# The user's current department is one indexed lookup (not the login-time claim, which goes
+# stale when update_user moves them); the targets come from the in-memory permission index.
 @permission_bp.route('/surveyable-departments', methods=['GET'])
 @jwt_required() # <-- Keep this protected for now, as it relies on logged-in user's department
+@read_replica
+@query_budget(3) # The user lookup, plus departments and permissions when the index is rebuilt
 def get_surveyable_departments():
-    db: Session = next(get_db())
-    current_username = get_jwt_identity()
-    
     try:
-        current_user = db.query(User).filter(User.username == current_username).first()
+        db: Session = next(get_db())
+        try:
+            current_user = db.query(User.department, User.department_id).filter(User.username == get_jwt_identity()).first()
+        finally:
+            db.close()
         if not current_user:
             return jsonify({"detail": "User not found."}), 404
-        
-        from_department_obj = db.query(Department).filter(Department.name == current_user.department).first()
-        if not from_department_obj:
+        if current_user.department_id is None:
             return jsonify({"detail": f"Department '{current_user.department}' not found or registered."}), 404
-        
-        from_department_id = from_department_obj.id
-        current_date = datetime.utcnow()
-
-        surveyable_permissions = db.query(Permission).filter(
-            Permission.from_department_id == from_department_id,
-            Permission.start_date <= current_date,
-            Permission.end_date >= current_date
-        ).all()
-
-        surveyable_departments_data = []
-        for perm in surveyable_permissions:
-            to_dept = db.query(Department).filter_by(id=perm.to_department_id).first()
-            if to_dept:
-                if perm.from_department_id == perm.to_department_id and not perm.can_survey_self:
-                    continue
-                
-                surveyable_departments_data.append({
-                    "id": to_dept.id,
-                    "name": to_dept.name
-                })
-        
-        surveyable_departments_data.sort(key=lambda x: x['name'])
+        from_department_id = current_user.department_id
+
+        surveyable_departments_data = permission_index.active_targets(from_department_id)
 
         if not surveyable_departments_data:
             return jsonify({"message": "No departments are currently available for you to survey."}), 200
@@ -261,7 +325,22 @@ def get_surveyable_departments():
         return jsonify(surveyable_departments_data), 200
 
     except Exception as e:
-        print(f"Error fetching surveyable departments: {e}")
+        logger.exception("Error fetching surveyable departments: %s", e)
         return jsonify({"detail": f"An error occurred fetching surveyable departments: {str(e)}"}), 500
-    finally:
-        db.close()
+
+# GET who can survey whom at a point in time (admin view), from the in-memory permission index
+# Optional ?date=<ISO timestamp>, defaults to now.
+@permission_bp.route('/permissions/active', methods=['GET'])
+@jwt_required()
+@query_budget(2)
+def get_active_permissions():
+    date_str = request.args.get('date')
+    try:
+        at = parse_iso_datetime(date_str) if date_str else datetime.utcnow()
+    except ValueError:
+        return jsonify({"message": "Invalid date format. Expected ISO string."}), 400
+
+    return jsonify({
+        "date": at,
+        "permissions": permission_index.active_matrix(at)
+    }), 200
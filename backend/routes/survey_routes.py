@@ -1,16 +1,23 @@
 from flask import Blueprint, request, jsonify, abort, send_file
+import logging
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, desc
-from database import SessionLocal
-from models import Survey, Question, Option, Answer, User, Department, RemarkResponse, SurveySubmission, Permission
+from sqlalchemy import func, desc, insert
+from database import SessionLocal, read_replica
+from query_stats import query_budget
+from http_cache import conditional
+from response_cache import cached
+from admission import limit
+from metrics import EXPORT_JOBS, EXPORT_JOBS_IN_PROGRESS
+from models import Survey, Question, Option, Answer, User, Department, RemarkResponse, SurveySubmission
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy.exc import IntegrityError, NoResultFound
 from datetime import datetime, timedelta
-import pandas as pd
 import io
 
 survey_bp = Blueprint('survey', __name__, url_prefix='/api')
 
+logger = logging.getLogger(__name__)
+
 # --- Helper Functions ---
 
 def get_rating_description(overall_rating: float) -> str:
@@ -45,7 +52,7 @@ def filter_submissions_by_time_period_sql(db: Session, time_period: str, base_qu
     elif time_period == 'all_time' or not time_period:
         pass
     else:
-        print(f"Warning: Invalid time period '{time_period}' received for filtering.")
+        logger.warning("Invalid time period '%s' received for filtering.", time_period)
         return base_query.filter(False) if time_period else base_query
     return query
 
@@ -56,43 +63,15 @@ def get_db():
     finally:
         db.close()
 
-# --- Surveyable Departments for User ---
-
-@survey_bp.route('/surveyable-departments', methods=['GET'])
-@jwt_required()
-def get_surveyable_departments():
-    db: Session = SessionLocal()
-    try:
-        username = get_jwt_identity()
-        user = db.query(User).filter(User.username == username).first()
-        if not user:
-            return jsonify({"detail": "User not found."}), 404
-        user_dept = db.query(Department).filter(Department.name == user.department).first()
-        if not user_dept:
-            return jsonify({"detail": "User's department not found."}), 404
-
-        now = datetime.utcnow()
-        perms = db.query(Permission).filter(
-            Permission.from_dept_id == user_dept.id,
-            Permission.start_date <= now,
-            Permission.end_date >= now
-        ).all()
-
-        result = []
-        for perm in perms:
-            if (perm.from_dept_id == perm.to_dept_id and not getattr(perm, "can_survey_self", False)):
-                continue
-            dept = db.query(Department).filter(Department.id == perm.to_dept_id).first()
-            if dept:
-                result.append({"id": dept.id, "name": dept.name})
-        return jsonify(result), 200
-    finally:
-        db.close()
+# /api/surveyable-departments is served by permission_bp (routes/permission_routes.py)
 
 # --- Get All Surveys (for user selection) ---
 
 @survey_bp.route('/surveys', methods=['GET'])
 @jwt_required()
+@read_replica
+@conditional("surveys", "departments")
+@query_budget(2)
 def get_surveys():
     db: Session = SessionLocal()
     try:
@@ -105,7 +84,7 @@ def get_surveys():
                 "id": s.id,
                 "title": s.title,
                 "description": s.description,
-                "created_at": s.created_at.isoformat() if s.created_at else None,
+                "created_at": s.created_at,
                 "rated_department_id": s.rated_department_id,
                 "rated_dept_name": s.rated_department.name if s.rated_department else None,
                 "managing_department_id": s.managing_department_id,
@@ -120,6 +99,10 @@ def get_surveys():
 
 @survey_bp.route('/surveys/<int:survey_id>', methods=['GET'])
 @jwt_required()
+@read_replica
+@conditional("surveys", "questions", "question_options", "departments")
+@cached("surveys", "questions", "question_options", "departments")
+@query_budget(3)
 def get_survey_by_id(survey_id):
     db: Session = SessionLocal()
     try:
@@ -150,7 +133,7 @@ def get_survey_by_id(survey_id):
             "id": survey.id,
             "title": survey.title,
             "description": survey.description,
-            "created_at": survey.created_at.isoformat() if survey.created_at else None,
+            "created_at": survey.created_at,
             "managing_department_id": survey.managing_department_id,
             "rated_department_id": survey.rated_department_id,
             "managing_dept_name": survey.managing_department.name if survey.managing_department else None,
@@ -165,6 +148,8 @@ def get_survey_by_id(survey_id):
 
 @survey_bp.route('/surveys/<int:survey_id>/submit_response', methods=['POST'])
 @jwt_required()
+@limit("submit")
+@query_budget(7)
 def submit_survey_response(survey_id):
     db: Session = SessionLocal()
     try:
@@ -173,15 +158,14 @@ def submit_survey_response(survey_id):
         user = db.query(User).filter(User.username == username).first()
         if not user:
             return jsonify({"detail": "User not found"}), 404
-        user_dept = db.query(Department).filter(Department.name == user.department).first()
-        if not user_dept:
+        if user.department_id is None:
             return jsonify({"detail": "User's department not found."}), 404
 
         survey = db.query(Survey).filter(Survey.id == survey_id).first()
         if not survey:
             return jsonify({"detail": "Survey not found."}), 404
 
-        if user_dept.id == survey.rated_department_id:
+        if user.department_id == survey.rated_department_id:
             return jsonify({"detail": "You cannot rate your own department."}), 403
 
         prev = db.query(SurveySubmission).filter(
@@ -213,7 +197,7 @@ def submit_survey_response(survey_id):
         submission = SurveySubmission(
             survey_id=survey.id,
             submitter_user_id=user.id,
-            submitter_department_id=user_dept.id,
+            submitter_department_id=user.department_id,
             rated_department_id=survey.rated_department_id,
             suggestions=suggestion,
             submitted_at=datetime.utcnow()
@@ -221,13 +205,17 @@ def submit_survey_response(survey_id):
         db.add(submission)
         db.flush()
 
-        for answer in answers:
-            db.add(Answer(
-                submission_id=submission.id,
-                question_id=answer['id'],
-                rating_value=answer['rating'],
-                text_response=answer.get('remarks', '')
-            ))
+        # One bulk INSERT (executemany) for all answers; the answer IDs aren't needed here
+        if answers:
+            db.execute(insert(Answer), [
+                {
+                    "submission_id": submission.id,
+                    "question_id": answer['id'],
+                    "rating_value": answer['rating'],
+                    "text_response": answer.get('remarks', ''),
+                }
+                for answer in answers
+            ])
 
         db.commit()
         return jsonify({"message": "Survey submitted successfully!"}), 201
@@ -244,6 +232,7 @@ def submit_survey_response(survey_id):
 
 @survey_bp.route('/survey_submissions', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_user_survey_submissions():
     db: Session = SessionLocal()
     try:
@@ -259,7 +248,7 @@ def get_user_survey_submissions():
                 "id": s.id,
                 "survey_id": s.survey_id,
                 "rated_department_id": s.rated_department_id,
-                "submitted_at": s.submitted_at.isoformat() if s.submitted_at else None
+                "submitted_at": s.submitted_at
             } for s in submissions
         ])
     finally:
@@ -270,6 +259,8 @@ def get_user_survey_submissions():
 
 @survey_bp.route('/remarks/incoming', methods=['GET'])
 @jwt_required() # This must remain protected as it fetches user-specific data
+@read_replica
+@query_budget(4)
 def get_incoming_remarks():
     db: Session = SessionLocal()
     try:
@@ -278,11 +269,10 @@ def get_incoming_remarks():
         if not current_user or not current_user.department:
             return jsonify({"detail": "User or department not found"}), 404
 
-        current_dept_obj = db.query(Department).filter_by(name=current_user.department).first()
-        if not current_dept_obj:
+        if current_user.department_id is None:
             return jsonify({"detail": "User's department not registered in database"}), 404
         
-        my_department_id = current_dept_obj.id
+        my_department_id = current_user.department_id
 
         incoming_remarks = []
 
@@ -294,17 +284,18 @@ def get_incoming_remarks():
             SurveySubmission.rated_department_id == my_department_id
         ).all()
 
+        # (submission, question) pairs already responded to, in one query instead of one per remark
+        responded = set(
+            db.query(RemarkResponse.survey_submission_id, RemarkResponse.question_id)
+            .join(SurveySubmission, SurveySubmission.id == RemarkResponse.survey_submission_id)
+            .filter(SurveySubmission.rated_department_id == my_department_id)
+            .all()
+        )
+
         for submission in submissions:
             for answer in submission.answers:
                 if answer.text_response: # Only include answers with remarks
-                    remark_response_exists = db.query(RemarkResponse).filter(
-                        RemarkResponse.survey_submission_id == submission.id,
-                        RemarkResponse.question_id == answer.question_id
-                    ).first()
-
-                    if not remark_response_exists: # Only include if no response exists
-                        submission_date_str = submission.submitted_at.strftime('%Y-%m-%d %H:%M:%S') if submission.submitted_at else None
-                        
+                    if (submission.id, answer.question_id) not in responded: # Only include if no response exists
                         incoming_remarks.append({
                             "id": submission.id, # This is the SurveySubmission ID
                             "questionDataId": answer.question_id, # The Question ID this remark belongs to
@@ -312,11 +303,11 @@ def get_incoming_remarks():
                             "ratedDepartmentId": submission.rated_department_id,
                             "remark": answer.text_response,
                             "ratingGiven": answer.rating_value,
-                            "surveyDate": submission_date_str,
+                            "surveyDate": submission.submitted_at,
                             "category": answer.question.category if answer.question else None,
                         })
     except Exception as e:
-        print(f"Error fetching incoming remarks: {e}")
+        logger.exception("Error fetching incoming remarks: %s", e)
         return jsonify({"detail": f"Error fetching incoming remarks: {str(e)}"}), 500
     finally:
         db.close()
@@ -326,6 +317,8 @@ def get_incoming_remarks():
 
 @survey_bp.route('/remarks/outgoing', methods=['GET'])
 @jwt_required() # This must remain protected as it fetches user-specific data
+@read_replica
+@query_budget(3)
 def get_outgoing_remarks():
     db: Session = SessionLocal()
     try:
@@ -334,11 +327,10 @@ def get_outgoing_remarks():
         if not current_user or not current_user.department:
             return jsonify({"detail": "User or department not found"}), 404
 
-        current_dept_obj = db.query(Department).filter_by(name=current_user.department).first()
-        if not current_dept_obj:
+        if current_user.department_id is None:
             return jsonify({"detail": "User's department not registered in database"}), 404
         
-        my_department_id = current_dept_obj.id
+        my_department_id = current_user.department_id
 
         outgoing_remarks = []
 
@@ -352,7 +344,6 @@ def get_outgoing_remarks():
 
         for submission in submissions:
             rated_department_name = submission.rated_department.name if submission.rated_department else 'Unknown Department'
-            submission_date_str = submission.submitted_at.strftime('%Y-%m-%d %H:%M:%S') if submission.submitted_at else None
 
             for answer in submission.answers:
                 if answer.text_response: # Only include answers with remarks
@@ -367,7 +358,7 @@ def get_outgoing_remarks():
                         "explanation": found_response.explanation if found_response else "",
                         "actionPlan": found_response.action_plan if found_response else "",
                         "responsiblePerson": found_response.responsible_person if found_response else "",
-                        "responseDate": found_response.responded_at.isoformat() if found_response and found_response.responded_at else ""
+                        "responseDate": (found_response.responded_at if found_response else None) or ""
                     }
                     
                     outgoing_remarks.append({
@@ -377,11 +368,11 @@ def get_outgoing_remarks():
                         "rating": answer.rating_value,
                         "yourRemark": answer.text_response,
                         "theirResponse": their_response,
-                        "surveyDate": submission_date_str,
+                        "surveyDate": submission.submitted_at,
                         "category": answer.question.category if answer.question else None,
                     })
     except Exception as e:
-        print(f"Error fetching outgoing remarks: {e}")
+        logger.exception("Error fetching outgoing remarks: %s", e)
         return jsonify({"detail": f"Error fetching outgoing remarks: {str(e)}"}), 500
     finally:
         db.close()
@@ -391,6 +382,7 @@ def get_outgoing_remarks():
 
 @survey_bp.route('/remarks/respond', methods=['POST'])
 @jwt_required() # This must remain protected
+@query_budget(5)
 def respond_to_remark():
     db: Session = SessionLocal()
     # The entire logic of the function should be within the try block
@@ -401,11 +393,10 @@ def respond_to_remark():
         if not current_user or not current_user.department:
             return jsonify({"detail": "User or department not found"}), 404
 
-        responded_by_dept_obj = db.query(Department).filter_by(name=current_user.department).first()
-        if not responded_by_dept_obj:
+        if current_user.department_id is None:
             return jsonify({"detail": "User's department not registered in database"}), 404
         
-        responded_by_department_id = responded_by_dept_obj.id
+        responded_by_department_id = current_user.department_id
 
         data = request.get_json()
         submission_id = data.get('survey_id') # This is the SurveySubmission.id
@@ -456,11 +447,11 @@ def respond_to_remark():
 
     except IntegrityError as e:
         db.rollback()
-        print(f"IntegrityError during remark response submission: {e}")
+        logger.warning("IntegrityError during remark response submission: %s", e)
         return jsonify({"detail": "Database integrity error. Possible duplicate response or invalid data."}), 400
     except Exception as e:
         db.rollback()
-        print(f"Error submitting remark response: {e}")
+        logger.exception("Error submitting remark response: %s", e)
         return jsonify({"detail": f"An unexpected error occurred during response submission: {str(e)}"}), 500
     finally:
         db.close()
@@ -470,6 +461,11 @@ def respond_to_remark():
 
 @survey_bp.route('/dashboard/overall-stats', methods=['GET'])
 @jwt_required() # This must remain protected
+@read_replica
+@conditional("survey_submissions", "surveys", "admin_users", "departments")
+@cached("survey_submissions", "surveys", "admin_users", "departments")
+@limit("dashboard") # Below @conditional/@cached: 304s and cache hits don't take a slot
+@query_budget(4)
 def get_overall_dashboard_stats():
     db: Session = next(get_db())
     try:
@@ -480,7 +476,8 @@ def get_overall_dashboard_stats():
 
         latest_submissions = db.query(SurveySubmission).options(
             joinedload(SurveySubmission.survey),
-            joinedload(SurveySubmission.submitter)
+            joinedload(SurveySubmission.submitter),
+            joinedload(SurveySubmission.rated_department)
         ).order_by(desc(SurveySubmission.submitted_at)).limit(5).all()
 
         latest_data = []
@@ -491,7 +488,7 @@ def get_overall_dashboard_stats():
                 "ratedDepartmentName": submission.rated_department.name if submission.rated_department else "N/A",
                 "overallRating": float(submission.overall_customer_rating) if submission.overall_customer_rating is not None else 0.0,
                 "submittedBy": submission.submitter.username if submission.submitter else "N/A", # Changed to username
-                "submittedAt": submission.submitted_at.isoformat() if submission.submitted_at else "N/A"
+                "submittedAt": submission.submitted_at or "N/A"
             })
 
         return jsonify({
@@ -500,13 +497,18 @@ def get_overall_dashboard_stats():
             "latestSubmissions": latest_data
         }), 200
     except Exception as e:
-        print(f"Error fetching overall dashboard stats: {e}")
+        logger.exception("Error fetching overall dashboard stats: %s", e)
         return jsonify({"detail": f"Internal server error: {str(e)}"}), 500
     finally:
         db.close()
 
 @survey_bp.route('/dashboard/department-metrics', methods=['GET'])
 @jwt_required() # This must remain protected
+@read_replica
+@conditional("survey_submissions", "departments")
+@cached("survey_submissions", "departments")
+@limit("dashboard")
+@query_budget(3)
 def get_department_dashboard_metrics():
     db: Session = next(get_db())
     try:
@@ -543,7 +545,7 @@ def get_department_dashboard_metrics():
 
         return jsonify(final_department_metrics), 200
     except Exception as e:
-        print(f"Error fetching department dashboard metrics: {e}")
+        logger.exception("Error fetching department dashboard metrics: %s", e)
         return jsonify({"detail": f"Internal server error: {str(e)}"}), 500
     finally:
         db.close()
@@ -551,8 +553,14 @@ def get_department_dashboard_metrics():
 
 # --- Excel Export Routes ---
 
+EXPORT_TYPES = ('My Submitted Surveys', 'Department Ratings', 'Submitted Remarks Only')
+
 @survey_bp.route('/export-data', methods=['GET'])
 @jwt_required()
+@read_replica
+@limit("export")
+@query_budget(3)
+@EXPORT_JOBS_IN_PROGRESS.track()
 def export_excel():
     db: Session = next(get_db())
     export_type = request.args.get('type')
@@ -560,8 +568,11 @@ def export_excel():
 
     if not export_type:
         return jsonify({"error": "Export type is required"}), 400
+    EXPORT_JOBS.inc(export_type if export_type in EXPORT_TYPES else "other") # Bounded label values
+
+    logger.info("Received export request: Type='%s', TimePeriod='%s'", export_type, time_period)
 
-    print(f"Received export request: Type='{export_type}', TimePeriod='{time_period}'")
+    import pandas as pd # Imported on the first export rather than at startup (it dominates the app's import time)
 
     output = io.BytesIO()
     writer = pd.ExcelWriter(output, engine='openpyxl')
@@ -765,12 +776,12 @@ def export_excel():
 
     except Exception as e:
         db.rollback() # Rollback on error
-        print(f"Error during Excel export for type {export_type}: {e}")
+        logger.exception("Error during Excel export for type %s: %s", export_type, e)
         # Always close writer on error if it was opened
         try:
             writer.close()
         except Exception as close_err:
-            print(f"Error closing writer in exception handler: {close_err}")
+            logger.warning("Error closing writer in exception handler: %s", close_err)
         return jsonify({"detail": f"Server error during export: {str(e)}"}), 500
     finally:
         # db.close() is handled by get_db() context manager
@@ -1,12 +1,24 @@
 # routes/user_routes.py
+import logging
+import os
+import threading
+import time
 from flask import Blueprint, request, jsonify
+from sqlalchemy import select, func, or_
 from sqlalchemy.orm import Session
-from database import SessionLocal
-from models import User
+from database import SessionLocal, read_replica
+from query_stats import query_budget
+from http_cache import current_versions
+from models import User, Department
 from security import hash_password, verify_password
+from participation import users_with_outstanding
+from user_import import import_users, ImportFileError
+from routes.admin_routes import admin_required
 
 user_bp = Blueprint('user_bp', __name__, url_prefix='/api')
 
+logger = logging.getLogger(__name__)
+
 # Helper function to get a database session
 def get_db():
     db = SessionLocal()
@@ -22,27 +34,131 @@ def get_frontend_role(db_role: str) -> str:
         return 'admin'
     return 'user' # Any other role (Rep, Manager, etc.) is considered 'user' for frontend
 
-# GET all users
+# Helper function to resolve a department name (as sent by the frontend) to its ID
+def get_department_id(db: Session, department_name: str):
+    return db.query(Department.id).filter(Department.name == department_name).scalar()
+
+# --- User Directory Listing ---
+USERS_DEFAULT_PAGE_SIZE = 50
+USERS_MAX_PAGE_SIZE = 200
+USER_COUNT_CACHE_TTL = float(os.getenv("USER_COUNT_CACHE_TTL", "30")) # seconds
+
+# Sortable columns; each is indexed, and id breaks ties so pages are stable
+USER_SORT_COLUMNS = {
+    "username": User.username,
+    "name": User.name,
+    "email": User.email,
+    "department": User.department,
+    "id": User.id,
+}
+
+# Only the columns the listing returns (never hashed_password)
+USER_LIST_COLUMNS = (User.id, User.username, User.name, User.email, User.department, User.role)
+
+class UserCountCache:
+    """Total row counts per (search, department_id) filter, kept while the admin_users data version is
+    unchanged (and for at most USER_COUNT_CACHE_TTL seconds). Paging through the list doesn't re-count;
+    a user write on any worker bumps the version (data_versions.py), so no worker serves the old total."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version, count_fn):
+        cached = self._counts.get(key)
+        if cached is not None and cached[1] == version and time.monotonic() - cached[2] < self.ttl:
+            return cached[0]
+        total = count_fn()
+        with self._lock:
+            if len(self._counts) > 1000: # Searches are open-ended; don't let the cache grow without bound
+                self._counts.clear()
+            self._counts[key] = (total, version, time.monotonic())
+        return total
+
+    def invalidate(self):
+        with self._lock:
+            self._counts.clear()
+
+user_count_cache = UserCountCache(USER_COUNT_CACHE_TTL)
+
+# Helper function to build the WHERE clause for ?search= and ?department_id=
+def user_list_filters(search: str, department_id):
+    filters = []
+    if search:
+        # Prefix match (LIKE 'term%') so the username/name/email/department indexes can be used
+        filters.append(or_(
+            User.username.startswith(search, autoescape=True),
+            User.name.startswith(search, autoescape=True),
+            User.email.startswith(search, autoescape=True),
+            User.department.startswith(search, autoescape=True),
+        ))
+    if department_id is not None:
+        filters.append(User.department_id == department_id)
+    return filters
+
+# GET users, one page at a time
+# Query params: page (1-based), page_size (max 200), sort (username|name|email|department|id),
+# order (asc|desc), search (prefix of username, name, email or department), department_id
 @user_bp.route('/users', methods=['GET'])
+@read_replica
+@query_budget(4)
 def get_users():
+    page = max(request.args.get('page', 1, type=int), 1)
+    page_size = min(max(request.args.get('page_size', USERS_DEFAULT_PAGE_SIZE, type=int), 1), USERS_MAX_PAGE_SIZE)
+    sort = request.args.get('sort', 'username')
+    order = request.args.get('order', 'asc').lower()
+    search = request.args.get('search', '').strip()
+    department_id = request.args.get('department_id', type=int)
+
+    if sort not in USER_SORT_COLUMNS:
+        return jsonify({"message": f"Invalid sort column '{sort}'. Expected one of: {', '.join(USER_SORT_COLUMNS)}"}), 400
+    if order not in ('asc', 'desc'):
+        return jsonify({"message": "Invalid order. Expected 'asc' or 'desc'."}), 400
+
     db: Session = next(get_db())
-    users = db.query(User).all()
+    filters = user_list_filters(search, department_id)
+
+    sort_column = USER_SORT_COLUMNS[sort]
+    ordering = [sort_column.desc() if order == 'desc' else sort_column.asc()]
+    if sort != 'id':
+        ordering.append(User.id.asc())
+
+    rows = db.execute(
+        select(*USER_LIST_COLUMNS).where(*filters).order_by(*ordering)
+        .offset((page - 1) * page_size).limit(page_size)
+    ).all()
+
+    total = user_count_cache.get(
+        (search.lower(), department_id),
+        current_versions(("admin_users",)).get("admin_users"),
+        lambda: db.execute(select(func.count()).select_from(User).where(*filters)).scalar_one()
+    )
+
+    # "Not Submitted" = still owes at least one survey in a currently open window (one query for the page)
+    pending_user_ids = users_with_outstanding(db, user_ids=[row.id for row in rows]) if rows else set()
 
     users_data = []
-    for user in users:
+    for row in rows:
         users_data.append({
-            "id": user.id,
-            "username": user.username,
-            "name": user.name,
-            "email": user.email,
-            "department": user.department,
-            "role": get_frontend_role(user.role), # Normalize role for frontend
-            "status": "Submitted" if user.created_at else "Not Submitted"
+            "id": row.id,
+            "username": row.username,
+            "name": row.name,
+            "email": row.email,
+            "department": row.department,
+            "role": get_frontend_role(row.role), # Normalize role for frontend
+            "status": "Not Submitted" if row.id in pending_user_ids else "Submitted"
         })
-    return jsonify(users_data)
+    return jsonify({
+        "items": users_data,
+        "total": total,
+        "page": page,
+        "page_size": page_size
+    })
 
 # POST (Create) a new user
 @user_bp.route('/users', methods=['POST'])
+@query_budget(5)
 def create_user():
     data = request.get_json()
     username = data.get('username')
@@ -60,6 +176,10 @@ def create_user():
     if db.query(User).filter((User.username == username) | (User.email == email)).first():
         return jsonify({"message": "User with this username or email already exists"}), 409
 
+    department_id = get_department_id(db, department)
+    if department_id is None:
+        return jsonify({"message": f"Department '{department}' not found"}), 400
+
     hashed_password = hash_password(password)
 
     new_user = User(
@@ -67,12 +187,14 @@ def create_user():
         name=name,
         email=email,
         department=department,
+        department_id=department_id,
         hashed_password=hashed_password,
         role=role # Store the specific role (Rep, Manager, Admin) in the DB
     )
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    user_count_cache.invalidate()
 
     return jsonify({
         "id": new_user.id,
@@ -84,8 +206,32 @@ def create_user():
         "status": "Not Submitted"
     }), 201
 
+# POST a CSV/XLSX file (multipart field "file") to create users in bulk.
+# Admins only: the file sets passwords and roles. Uploads are capped by MAX_UPLOAD_BYTES (see app.py).
+@user_bp.route('/users/import', methods=['POST'])
+@admin_required
+@query_budget(max_repeats=0)
+def import_users_file():
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({"message": "No file uploaded. Send a CSV or XLSX file in the 'file' field."}), 400
+
+    try:
+        report = import_users(upload.stream, upload.filename)
+    except ImportFileError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        logger.exception("Error importing users: %s", e)
+        user_count_cache.invalidate() # Batches committed before the failure are kept
+        return jsonify({"message": f"Error importing users: {str(e)}"}), 500
+    user_count_cache.invalidate()
+
+    report["message"] = f"Imported {report['created']} of {report['rows']} users."
+    return jsonify(report), 200
+
 # PUT (Update) an existing user
 @user_bp.route('/users/<int:user_id>', methods=['PUT'])
+@query_budget(5)
 def update_user(user_id):
     data = request.get_json()
     db: Session = next(get_db())
@@ -99,12 +245,17 @@ def update_user(user_id):
     if 'email' in data:
         user.email = data['email']
     if 'department' in data:
+        department_id = get_department_id(db, data['department'])
+        if department_id is None:
+            return jsonify({"message": f"Department '{data['department']}' not found"}), 400
         user.department = data['department']
+        user.department_id = department_id
     if 'role' in data:
         user.role = data['role'] # Update the specific role in the DB
 
     db.commit()
     db.refresh(user)
+    user_count_cache.invalidate()
 
     return jsonify({
         "id": user.id,
@@ -113,11 +264,12 @@ def update_user(user_id):
         "email": user.email,
         "department": user.department,
         "role": get_frontend_role(user.role), # Normalize role for frontend in response
-        "status": "Submitted" if user.created_at else "Not Submitted"
+        "status": "Not Submitted" if users_with_outstanding(db, user_ids=[user.id]) else "Submitted"
     })
 
 # DELETE a user
 @user_bp.route('/users/<int:user_id>', methods=['DELETE'])
+@query_budget(4)
 def delete_user(user_id):
     db: Session = next(get_db())
     user = db.query(User).filter(User.id == user_id).first()
@@ -127,5 +279,6 @@ def delete_user(user_id):
 
     db.delete(user)
     db.commit()
+    user_count_cache.invalidate()
 
     return jsonify({"message": "User deleted successfully"}), 200
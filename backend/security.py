@@ -1,7 +1,16 @@
+import os
+
+import jwt
 from passlib.context import CryptContext
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Access tokens are issued by the Flask app (flask_jwt_extended, HS256) and accepted by the
+# ASGI read app (asgi.py) as well, so both must use the same key and cookie
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your_super_secret_jwt_key_CHANGE_THIS_IN_PRODUCTION")
+JWT_ACCESS_COOKIE_NAME = "access_token_cookie"
+JWT_ALGORITHM = "HS256"
+
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
@@ -13,3 +22,14 @@ def get_frontend_role(db_role: str) -> str:
     if db_role.lower() == 'admin':
         return 'admin'
     return 'user' # Any other role (Rep, Manager, etc.) is considered 'user' for frontend
+
+def decode_access_token(token: str) -> dict:
+    """
+    The claims of an access token issued at login, validated the way flask_jwt_extended does
+    (signature, exp/nbf/iat, token type). Raises jwt.InvalidTokenError (ExpiredSignatureError
+    for expired tokens) otherwise.
+    """
+    claims = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM], options={"verify_sub": False})
+    if claims.get("type", "access") != "access":
+        raise jwt.InvalidTokenError("Only non-refresh tokens are allowed")
+    return claims
@@ -0,0 +1,31 @@
+# serve.py
+"""
+Production entry point: serves create_app() with gunicorn, using several pre-forked
+worker processes. The settings and the reload/shutdown signals are described in
+gunicorn.conf.py.
+
+    cd backend
+    python serve.py                                      # settings from the environment
+    WEB_CONCURRENCY=8 SERVER_THREADS=8 python serve.py
+    python serve.py --bind 127.0.0.1:8000 --workers 2    # any gunicorn option overrides the file
+
+`python app.py` remains the single-process development server.
+Gunicorn needs fork() and does not run on Windows; use WSL or a Linux container there.
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(BACKEND_DIR, "gunicorn.conf.py")
+
+
+def main(argv=None) -> int:
+    os.chdir(BACKEND_DIR) # Flat modules (app, database, ...) are imported from here
+    from gunicorn.app.wsgiapp import run
+
+    sys.argv = ["gunicorn", "--config", CONFIG_FILE, *(sys.argv[1:] if argv is None else argv)]
+    return run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
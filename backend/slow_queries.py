@@ -0,0 +1,255 @@
+# slow_queries.py
+"""
+Slow-query log.
+
+Statements on the primary or replica engine that take longer than SLOW_QUERY_MS are
+kept in an in-memory ring buffer of the last SLOW_QUERY_BUFFER entries, with
+  - the statement and its shape (see query_stats.statement_shape),
+  - its bound parameters, redacted: numbers, dates and NULLs are kept, strings and
+    binary values are replaced by their type and length (SLOW_QUERY_REDACT=0 keeps them),
+  - the route (Flask endpoint) that issued it, and
+  - the execution plan: EXPLAIN QUERY PLAN on SQLite, SHOWPLAN_TEXT on SQL Server.
+
+Plans are only captured for SELECT statements, at most once per statement shape every
+SLOW_QUERY_PLAN_TTL seconds, by a background thread on its own pooled connection, so
+the request that ran the slow statement doesn't pay for another round-trip.
+GET /api/admin/slow-queries lists the worst shapes (see top()).
+
+Settings (environment):
+    SLOW_QUERY_MS=500          threshold in milliseconds (0 disables the log)
+    SLOW_QUERY_BUFFER=500      entries kept
+    SLOW_QUERY_EXPLAIN=1       capture execution plans
+    SLOW_QUERY_PLAN_TTL=600    seconds before a shape's plan is captured again
+    SLOW_QUERY_REDACT=1        redact string/binary parameters
+"""
+import os
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from datetime import datetime, date
+
+from sqlalchemy import event
+
+from query_stats import statement_shape
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+SLOW_QUERY_BUFFER = int(os.getenv("SLOW_QUERY_BUFFER", "500"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "1") == "1"
+SLOW_QUERY_PLAN_TTL = float(os.getenv("SLOW_QUERY_PLAN_TTL", "600"))
+SLOW_QUERY_REDACT = os.getenv("SLOW_QUERY_REDACT", "1") == "1"
+
+SORT_KEYS = ("total_ms", "max_ms", "avg_ms", "count")
+
+
+# --- Parameter Redaction ---
+
+def _redact_value(value):
+    if value is None or isinstance(value, (bool, int, float, datetime, date)):
+        return value if not isinstance(value, (datetime, date)) else value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<bytes len={len(value)}>"
+    if isinstance(value, str):
+        return f"<str len={len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def redact_parameters(parameters, executemany: bool = False):
+    """JSON-safe copy of a statement's parameters (the first row for executemany), redacted per SLOW_QUERY_REDACT."""
+    if executemany and parameters:
+        parameters = parameters[0]
+    convert = _redact_value if SLOW_QUERY_REDACT else (lambda value: value if isinstance(value, (int, float, type(None))) else str(value))
+    if isinstance(parameters, dict):
+        return {key: convert(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [convert(value) for value in parameters]
+    return None
+
+
+# --- Execution Plans ---
+
+def explain(dbapi_connection, dialect_name: str, statement: str, parameters):
+    """The execution plan of a SELECT as text, run on the raw DBAPI connection (bypassing engine events)."""
+    cursor = dbapi_connection.cursor()
+    try:
+        if dialect_name == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+            return "\n".join(" | ".join(str(column) for column in row) for row in cursor.fetchall())
+        if dialect_name == "mssql":
+            # With SHOWPLAN_TEXT on, SQL Server returns the plan instead of running the statement
+            cursor.execute("SET SHOWPLAN_TEXT ON")
+            try:
+                cursor.execute(statement, parameters or ())
+                lines = []
+                while True:
+                    lines.extend(str(row[0]) for row in cursor.fetchall())
+                    if not cursor.nextset():
+                        break
+                return "\n".join(lines)
+            finally:
+                cursor.execute("SET SHOWPLAN_TEXT OFF")
+        cursor.execute(f"EXPLAIN {statement}", parameters or ())
+        return "\n".join(" | ".join(str(column) for column in row) for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def _is_select(statement: str) -> bool:
+    words = statement.split(None, 1)
+    return bool(words) and words[0].upper() in ("SELECT", "WITH")
+
+
+# --- Recorder ---
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, size: int = SLOW_QUERY_BUFFER,
+                 capture_plans: bool = SLOW_QUERY_EXPLAIN, plan_ttl: float = SLOW_QUERY_PLAN_TTL):
+        self.threshold_ms = threshold_ms
+        self.capture_plans = capture_plans
+        self.plan_ttl = plan_ttl
+        self.entries = deque(maxlen=size) # deque.append is atomic, so recording takes no lock
+        self._plans = {} # shape -> (captured at, plan)
+        self._plan_requests = queue.Queue(maxsize=100)
+        self._plan_thread = None
+        self._lock = threading.Lock()
+        self._engines = set()
+
+    # --- Plan capture (background) ---
+
+    def _request_plan(self, engine, shape, statement, parameters):
+        cached = self._plans.get(shape)
+        if cached is not None and time.monotonic() - cached[0] < self.plan_ttl:
+            return
+        self._plans[shape] = (time.monotonic(), None) # Claim the shape so concurrent requests don't queue it again
+        try:
+            self._plan_requests.put_nowait((engine, shape, statement, parameters))
+        except queue.Full:
+            self._plans.pop(shape, None)
+            return
+        if self._plan_thread is None or not self._plan_thread.is_alive():
+            with self._lock:
+                if self._plan_thread is None or not self._plan_thread.is_alive():
+                    self._plan_thread = threading.Thread(target=self._capture_plans, name="slow-query-plans", daemon=True)
+                    self._plan_thread.start()
+
+    def _capture_plans(self):
+        while True:
+            engine, shape, statement, parameters = self._plan_requests.get()
+            try:
+                connection = engine.raw_connection()
+                try:
+                    plan = explain(connection, engine.dialect.name, statement, parameters)
+                finally:
+                    connection.close()
+            except Exception as e:
+                plan = f"(plan unavailable: {e})"
+            with self._lock:
+                if len(self._plans) >= 1000: # Bounded like the entries
+                    self._plans.clear()
+                self._plans[shape] = (time.monotonic(), plan)
+
+    def plan(self, shape):
+        return self._plans.get(shape, (None, None))[1]
+
+    # --- Recording ---
+
+    def record(self, engine, statement, parameters, executemany, elapsed_ms, engine_name):
+        shape = statement_shape(statement)
+        route = _current_route()
+        if self.capture_plans and not executemany and _is_select(statement):
+            self._request_plan(engine, shape, statement, parameters)
+        self.entries.append({
+            "at": datetime.utcnow().isoformat(),
+            "duration_ms": round(elapsed_ms, 2),
+            "engine": engine_name,
+            "route": route,
+            "statement": statement,
+            "shape": shape,
+            "parameters": redact_parameters(parameters, executemany),
+        })
+        logger.warning("Slow query (%.0f ms, %s): %s", elapsed_ms, route or "-", shape[:200])
+
+    def recent(self, limit: int = 50):
+        return [{**entry, "plan": self.plan(entry["shape"])} for entry in list(self.entries)[-limit:][::-1]]
+
+    def top(self, limit: int = 20, sort: str = "total_ms"):
+        """Entries aggregated by statement shape, worst first by `sort` (one of SORT_KEYS)."""
+        groups = {}
+        for entry in list(self.entries):
+            group = groups.get(entry["shape"])
+            if group is None:
+                group = groups[entry["shape"]] = {
+                    "shape": entry["shape"], "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "routes": set(), "engines": set(),
+                }
+            group["count"] += 1
+            group["total_ms"] += entry["duration_ms"]
+            group["routes"].add(entry["route"] or "-")
+            group["engines"].add(entry["engine"])
+            if entry["duration_ms"] >= group["max_ms"]:
+                group["max_ms"] = entry["duration_ms"]
+                group["slowest"] = {key: entry[key] for key in ("at", "statement", "parameters", "route")}
+            group["last_seen"] = entry["at"]
+
+        result = []
+        for group in groups.values():
+            group["total_ms"] = round(group["total_ms"], 2)
+            group["avg_ms"] = round(group["total_ms"] / group["count"], 2)
+            group["routes"] = sorted(group["routes"])
+            group["engines"] = sorted(group["engines"])
+            group["plan"] = self.plan(group["shape"])
+            result.append(group)
+        result.sort(key=lambda group: group[sort], reverse=True)
+        return result[:limit]
+
+    def clear(self):
+        self.entries.clear()
+        with self._lock:
+            self._plans.clear()
+
+    def instrument(self, engine, name: str):
+        """Times every statement on `engine` and records those over the threshold."""
+        if name in self._engines:
+            return
+        self._engines.add(name)
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _start_timer(conn, cursor, statement, parameters, context, executemany):
+            context._slow_query_started = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _check_duration(conn, cursor, statement, parameters, context, executemany):
+            started = getattr(context, "_slow_query_started", None)
+            if started is None:
+                return
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if elapsed_ms >= self.threshold_ms:
+                try:
+                    self.record(engine, statement, parameters, executemany, elapsed_ms, name)
+                except Exception as e: # Never fail the query because of the log
+                    logger.warning("Could not record slow query: %s", e)
+
+
+def _current_route():
+    try:
+        from flask import has_request_context, request
+    except ImportError:
+        return None
+    return request.endpoint if has_request_context() else None
+
+
+slow_query_log = SlowQueryLog()
+
+
+def init_engines():
+    """Hooks the slow-query log into the primary and replica engines (no-op when SLOW_QUERY_MS=0)."""
+    import database
+
+    if not slow_query_log.threshold_ms:
+        return
+    slow_query_log.instrument(database.engine, "primary")
+    if database.replica_engine is not None:
+        slow_query_log.instrument(database.replica_engine, "replica")
@@ -0,0 +1,267 @@
+# user_import.py
+"""
+Bulk user import from CSV or XLSX.
+
+The file needs a header row with the columns
+    username, password, name, email, department[, role]
+(case-insensitive, in any order). Rows are streamed from the file, validated
+against the existing usernames/emails and department names with in-memory set
+lookups, and processed in batches of IMPORT_BATCH_SIZE: the batch's passwords are
+bcrypt-hashed across all cores, then the batch is inserted with one bulk INSERT and
+committed. Hashing runs on a thread pool (bcrypt releases the GIL) that is created on
+first use and shared by every import of the process, so an import neither forks the
+multi-threaded server worker nor starts a pool per request.
+
+    python user_import.py employees.xlsx
+    python user_import.py employees.csv --batch-size 1000 --workers 8
+
+The same import is available to admins as POST /api/users/import (multipart field "file").
+"""
+import csv
+import io
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import select, insert
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal
+from models import User, Department
+from security import hash_password
+from metrics import PASSWORD_HASH_QUEUE
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+IMPORT_HASH_WORKERS = int(os.getenv("IMPORT_HASH_WORKERS", "0")) or os.cpu_count() or 1
+
+REQUIRED_COLUMNS = ("username", "password", "name", "email", "department")
+DEFAULT_ROLE = "Rep" # Same default as POST /api/users
+
+
+class ImportFileError(ValueError):
+    """The file as a whole can't be imported (unsupported type, missing columns)."""
+
+
+# --- Parsing ---
+
+def _normalize_header(header):
+    return [str(column).strip().lower() if column is not None else "" for column in header]
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value) # Excel stores numeric employee IDs as floats
+    return str(value).strip()
+
+
+def _iter_csv(stream):
+    reader = csv.reader(stream)
+    header = _normalize_header(next(reader, []))
+    yield header
+    for values in reader:
+        yield values
+
+
+def _iter_xlsx(stream):
+    from openpyxl import load_workbook # Only needed for Excel imports
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        yield _normalize_header(next(rows, ()))
+        for values in rows:
+            yield values
+    finally:
+        workbook.close()
+
+
+def iter_rows(stream, filename: str, required_columns):
+    """
+    Returns an iterator of (row_number, {column: value}) for each non-empty data row of a CSV or
+    XLSX file. `stream` is a binary file object; row numbers match the spreadsheet (header = row 1).
+    The file type and header are checked up front and raise ImportFileError.
+    """
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension == ".csv":
+        rows = _iter_csv(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    elif extension in (".xlsx", ".xlsm"):
+        rows = _iter_xlsx(stream)
+    else:
+        raise ImportFileError(f"Unsupported file type '{extension}'. Expected .csv or .xlsx.")
+
+    header = next(rows)
+    missing = [column for column in required_columns if column not in header]
+    if missing:
+        raise ImportFileError(f"Missing required columns: {', '.join(missing)}")
+
+    def records():
+        for row_number, values in enumerate(rows, start=2):
+            record = {column: _cell(value) for column, value in zip(header, values) if column}
+            if any(record.values()):
+                yield row_number, record
+    return records()
+
+
+def iter_user_rows(stream, filename: str):
+    return iter_rows(stream, filename, REQUIRED_COLUMNS)
+
+
+_hash_pool = None
+_hash_pool_lock = threading.Lock()
+
+
+def hash_pool(workers: int = IMPORT_HASH_WORKERS) -> ThreadPoolExecutor:
+    """The process's password hashing pool, created with `workers` threads on first use."""
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            _hash_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        return _hash_pool
+
+
+def hash_passwords(pool, passwords):
+    """bcrypt-hashes passwords on the hashing pool, preserving order."""
+    passwords = list(passwords)
+    with PASSWORD_HASH_QUEUE.track(amount=len(passwords)):
+        return list(pool.map(hash_password, passwords))
+
+
+# --- Import ---
+
+class UserImporter:
+    def __init__(self, session_factory=SessionLocal, batch_size: int = IMPORT_BATCH_SIZE,
+                 workers: int = IMPORT_HASH_WORKERS):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.workers = workers
+
+    def _load_lookups(self, db):
+        # Usernames/emails compared case-insensitively, as the SQL Server collation does for the unique indexes
+        self.usernames = {u.lower() for u in db.execute(select(User.username)).scalars()}
+        self.emails = {e.lower() for e in db.execute(select(User.email)).scalars()}
+        self.departments = {name.lower(): (dept_id, name) for dept_id, name in db.execute(select(Department.id, Department.name))}
+
+    def _validate(self, row_number, record, errors):
+        """Returns the User row (without the hash) for a valid record, or None after recording the error."""
+        def reject(message):
+            errors.append({"row": row_number, "username": record.get("username", ""), "error": message})
+
+        missing = [column for column in REQUIRED_COLUMNS if not record.get(column)]
+        if missing:
+            return reject(f"Missing {', '.join(missing)}")
+        username, email = record["username"], record["email"]
+        if "@" not in email:
+            return reject(f"Invalid email '{email}'")
+        if username.lower() in self.usernames:
+            return reject(f"Username '{username}' already exists")
+        if email.lower() in self.emails:
+            return reject(f"Email '{email}' already exists")
+        department = self.departments.get(record["department"].lower())
+        if department is None:
+            return reject(f"Department '{record['department']}' not found")
+
+        # Later rows with the same username/email are duplicates of this one
+        self.usernames.add(username.lower())
+        self.emails.add(email.lower())
+        return {
+            "username": username,
+            "name": record["name"],
+            "email": email,
+            "department_id": department[0],
+            "department": department[1],
+            "role": record.get("role") or DEFAULT_ROLE,
+            "is_active": True,
+            "password": record["password"],
+            "row": row_number,
+        }
+
+    def _insert_batch(self, db, pool, batch, errors) -> int:
+        passwords = [row.pop("password") for row in batch]
+        for row, hashed in zip(batch, hash_passwords(pool, passwords)):
+            row["hashed_password"] = hashed
+        row_numbers = [row.pop("row") for row in batch]
+
+        try:
+            db.execute(insert(User), batch)
+            db.commit()
+            return len(batch)
+        except IntegrityError:
+            # Someone created a conflicting user since the lookups were loaded: insert row by row to find it
+            db.rollback()
+
+        created = 0
+        for row_number, row in zip(row_numbers, batch):
+            try:
+                db.execute(insert(User), [row])
+                db.commit()
+                created += 1
+            except IntegrityError as e:
+                db.rollback()
+                errors.append({"row": row_number, "username": row["username"], "error": f"Conflicts with an existing user: {e.orig}"})
+        return created
+
+    def run(self, rows):
+        """
+        Imports (row_number, record) pairs from iter_user_rows().
+        Returns a report with created/failed counts, per-row errors and throughput.
+        """
+        started = time.perf_counter()
+        errors, batch = [], []
+        total = created = 0
+
+        db = self.session_factory()
+        try:
+            self._load_lookups(db)
+            pool = hash_pool(self.workers)
+            for row_number, record in rows:
+                total += 1
+                user_row = self._validate(row_number, record, errors)
+                if user_row is not None:
+                    batch.append(user_row)
+                if len(batch) >= self.batch_size:
+                    created += self._insert_batch(db, pool, batch, errors)
+                    batch = []
+            if batch:
+                created += self._insert_batch(db, pool, batch, errors)
+        finally:
+            db.close()
+
+        seconds = time.perf_counter() - started
+        errors.sort(key=lambda error: error["row"])
+        return {
+            "rows": total,
+            "created": created,
+            "failed": len(errors),
+            "errors": errors,
+            "seconds": round(seconds, 2),
+            "rows_per_second": round(total / seconds, 1) if seconds else None,
+        }
+
+
+def import_users(stream, filename: str, **options):
+    """Parses and imports a CSV/XLSX file; raises ImportFileError if the file itself is unusable."""
+    return UserImporter(**options).run(iter_user_rows(stream, filename))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bulk import users from a CSV or XLSX file.")
+    parser.add_argument("path", help="CSV or XLSX file with username, password, name, email, department[, role] columns")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=IMPORT_HASH_WORKERS, help="Password hashing threads")
+    args = parser.parse_args()
+
+    try:
+        with open(args.path, "rb") as f:
+            report = import_users(f, args.path, batch_size=args.batch_size, workers=args.workers)
+    except ImportFileError as e:
+        parser.exit(1, f"Error: {e}\n")
+
+    for error in report["errors"]:
+        print(f"Row {error['row']} ({error['username'] or '-'}): {error['error']}")
+    print(f"Imported {report['created']} of {report['rows']} rows ({report['failed']} failed) "
+          f"in {report['seconds']}s, {report['rows_per_second']} rows/s with {args.workers} hashing workers.")
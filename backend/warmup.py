@@ -0,0 +1,129 @@
+# warmup.py
+"""
+Start-up warm-up, run by create_app() before the app serves its first request.
+
+Without it the first requests after a deploy pay for work that is only done once:
+  1. configuring the SQLAlchemy mappers (done by the first query otherwise),
+  2. opening pooled database connections (connect + login per connection),
+  3. building the permission index and compiling the hot routes' SQL, and filling
+     the response cache.
+Step 3 requests the department list, the survey list and details (at most
+WARMUP_MAX_SURVEYS), the permissions and the dashboards once through the app itself,
+with a short-lived internal token. These requests show up in the access log and the
+request metrics like any other.
+
+Every step is timed, logged and kept in app.extensions["warmup"]. A failing step is
+logged and skipped: a database that isn't reachable yet only costs the warm-up.
+
+Under serve.py the app, and so the warm-up, is built once before the workers are forked.
+Workers inherit the warm mappers and caches but not the connections (database.py empties
+the pools after a fork); prime_pools() reopens them in each new worker.
+
+Settings (environment):
+    WARMUP_ENABLED=1
+    WARMUP_POOL_CONNECTIONS=4    connections opened per engine (at most its pool size)
+    WARMUP_MAX_SURVEYS=50
+"""
+import os
+import time
+import logging
+from datetime import timedelta
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") == "1"
+WARMUP_POOL_CONNECTIONS = int(os.getenv("WARMUP_POOL_CONNECTIONS", "4"))
+WARMUP_MAX_SURVEYS = int(os.getenv("WARMUP_MAX_SURVEYS", "50"))
+
+WARMUP_REQUEST_ID = "warmup"
+
+
+def configure_mappers():
+    from sqlalchemy.orm import configure_mappers
+    import models # noqa: F401  (every mapper must be imported before configuring)
+    configure_mappers()
+
+
+def prime_pool(engine, connections: int = WARMUP_POOL_CONNECTIONS) -> int:
+    """Opens up to `connections` pooled connections on `engine` at once and returns them to the pool."""
+    size = getattr(engine.pool, "size", None)
+    if callable(size):
+        connections = min(connections, size())
+    opened = []
+    try:
+        for _ in range(connections):
+            conn = engine.connect()
+            opened.append(conn)
+            conn.exec_driver_sql("SELECT 1")
+    finally:
+        for conn in opened:
+            conn.close()
+    return len(opened)
+
+
+def prime_pools() -> dict:
+    """prime_pool() for the primary and, when configured, the replica engine."""
+    import database
+    opened = {"primary": prime_pool(database.engine)}
+    if database.replica_engine is not None:
+        opened["replica"] = prime_pool(database.replica_engine)
+    return opened
+
+
+def warm_routes(app) -> int:
+    """Requests the cached/hot GET routes once through `app`. Returns the number of requests made."""
+    from flask_jwt_extended import create_access_token
+    from database import SessionLocal
+    from models import Survey
+    from permission_index import permission_index
+
+    permission_index.snapshot()
+
+    db = SessionLocal()
+    try:
+        survey_ids = [row.id for row in db.query(Survey.id).order_by(Survey.id).limit(WARMUP_MAX_SURVEYS)]
+    finally:
+        db.close()
+
+    paths = ["/api/departments", "/api/permissions", "/api/surveys",
+             "/api/dashboard/overall-stats", "/api/dashboard/department-metrics"]
+    paths += [f"/api/surveys/{survey_id}" for survey_id in survey_ids]
+
+    with app.app_context():
+        token = create_access_token(identity=WARMUP_REQUEST_ID, expires_delta=timedelta(minutes=5))
+    client = app.test_client()
+    client.set_cookie(app.config["JWT_ACCESS_TOKEN_NAME"], token, domain=app.config["JWT_COOKIE_DOMAIN"])
+    for path in paths:
+        response = client.get(path, headers={"X-Request-ID": WARMUP_REQUEST_ID})
+        if response.status_code != 200:
+            logger.warning("Warm-up request %s returned %s", path, response.status_code)
+    return len(paths)
+
+
+def warm_up(app) -> dict:
+    """Runs the warm-up steps; returns {step: {"ms", "result" | "error"}} (also kept in app.extensions["warmup"])."""
+    import database
+
+    steps = [
+        ("mappers", configure_mappers),
+        ("primary_pool", lambda: prime_pool(database.engine)),
+    ]
+    if database.replica_engine is not None:
+        steps.append(("replica_pool", lambda: prime_pool(database.replica_engine)))
+    steps.append(("routes", lambda: warm_routes(app)))
+
+    report = {}
+    started = time.perf_counter()
+    for name, step in steps:
+        step_started = time.perf_counter()
+        try:
+            report[name] = {"result": step()}
+        except Exception as e:
+            logger.warning("Warm-up step '%s' failed: %s", name, e)
+            report[name] = {"error": str(e)}
+        report[name]["ms"] = round((time.perf_counter() - step_started) * 1000, 1)
+    total_ms = round((time.perf_counter() - started) * 1000, 1)
+    logger.info("Warm-up finished in %.0f ms: %s", total_ms,
+                ", ".join(f"{name} {step['ms']:.0f} ms" for name, step in report.items()))
+    app.extensions["warmup"] = {"total_ms": total_ms, "steps": report}
+    return report